@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass PatentDocument model vs. per-field descendant XPath.
+
+Compares parse + extract time of the patent_document model against the
+previous PatentReconstructor extraction (one './/' XPath search per field).
+Large documents are synthesized by repeating the description and claims of
+a real XML, so the cost of walking a big tree is visible.
+
+Usage:
+    python benchmarks/bench_patent_document.py                 # bundled sample
+    python benchmarks/bench_patent_document.py file.XML ...    # real documents
+    python benchmarks/bench_patent_document.py --scale 1 20 100
+"""
+
+import argparse
+import copy
+import re
+import statistics
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from lxml import etree
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from patent_document import build_patent_document, parse_patent_xml  # noqa: E402
+
+SAMPLE_ZIP = REPO_ROOT / 'I20250626' / 'UTIL0204' / 'US20250204297A1-20250626.ZIP'
+
+
+def legacy_extract(root) -> dict:
+    """Field extraction as PatentReconstructor did it before the document model."""
+
+    def get_text(xpath):
+        elements = root.xpath(xpath)
+        if elements and elements[0].text:
+            return elements[0].text.strip()
+        return ''
+
+    def all_text(elem):
+        return ''.join(elem.itertext()).strip()
+
+    meta = {}
+    for key, xpath in (
+        ('pub_number', './/publication-reference//doc-number'),
+        ('pub_kind', './/publication-reference//kind'),
+        ('pub_date', './/publication-reference//date'),
+        ('app_number', './/application-reference//doc-number'),
+        ('app_date', './/application-reference//date'),
+        ('title', './/invention-title'),
+        ('applicant', './/us-applicants//orgname'),
+        ('first', './/us-applicants//first-name'),
+        ('last', './/us-applicants//last-name'),
+        ('city', './/us-applicants//city'),
+        ('state', './/us-applicants//state'),
+        ('country', './/us-applicants//country'),
+    ):
+        meta[key] = get_text(xpath)
+
+    meta['inventors'] = [
+        [inv.xpath(f'.//{f}/text()') for f in ('first-name', 'last-name', 'city', 'state', 'country')]
+        for inv in root.xpath('.//inventors/inventor')
+    ]
+    meta['provisionals'] = [
+        (prov.xpath('.//doc-number/text()'), prov.xpath('.//date/text()'))
+        for prov in root.xpath('.//us-provisional-application')
+    ]
+    for key, xpath in (('ipc', './/classification-ipcr'), ('cpc', './/classification-cpc')):
+        meta[key] = [
+            [c.xpath(f'{f}/text()') for f in ('section', 'class', 'subclass', 'main-group', 'subgroup')]
+            for c in root.xpath(xpath)
+        ]
+
+    abstract = [all_text(p) for p in root.xpath('.//abstract/p')[:1]]
+
+    description = []
+    desc = root.xpath('.//description')
+    if desc:
+        for elem in desc[0]:
+            if elem.tag in ('heading', 'p'):
+                description.append(all_text(elem))
+
+    claims = [re.sub(r'\s+', ' ', all_text(c)).strip() for c in root.xpath('.//claims/claim')]
+
+    drawings = []
+    for fig in root.xpath('.//drawings/figure'):
+        img = fig.xpath('.//img')
+        if img:
+            drawings.append(img[0].get('file', ''))
+
+    return {'meta': meta, 'abstract': abstract, 'description': description,
+            'claims': claims, 'drawings': drawings}
+
+
+def load_sample() -> bytes:
+    with zipfile.ZipFile(SAMPLE_ZIP) as zf:
+        name = next(n for n in zf.namelist() if n.upper().endswith('.XML'))
+        return zf.read(name)
+
+
+def scale_document(xml: bytes, factor: int) -> bytes:
+    """Repeat description paragraphs and claims factor times."""
+    if factor <= 1:
+        return xml
+    root = parse_patent_xml(xml)
+    for tag in ('description', 'claims'):
+        section = root.find(tag)
+        if section is None:
+            continue
+        children = list(section)
+        for _ in range(factor - 1):
+            for child in children:
+                section.append(copy.deepcopy(child))
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+
+def time_it(fn, repeat: int) -> float:
+    """Median wall time in milliseconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def bench(label: str, xml: bytes, repeat: int):
+    root = parse_patent_xml(xml)
+    parse_ms = time_it(lambda: parse_patent_xml(xml), repeat)
+    legacy_ms = time_it(lambda: legacy_extract(root), repeat)
+    model_ms = time_it(lambda: build_patent_document(root), repeat)
+    doc = build_patent_document(root)
+    print(f"{label:<28} {len(xml) / 1e6:7.2f}MB {len(doc.description):7d} {len(doc.claims):6d} "
+          f"{parse_ms:9.2f} {legacy_ms:10.2f} {model_ms:9.2f} "
+          f"{(parse_ms + legacy_ms) / (parse_ms + model_ms):7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('xml_files', nargs='*', help='Patent XML files (default: bundled sample)')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 50], help='Synthetic size factors')
+    parser.add_argument('--repeat', type=int, default=7, help='Runs per measurement (median reported)')
+    args = parser.parse_args()
+
+    if args.xml_files:
+        sources = [(Path(f).name, Path(f).read_bytes()) for f in args.xml_files]
+    else:
+        sources = [(SAMPLE_ZIP.stem, load_sample())]
+
+    print(f"{'document':<28} {'size':>9} {'paras':>7} {'claims':>6} "
+          f"{'parse ms':>9} {'xpath ms':>10} {'model ms':>9} {'speedup':>8}")
+    for name, xml in sources:
+        for factor in args.scale:
+            bench(f"{name[:22]} x{factor}", scale_document(xml, factor), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Shared fixtures for the hot-path benchmarks.
+
+Fixtures are generated once per session from benchmarks/synthetic.py, so
+results are comparable between machines and over time (see run.sh).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+
+# Root scripts (claims_backfill, prior_art_reconstructor) and the search services
+# (which import their siblings, e.g. search_filters) are plain modules, not a package
+for path in (REPO_ROOT, REPO_ROOT / 'patent_search', BENCH_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import synthetic  # noqa: E402
+
+PROFILES = ['small', 'typical', 'large']
+
+
+@pytest.fixture(scope='session')
+def fixture_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp('uspto')
+
+
+@pytest.fixture(scope='session')
+def xml_fixtures(fixture_dir):
+    """{profile: XML path} without drawings."""
+    return {
+        profile: synthetic.write_patent_fixture(fixture_dir / f"{profile}-xml", profile, drawings=False)
+        for profile in PROFILES
+    }
+
+
+@pytest.fixture(scope='session')
+def pdf_fixture(fixture_dir):
+    """A typical publication with its drawing sheets."""
+    return synthetic.write_patent_fixture(fixture_dir / 'typical-pdf', 'typical')
+
+
+@pytest.fixture(scope='session')
+def corpus():
+    """Candidate rows as returned by the search SQL."""
+    return synthetic.generate_corpus(200)
+
+
+@pytest.fixture(scope='session')
+def query_text():
+    return synthetic.description_text(seed=7, words=150)
+
+
+def record_throughput(benchmark, unit: str = 'docs'):
+    """Store <unit>/hour derived from the mean time in the saved JSON (extra_info)."""
+    mean = benchmark.stats['mean'] if benchmark.stats else 0
+    if mean:
+        benchmark.extra_info[f'{unit}_per_hour'] = round(3600 / mean)
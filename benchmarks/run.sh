@@ -0,0 +1,31 @@
+#!/bin/bash
+
+# Hot-path benchmark suite
+# Results are saved as JSON in benchmarks/results/<machine>/NNNN_<commit>_<date>.json
+#
+# Usage:
+#   benchmarks/run.sh                 # run and save
+#   benchmarks/run.sh --compare       # run, save, compare with the previous run, fail on >15% mean regression
+#   benchmarks/run.sh -k claims       # extra pytest arguments are passed through
+
+cd "$(dirname "$0")/.." || exit 1
+
+if ! python3 -c "import pytest_benchmark" 2>/dev/null; then
+    echo "Error: pytest-benchmark not installed. Run: pip install pytest-benchmark"
+    exit 1
+fi
+
+STORAGE="file://./benchmarks/results"
+ARGS=(--benchmark-only --benchmark-autosave --benchmark-storage="$STORAGE"
+      --benchmark-columns=min,mean,stddev,ops,rounds --benchmark-sort=name)
+
+if [ "$1" == "--compare" ]; then
+    shift
+    if ls benchmarks/results/*/*.json >/dev/null 2>&1; then
+        ARGS+=(--benchmark-compare --benchmark-compare-fail=mean:15%)
+    else
+        echo "No previous results to compare with; saving a baseline."
+    fi
+fi
+
+python3 -m pytest benchmarks -q "${ARGS[@]}" "$@"
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Synthetic USPTO Fixtures
+Deterministic us-patent-application XML (v4.x layout) and bilevel TIF
+drawings at realistic sizes, for benchmarks and load tests.
+
+Profiles roughly follow real publications:
+    small    ~25 description paragraphs, 10 claims, 3 sheets
+    typical  ~150 paragraphs, 20 claims, 12 sheets   (~100 KB XML)
+    large    ~1500 paragraphs, 120 claims, 40 sheets  (~1 MB XML)
+
+    python benchmarks/synthetic.py typical /tmp/fixture   # write XML + TIFs
+"""
+
+import random
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageDraw
+
+VOCABULARY = (
+    'sensor wireless network module housing actuator controller signal processor memory '
+    'circuit antenna battery valve pressure fluid channel frame bracket coupling shaft '
+    'rotor stator magnetic optical lens substrate layer electrode semiconductor wafer '
+    'polymer composite fiber coating adhesive seal gasket spring damper hinge latch '
+    'display interface protocol packet transmission receiver encoder decoder algorithm '
+    'vehicle engine turbine compressor nozzle injector combustion exhaust catalyst '
+    'seed planter soil furrow hopper meter disc opener closing wheel pneumatic cylinder'
+).split()
+FILLER = 'the a of to in and for with wherein comprising configured said each at least one'.split()
+
+
+@dataclass
+class Profile:
+    paragraphs: int
+    claims: int
+    figures: int
+    words_per_paragraph: int = 90
+    figure_size: tuple = (2560, 3300)  # 8.5x11in at ~300 dpi
+
+
+PROFILES = {
+    'small': Profile(paragraphs=25, claims=10, figures=3),
+    'typical': Profile(paragraphs=150, claims=20, figures=12),
+    'large': Profile(paragraphs=1500, claims=120, figures=40),
+}
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    out = []
+    for i in range(words):
+        out.append(rng.choice(VOCABULARY) if i % 3 else rng.choice(FILLER))
+    return ' '.join(out).capitalize() + '.'
+
+
+def _text(rng: random.Random, words: int) -> str:
+    parts = []
+    while words > 0:
+        n = min(words, rng.randint(12, 30))
+        parts.append(_sentence(rng, n))
+        words -= n
+    return ' '.join(parts)
+
+
+def description_text(seed: int = 0, words: int = 120) -> str:
+    """Invention-disclosure style free text (search queries, load tests)."""
+    return _text(random.Random(seed), words)
+
+
+def generate_patent_xml(profile: str = 'typical', seed: int = 0, pub_number: str = '20990000001') -> str:
+    """Return a us-patent-application XML document for the given size profile."""
+    p = PROFILES[profile]
+    rng = random.Random(f"{profile}-{seed}")
+    stem = f"US{pub_number}A1-20990101"
+
+    figures = ''.join(
+        f'<figure id="Fig-EMI-D{i:05d}" num="{i:05d}">'
+        f'<img id="EMI-D{i:05d}" he="200mm" wi="160mm" file="{stem}-D{i:05d}.TIF" '
+        f'alt="embedded image" img-content="drawing" img-format="tif"/></figure>\n'
+        for i in range(p.figures)
+    )
+
+    paragraphs = []
+    for i in range(1, p.paragraphs + 1):
+        if i % 25 == 1:
+            paragraphs.append(f'<heading id="h-{i:04d}" level="1">{escape(_sentence(rng, 4).upper())}</heading>')
+        paragraphs.append(
+            f'<p id="p-{i:04d}" num="{i:04d}">{escape(_text(rng, p.words_per_paragraph))} '
+            f'FIG. <figref idref="DRAWINGS">{rng.randint(1, max(p.figures, 1))}</figref> shows '
+            f'the <b>{rng.choice(VOCABULARY)}</b> assembly.</p>'
+        )
+
+    claims = []
+    independent = 1
+    for n in range(1, p.claims + 1):
+        if n == 1 or rng.random() < 0.12:
+            independent = n
+            body = (f'<claim-text>{n}. A {rng.choice(VOCABULARY)} system comprising:'
+                    + ''.join(f'<claim-text>a {escape(_text(rng, 18))};</claim-text>' for _ in range(4))
+                    + '</claim-text>')
+        else:
+            body = (f'<claim-text>{n}. The system of claim '
+                    f'<claim-ref idref="CLM-{independent:05d}">{independent}</claim-ref>, '
+                    f'wherein {escape(_text(rng, 25))}</claim-text>')
+        claims.append(f'<claim id="CLM-{n:05d}" num="{n:05d}">{body}</claim>')
+
+    title = ' '.join(rng.choice(VOCABULARY) for _ in range(4)).upper()
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE us-patent-application SYSTEM "us-patent-application-v46-2022-02-17.dtd" [ ]>
+<us-patent-application lang="EN" dtd-version="v4.6 2022-02-17" file="{stem}.XML" status="PRODUCTION" id="us-patent-application" country="US" date-produced="20981215" date-publ="20990101">
+<us-bibliographic-data-application lang="EN" country="US">
+<publication-reference><document-id><country>US</country><doc-number>{pub_number}</doc-number><kind>A1</kind><date>20990101</date></document-id></publication-reference>
+<application-reference appl-type="utility"><document-id><country>US</country><doc-number>19{seed % 1000000:06d}</doc-number><date>20980601</date></document-id></application-reference>
+<classifications-ipcr><classification-ipcr><section>H</section><class>04</class><subclass>W</subclass><main-group>4</main-group><subgroup>80</subgroup></classification-ipcr></classifications-ipcr>
+<classifications-cpc><main-cpc><classification-cpc><section>H</section><class>04</class><subclass>W</subclass><main-group>4</main-group><subgroup>80</subgroup></classification-cpc></main-cpc>
+<further-cpc><classification-cpc><section>G</section><class>06</class><subclass>F</subclass><main-group>3</main-group><subgroup>01</subgroup></classification-cpc></further-cpc></classifications-cpc>
+<invention-title id="d2e61">{escape(title)}</invention-title>
+<us-related-documents><us-provisional-application><document-id><country>US</country><doc-number>63{seed % 1000000:06d}</doc-number><date>20971201</date></document-id></us-provisional-application></us-related-documents>
+<us-parties>
+<us-applicants><us-applicant sequence="00" app-type="applicant" designation="us-only"><addressbook><orgname>Synthetic Devices Inc.</orgname><address><city>Austin</city><state>TX</state><country>US</country></address></addressbook></us-applicant></us-applicants>
+<inventors>
+<inventor sequence="00" designation="us-only"><addressbook><last-name>Doe</last-name><first-name>Jane</first-name><address><city>Austin</city><state>TX</state><country>US</country></address></addressbook></inventor>
+<inventor sequence="01" designation="us-only"><addressbook><last-name>Roe</last-name><first-name>Richard</first-name><address><city>Denver</city><state>CO</state><country>US</country></address></addressbook></inventor>
+</inventors>
+</us-parties>
+</us-bibliographic-data-application>
+<abstract id="abstract"><p id="p-0001" num="0000">{escape(_text(rng, 140))}</p></abstract>
+<drawings id="DRAWINGS">
+{figures}</drawings>
+<description id="description">
+{chr(10).join(paragraphs)}
+</description>
+<us-claim-statement>What is claimed is:</us-claim-statement>
+<claims id="claims">
+{chr(10).join(claims)}
+</claims>
+</us-patent-application>
+'''
+
+
+def generate_drawing(path: Path, seed: int = 0, size: tuple = (2560, 3300)):
+    """Write a bilevel CCITT G4 TIF with line art, like USPTO drawing sheets."""
+    rng = random.Random(seed)
+    img = Image.new('1', size, 1)
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for _ in range(60):
+        x0, y0 = rng.randint(0, w - 200), rng.randint(0, h - 200)
+        x1, y1 = x0 + rng.randint(50, 800), y0 + rng.randint(50, 800)
+        shape = rng.random()
+        if shape < 0.4:
+            draw.rectangle((x0, y0, min(x1, w - 1), min(y1, h - 1)), outline=0, width=4)
+        elif shape < 0.7:
+            draw.ellipse((x0, y0, min(x1, w - 1), min(y1, h - 1)), outline=0, width=4)
+        else:
+            draw.line((x0, y0, min(x1, w - 1), min(y1, h - 1)), fill=0, width=3)
+    draw.text((w // 2, h - 150), f"FIG. {seed}", fill=0)
+    img.save(path, format='TIFF', compression='group4', dpi=(300, 300))
+
+
+def write_patent_fixture(directory, profile: str = 'typical', seed: int = 0,
+                         pub_number: str = '20990000001', drawings: bool = True) -> Path:
+    """Write <stem>.XML plus its drawing TIFs into directory; returns the XML path."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"US{pub_number}A1-20990101"
+    xml_path = directory / f"{stem}.XML"
+    xml_path.write_text(generate_patent_xml(profile, seed, pub_number), encoding='utf-8')
+    if drawings:
+        p = PROFILES[profile]
+        for i in range(p.figures):
+            generate_drawing(directory / f"{stem}-D{i:05d}.TIF", seed * 1000 + i, p.figure_size)
+    return xml_path
+
+
+def generate_corpus(count: int, profile: str = 'small', seed: int = 0) -> List[dict]:
+    """patent_data_unified-like rows (title/abstract/description) for search benchmarks."""
+    rows = []
+    for i in range(count):
+        rng = random.Random(f"corpus-{seed}-{i}")
+        rows.append({
+            'pub_number': f"2099{i:07d}",
+            'title': ' '.join(rng.choice(VOCABULARY) for _ in range(5)).upper(),
+            'abstract_text': _text(rng, 140),
+            'description_text': _text(rng, PROFILES[profile].words_per_paragraph * 5),
+            'year': 2099,
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in PROFILES:
+        print(f"Usage: python benchmarks/synthetic.py <{'|'.join(PROFILES)}> <output_dir> [seed]")
+        sys.exit(1)
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(write_patent_fixture(sys.argv[2], sys.argv[1], seed))
@@ -0,0 +1,34 @@
+"""
+Claims extraction: claims_backfill.extract_claims_from_xml (backfill
+throughput) and ClaimsExtractor.parse_claims_from_xml (search-time claims).
+Both go through patent_document.parse_claims (lxml, claims section only);
+results saved before that change measured a regex and an ElementTree parser.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from conftest import PROFILES, record_throughput  # noqa: E402
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_claims_backfill_extract(benchmark, xml_fixtures, profile):
+    pytest.importorskip('psycopg2')
+    from claims_backfill import extract_claims_from_xml
+
+    result = benchmark(extract_claims_from_xml, str(xml_fixtures[profile]))
+    assert result
+    record_throughput(benchmark)
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_claims_extractor_parse(benchmark, xml_fixtures, profile):
+    for module in ('flask', 'flask_cors', 'psycopg2', 'requests'):
+        pytest.importorskip(module)
+    from patent_search_ai_with_claims import ClaimsExtractor
+
+    extractor = ClaimsExtractor()
+    result = benchmark(extractor.parse_claims_from_xml, str(xml_fixtures[profile]))
+    assert result
+    record_throughput(benchmark)
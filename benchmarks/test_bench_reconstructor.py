@@ -0,0 +1,39 @@
+"""
+Prior-art reconstruction: XML parse + document model, JSON document, PDF build.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('reportlab')
+
+import prior_art_reconstructor  # noqa: E402
+from conftest import PROFILES, record_throughput  # noqa: E402
+from prior_art_reconstructor import PatentReconstructor  # noqa: E402
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_reconstructor_parse(benchmark, xml_fixtures, profile):
+    reconstructor = benchmark(PatentReconstructor, str(xml_fixtures[profile]))
+    assert reconstructor.doc.claims
+    record_throughput(benchmark)
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_reconstructor_extract_document(benchmark, xml_fixtures, profile):
+    reconstructor = PatentReconstructor(str(xml_fixtures[profile]))
+    document = benchmark(reconstructor.extract_document)
+    assert document['claims']
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['cold', 'cached'])
+def test_build_pdf(benchmark, pdf_fixture, tmp_path, monkeypatch, cached):
+    # Cold runs disable the drawing cache so every round converts the TIFs
+    monkeypatch.setattr(prior_art_reconstructor, 'DRAWING_CACHE_DIR', str(tmp_path / 'drawings') if cached else '')
+    output = tmp_path / 'out.pdf'
+    reconstructor = PatentReconstructor(str(pdf_fixture))
+    if cached:
+        reconstructor.build_pdf(str(output))
+
+    benchmark.pedantic(reconstructor.build_pdf, args=(str(output),), rounds=3, iterations=1)
+    assert output.stat().st_size > 0
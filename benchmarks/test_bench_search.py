@@ -0,0 +1,46 @@
+"""
+Search-time text paths: query concept/keyword extraction and the keyword
+relevance score applied to every candidate row.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+for _module in ('flask', 'flask_cors', 'psycopg2', 'requests'):
+    pytest.importorskip(_module)
+
+from conftest import record_throughput  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def smart_search():
+    from patent_search_ai_fixed import SmartPatentSearch
+    return SmartPatentSearch()
+
+
+@pytest.fixture(scope='module')
+def search_engine():
+    from patent_search_professional import PatentSearchEngine
+    return PatentSearchEngine()
+
+
+def test_extract_concepts(benchmark, smart_search, query_text):
+    concepts = benchmark(smart_search.extract_concepts, query_text)
+    assert concepts['primary_terms']
+
+
+def test_extract_keywords(benchmark, search_engine, query_text):
+    keywords = benchmark(search_engine.extract_keywords, query_text)
+    assert keywords
+
+
+def test_relevance_score_candidates(benchmark, search_engine, query_text, corpus):
+    """Score one result page (200 candidates), as done per search."""
+    keywords = search_engine.extract_keywords(query_text)
+
+    def score_all():
+        return [search_engine.calculate_relevance_score(dict(row), keywords) for row in corpus]
+
+    scores = benchmark(score_all)
+    assert len(scores) == len(corpus)
+    record_throughput(benchmark, 'searches')
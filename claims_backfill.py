@@ -1,11 +1,39 @@
 #!/usr/bin/env python3
+"""
+Backfill claims_text in patent_data_unified from the patent XML.
+
+Default mode reads raw_xml_path as a plain file on disk. Most paths point
+inside a weekly archive (I20160526.tar/US...-20160526/...XML), so use
+--archives for those: rows are processed in raw_xml_path order, every
+archive is opened once and streamed sequentially, nested per-patent ZIPs
+are decompressed in memory (see patent_archives.py) and each archive's
+claims are written with one bulk UPDATE.
+
+Claims are read with patent_document.parse_claims(), the parser of the
+search services and the reconstructor, so claims_text and patent_claims
+hold the same claim texts they would produce.
+
+--archives also fills the per-claim table patent_claims (run
+patent_claims.sql first) from the <claim> elements and their claim-ref
+dependencies. --claims-table selects rows missing from patent_claims instead
+of rows with NULL claims_text, to fill the table for rows backfilled earlier.
+
+Usage:
+    python claims_backfill.py                       # plain files
+    python claims_backfill.py --archives            # weekly archives
+    python claims_backfill.py --archives --year 2016
+    python claims_backfill.py --archives --claims-table
+"""
+import argparse
 import os
-import re
 import sys
 import time
 import psycopg2
 import psycopg2.extras
 
+from patent_archives import iter_archive_xml, iter_pending_archives, resolve_archive_paths, split_raw_xml_path
+from patent_document import claims_text, parse_claims
+
 DB = dict(host="localhost", port=5432, dbname="companies_db", user="postgres", password="qwklmn711")
 
 # Override port for remote runs via SSH tunnel (5555 on server)
@@ -17,10 +45,6 @@ except Exception:
 
 BATCH = int(os.environ.get("BATCH", "3000"))
 
-RE_CLAIM = re.compile(r"(?is)<claim\b[^>]*>(.*?)</claim>")
-RE_TAG = re.compile(r"<[^>]+>")
-RE_WS = re.compile(r"\s+")
-
 
 def extract_claims_from_xml(path: str) -> str:
     try:
@@ -28,23 +52,135 @@ def extract_claims_from_xml(path: str) -> str:
             data = f.read()
     except Exception:
         return ""
+    return extract_claims(data)
+
+
+def read_claims(data: bytes) -> list:
+    """Claims of one patent XML; empty when it cannot be parsed."""
     try:
-        s = data.decode("utf-8", errors="ignore")
+        return parse_claims(data)
     except Exception:
-        try:
-            s = data.decode("latin-1", errors="ignore")
-        except Exception:
-            return ""
-    blocks = RE_CLAIM.findall(s)
-    if not blocks:
-        return ""
+        return []
+
+
+def extract_claims(data: bytes) -> str:
+    """Claim texts of one patent XML, one claim per line."""
+    return claims_text(read_claims(data))
+
+
+def claim_rows(pub_number: str, claims: list) -> list:
+    """(pub_number, claim_no, depends_on, text) per parsed claim."""
     out = []
-    for b in blocks:
-        t = RE_TAG.sub(" ", b)
-        t = RE_WS.sub(" ", t).strip()
-        if t:
-            out.append(t)
-    return "\n".join(out)
+    for c in claims:
+        try:
+            claim_no = int(c.num)
+        except ValueError:
+            continue
+        if c.text:
+            out.append((pub_number, claim_no, c.depends_on, c.text))
+    return out
+
+
+def claims_from_archive(archive_name: str, rows: list, with_table: bool = False) -> tuple:
+    """
+    Stream one archive; return (pub_number, claims_text) for the rows found with
+    claims and, with_table, their patent_claims rows.
+    """
+    by_member = {}
+    for r in rows:
+        parts = split_raw_xml_path(r["raw_xml_path"])
+        if parts:
+            by_member[parts[1]] = r["pub_number"]
+
+    paths = resolve_archive_paths(archive_name, rows[0]["year"])
+    if not paths:
+        print(f"archive not found: {archive_name} ({len(rows)} rows)", flush=True)
+        return [], []
+
+    out, table_rows = [], []
+    pending = set(by_member)
+    for path in paths:
+        found = set()
+        for member, data in iter_archive_xml(path, pending):
+            claims = read_claims(data)
+            text = claims_text(claims)
+            if text:
+                out.append((by_member[member], text))
+            if with_table:
+                table_rows.extend(claim_rows(by_member[member], claims))
+            found.add(member)
+        pending -= found
+        if not pending:
+            break
+    return out, table_rows
+
+
+def backfill_archives(year=None, claims_table: bool = False) -> None:
+    conn = psycopg2.connect(**DB)
+    conn.autocommit = False
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute("SELECT to_regclass('patent_claims') IS NOT NULL")
+    with_table = cur.fetchone()[0]
+    if not with_table:
+        if claims_table:
+            print("patent_claims does not exist; run patent_claims.sql first", file=sys.stderr)
+            sys.exit(1)
+        print("patent_claims does not exist, filling claims_text only", flush=True)
+    pending_sql = (
+        "NOT EXISTS (SELECT 1 FROM patent_claims c WHERE c.pub_number = u.pub_number)"
+        if claims_table else "claims_text IS NULL"
+    )
+    total_updated = 0
+    total_claims = 0
+    total_rows = 0
+    skipped = 0
+    start = time.time()
+    archives = iter_pending_archives(cur, f"{pending_sql} AND (%s::int IS NULL OR year = %s::int)",
+                                     (year, year), BATCH)
+    for archive_name, rows in archives:
+        if archive_name is None:
+            skipped += len(rows)
+            continue
+        t0 = time.time()
+        found, table_rows = claims_from_archive(archive_name, rows, with_table)
+        total_rows += len(rows)
+        if table_rows:
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO patent_claims (pub_number, claim_no, depends_on, text)
+                VALUES %s
+                ON CONFLICT (pub_number, claim_no)
+                DO UPDATE SET depends_on = EXCLUDED.depends_on, text = EXCLUDED.text
+                """,
+                table_rows,
+                template="(%s, %s, %s::int[], %s)",
+                page_size=1000,
+            )
+            total_claims += len(table_rows)
+        if not found:
+            conn.commit()
+            continue
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE patent_data_unified AS u
+            SET claims_text = v.claims
+            FROM (VALUES %s) AS v(pub_number, claims)
+            WHERE u.pub_number = v.pub_number
+              AND u.claims_text IS NULL
+            """,
+            found,
+            page_size=500,
+        )
+        conn.commit()
+        total_updated += len(found)
+        print(f"{archive_name}: {len(found)}/{len(rows)} with claims, "
+              f"{len(table_rows)} claim rows in {time.time() - t0:.1f}s (total {total_updated})", flush=True)
+
+    dur = time.time() - start
+    print(f"done: total updated {total_updated} of {total_rows} archived rows, {total_claims} claim rows "
+          f"({skipped} rows not in an archive) in {dur/60:.1f} min", flush=True)
 
 
 def main() -> None:
@@ -104,8 +240,20 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archives", action="store_true",
+                        help="Stream the weekly archives referenced by raw_xml_path")
+    parser.add_argument("--year", type=int, help="Only rows of this year (--archives mode)")
+    parser.add_argument("--claims-table", action="store_true",
+                        help="Select rows missing from patent_claims (--archives mode)")
+    args = parser.parse_args()
+    if args.claims_table and not args.archives:
+        parser.error("--claims-table needs --archives")
     try:
-        main()
+        if args.archives:
+            backfill_archives(args.year, args.claims_table)
+        else:
+            main()
     except KeyboardInterrupt:
         print("Interrupted", file=sys.stderr)
         sys.exit(130)
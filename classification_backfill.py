@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Backfill cpc_codes / ipc_codes in patent_data_unified from the bulk XML.
+
+Rows are processed in raw_xml_path order so every weekly archive is opened
+once and streamed sequentially (see patent_archives.py).
+Run classification_backfill.sql first to create the columns and indexes.
+"""
+import os
+import re
+import sys
+import time
+import psycopg2
+import psycopg2.extras
+
+from patent_archives import iter_archive_xml, iter_pending_archives, resolve_archive_paths, split_raw_xml_path
+
+DB = dict(host="localhost", port=5432, dbname="companies_db", user="postgres", password="qwklmn711")
+
+# Override port for remote runs via SSH tunnel (5555 on server)
+try:
+    if os.environ.get("DB_PORT"):
+        DB["port"] = int(os.environ["DB_PORT"])  # type: ignore
+except Exception:
+    pass
+
+BATCH = int(os.environ.get("BATCH", "20000"))
+
+RE_CPC = re.compile(r"(?is)<classification-cpc\b[^>]*>(.*?)</classification-cpc>")
+RE_IPC = re.compile(r"(?is)<classification-ipcr\b[^>]*>(.*?)</classification-ipcr>")
+RE_FIELD = {
+    name: re.compile(rf"(?is)<{name}>\s*([^<]*?)\s*</{name}>")
+    for name in ("section", "class", "subclass", "main-group", "subgroup")
+}
+
+
+def _format_code(block: str) -> str:
+    parts = {}
+    for name, rx in RE_FIELD.items():
+        m = rx.search(block)
+        parts[name] = m.group(1) if m else ""
+    if not (parts["section"] and parts["class"] and parts["subclass"]):
+        return ""
+    code = f"{parts['section']}{parts['class']}{parts['subclass']}".upper()
+    if parts["main-group"]:
+        code += parts["main-group"]
+        if parts["subgroup"]:
+            code += f"/{parts['subgroup']}"
+    return code
+
+
+def extract_classifications(data: bytes):
+    """Return (cpc_codes, ipc_codes) from one patent XML, main CPC first, de-duplicated."""
+    s = data.decode("utf-8", errors="ignore")
+    result = []
+    for rx in (RE_CPC, RE_IPC):
+        codes = []
+        for block in rx.findall(s):
+            code = _format_code(block)
+            if code and code not in codes:
+                codes.append(code)
+        result.append(codes)
+    return result[0], result[1]
+
+
+def classify_archive(archive_name: str, rows: list) -> list:
+    """Stream one archive and return (pub_number, cpc_codes, ipc_codes) for the rows found."""
+    by_member = {}
+    for r in rows:
+        parts = split_raw_xml_path(r["raw_xml_path"])
+        if parts:
+            by_member[parts[1]] = r["pub_number"]
+
+    paths = resolve_archive_paths(archive_name, rows[0]["year"])
+    if not paths:
+        print(f"archive not found: {archive_name} ({len(rows)} rows)", flush=True)
+        return []
+
+    out = []
+    pending = set(by_member)
+    for path in paths:
+        found = set()
+        for member, data in iter_archive_xml(path, pending):
+            cpc, ipc = extract_classifications(data)
+            out.append((by_member[member], cpc, ipc))
+            found.add(member)
+        pending -= found
+        if not pending:
+            break
+    return out
+
+
+def main() -> None:
+    conn = psycopg2.connect(**DB)
+    conn.autocommit = False
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    total_updated = 0
+    start = time.time()
+    for archive_name, rows in iter_pending_archives(cur, "cpc_codes IS NULL", (), BATCH):
+        if archive_name is None:
+            continue
+        t0 = time.time()
+        found = classify_archive(archive_name, rows)
+        if not found:
+            continue
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE patent_data_unified AS u
+            SET cpc_codes = v.cpc, ipc_codes = v.ipc
+            FROM (VALUES %s) AS v(pub_number, cpc, ipc)
+            WHERE u.pub_number = v.pub_number
+            """,
+            found,
+            template="(%s, %s::text[], %s::text[])",
+            page_size=1000,
+        )
+        conn.commit()
+        total_updated += len(found)
+        print(f"{archive_name}: {len(found)}/{len(rows)} classified "
+              f"in {time.time() - t0:.1f}s (total {total_updated})", flush=True)
+
+    dur = time.time() - start
+    print(f"done: total updated {total_updated} in {dur/60:.1f} min", flush=True)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        sys.exit(130)
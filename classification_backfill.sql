@@ -0,0 +1,40 @@
+-- Add CPC / IPC classification columns to patent_data_unified
+-- Purpose: Restrict candidate retrieval to a technology area before any text matching
+--
+-- Codes are stored normalized without spaces, e.g. 'H04W4/80', 'A01B63/32'.
+-- Filled by classification_backfill.py from the bulk XML (classification-cpc / classification-ipcr).
+
+ALTER TABLE patent_data_unified
+    ADD COLUMN IF NOT EXISTS cpc_codes TEXT[],
+    ADD COLUMN IF NOT EXISTS ipc_codes TEXT[];
+
+COMMENT ON COLUMN patent_data_unified.cpc_codes IS 'CPC classification codes (normalized, no spaces), main CPC first';
+COMMENT ON COLUMN patent_data_unified.ipc_codes IS 'IPC classification codes (normalized, no spaces)';
+
+-- Expand codes into every hierarchy level so prefix filters become array overlap:
+--   'H04W4/80' -> {'H', 'H04', 'H04W', 'H04W4', 'H04W4/80'}
+CREATE OR REPLACE FUNCTION cpc_prefix_expand(codes TEXT[])
+RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT COALESCE(array_agg(DISTINCT p), '{}')
+    FROM unnest(codes) AS c,
+         LATERAL unnest(ARRAY[left(c, 1), left(c, 3), left(c, 4), split_part(c, '/', 1), c]) AS p
+$$;
+
+-- GIN index used by the search services: cpc_prefix_expand(u.cpc_codes) && ARRAY['H04W', ...]
+CREATE INDEX IF NOT EXISTS patent_data_unified_cpc_prefix_idx
+    ON patent_data_unified USING GIN (cpc_prefix_expand(cpc_codes));
+
+CREATE INDEX IF NOT EXISTS patent_data_unified_ipc_prefix_idx
+    ON patent_data_unified USING GIN (cpc_prefix_expand(ipc_codes));
+
+-- Backfill progress: rows still to be classified
+CREATE INDEX IF NOT EXISTS patent_data_unified_cpc_pending_idx
+    ON patent_data_unified (raw_xml_path)
+    WHERE cpc_codes IS NULL;
+
+-- Verify
+SELECT count(*) FILTER (WHERE cpc_codes IS NOT NULL) AS classified,
+       count(*) FILTER (WHERE cpc_codes IS NULL) AS pending
+FROM patent_data_unified;
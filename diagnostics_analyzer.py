@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Diagnostics Analyzer - summarize logs/diagnostic_analysis.jsonl
+
+Python replacement for analyze_diagnostics.sh. The log written by
+patent_diagnostic_analyzer.go is split into byte ranges that worker
+processes read in parallel, one line at a time (constant memory per
+worker), parsing with orjson when installed.
+
+Aggregates:
+  - failure reasons, overall and per year / per archive
+  - DTD versions, archive / nested ZIP / XML found rates, XML structure flags
+  - one sample pub_number per failure reason
+
+Filters (--reason, --year, --archive) apply to the report and to --export,
+which writes the matching pub_numbers one per line for a targeted backfill.
+
+Usage:
+    python diagnostics_analyzer.py                                  # default log
+    python diagnostics_analyzer.py logs/diagnostic_analysis.jsonl --workers 16
+    python diagnostics_analyzer.py --reason nested_zip_not_found --year 2002 --export missing.txt
+    python diagnostics_analyzer.py --json > summary.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def parse_line(line: bytes):
+        return orjson.loads(line)
+except ImportError:  # orjson not installed, stdlib json is ~3x slower
+    def parse_line(line: bytes):
+        return json.loads(line)
+
+DEFAULT_LOG = os.environ.get('DIAGNOSTIC_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            'logs', 'diagnostic_analysis.jsonl'))
+
+# Smallest byte range handed to a worker; small logs are read in one piece
+MIN_CHUNK_BYTES = 8 * 1024 * 1024
+
+FOUND_FLAGS = ['archive_found', 'nested_zip_found', 'xml_file_found', 'xml_readable']
+STRUCTURE_FLAGS = ['has_application_reference', 'has_domestic_filing_data',
+                   'has_application_number_tag', 'has_doc_number_tag']
+
+
+def chunk_ranges(path: str, workers: int) -> List[Tuple[int, int]]:
+    """Split the file into byte ranges, a few per worker for load balancing."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    count = max(1, min(workers * 4, size // MIN_CHUNK_BYTES))
+    step = -(-size // count)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def iter_range_lines(path: str, start: int, end: int):
+    """
+    Lines whose first byte lies in [start, end).
+
+    A range that starts mid-line skips to the next line; that line belongs
+    to the previous range, which reads past its end to finish it.
+    """
+    with open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def matches(record: Dict, filters: Dict) -> bool:
+    if filters.get('reasons') and record.get('failure_reason') not in filters['reasons']:
+        return False
+    if filters.get('years') and record.get('year') not in filters['years']:
+        return False
+    if filters.get('archives') and record.get('archive_name') not in filters['archives']:
+        return False
+    return True
+
+
+def new_summary() -> Dict:
+    return {
+        'records': 0,
+        'matched': 0,
+        'parse_errors': 0,
+        'reasons': Counter(),
+        'by_year': defaultdict(Counter),
+        'by_archive': defaultdict(Counter),
+        'dtd_versions': Counter(),
+        'flags': Counter(),
+        'samples': {},
+    }
+
+
+def analyze_range(path: str, start: int, end: int, filters: Dict, export_part: Optional[str]) -> Dict:
+    """Worker: aggregate one byte range, writing matching pub_numbers to export_part."""
+    summary = new_summary()
+    out = open(export_part, 'w') if export_part else None
+    try:
+        for line in iter_range_lines(path, start, end):
+            if not line.strip():
+                continue
+            try:
+                record = parse_line(line)
+            except ValueError:
+                summary['parse_errors'] += 1
+                continue
+            summary['records'] += 1
+            if not matches(record, filters):
+                continue
+
+            summary['matched'] += 1
+            reason = record.get('failure_reason') or 'none'
+            summary['reasons'][reason] += 1
+            summary['by_year'][record.get('year') or 0][reason] += 1
+            summary['by_archive'][record.get('archive_name') or 'unknown'][reason] += 1
+            summary['dtd_versions'][record.get('dtd_version') or 'none'] += 1
+            for flag in FOUND_FLAGS + STRUCTURE_FLAGS:
+                if record.get(flag):
+                    summary['flags'][flag] += 1
+            if reason not in summary['samples']:
+                summary['samples'][reason] = f"{record.get('pub_number')} ({record.get('year')})"
+            if out and record.get('pub_number'):
+                out.write(record['pub_number'] + '\n')
+    finally:
+        if out:
+            out.close()
+    return summary
+
+
+def merge(total: Dict, part: Dict):
+    for key in ('records', 'matched', 'parse_errors'):
+        total[key] += part[key]
+    for key in ('reasons', 'dtd_versions', 'flags'):
+        total[key].update(part[key])
+    for key in ('by_year', 'by_archive'):
+        for group, counts in part[key].items():
+            total[key][group].update(counts)
+    for reason, sample in part['samples'].items():
+        total['samples'].setdefault(reason, sample)
+
+
+def analyze(path: str, workers: int, filters: Dict, export: Optional[str] = None) -> Dict:
+    ranges = chunk_ranges(path, workers)
+    parts = [f"{export}.part{i}" if export else None for i in range(len(ranges))]
+    summary = new_summary()
+
+    if len(ranges) <= 1 or workers <= 1:
+        for (start, end), part in zip(ranges, parts):
+            merge(summary, analyze_range(path, start, end, filters, part))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_range, path, start, end, filters, part)
+                       for (start, end), part in zip(ranges, parts)]
+            for future in futures:
+                merge(summary, future.result())
+
+    if export:
+        # Parts are concatenated in file order
+        with open(export, 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(part)
+    return summary
+
+
+def to_json(summary: Dict) -> Dict:
+    return {
+        'records': summary['records'],
+        'matched': summary['matched'],
+        'parse_errors': summary['parse_errors'],
+        'reasons': dict(summary['reasons'].most_common()),
+        'by_year': {str(year): dict(counts.most_common()) for year, counts in sorted(summary['by_year'].items())},
+        'by_archive': {archive: dict(counts.most_common()) for archive, counts in
+                       sorted(summary['by_archive'].items(), key=lambda item: -sum(item[1].values()))},
+        'dtd_versions': dict(summary['dtd_versions'].most_common()),
+        'flags': {flag: summary['flags'][flag] for flag in FOUND_FLAGS + STRUCTURE_FLAGS},
+        'samples': summary['samples'],
+    }
+
+
+def print_report(summary: Dict, top: int):
+    matched = summary['matched']
+    print("=== Diagnostic Analysis Report ===\n")
+    print(f"Records: {summary['records']:,}  matched filters: {matched:,}  parse errors: {summary['parse_errors']}\n")
+
+    print("Failure reasons:")
+    for reason, count in summary['reasons'].most_common():
+        print(f"  {count:>10,}  {reason}")
+
+    print("\nBy year:")
+    for year, counts in sorted(summary['by_year'].items()):
+        top_reasons = ', '.join(f"{reason} {count:,}" for reason, count in counts.most_common(3))
+        print(f"  {year}  {sum(counts.values()):>10,}  {top_reasons}")
+
+    archives = sorted(summary['by_archive'].items(), key=lambda item: -sum(item[1].values()))
+    print(f"\nTop {min(top, len(archives))} of {len(archives)} archives:")
+    for archive, counts in archives[:top]:
+        top_reasons = ', '.join(f"{reason} {count:,}" for reason, count in counts.most_common(2))
+        print(f"  {archive:<20} {sum(counts.values()):>8,}  {top_reasons}")
+
+    print("\nDTD versions:")
+    for dtd, count in summary['dtd_versions'].most_common(top):
+        print(f"  {count:>10,}  {dtd}")
+
+    print("\nArchive / XML access:")
+    for flag in FOUND_FLAGS:
+        count = summary['flags'][flag]
+        print(f"  {flag:<28} {count:>10,} yes  {matched - count:>10,} no")
+
+    print("\nXML structure:")
+    for flag in STRUCTURE_FLAGS:
+        print(f"  {flag:<28} {summary['flags'][flag]:>10,}")
+
+    print("\nSample per failure reason:")
+    for reason, sample in summary['samples'].items():
+        print(f"  {reason:<40} {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', default=DEFAULT_LOG, help='Diagnostic JSONL log')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--reason', action='append', default=[], help='Only this failure_reason (repeatable)')
+    parser.add_argument('--year', action='append', type=int, default=[], help='Only this year (repeatable)')
+    parser.add_argument('--archive', action='append', default=[], help='Only this archive_name (repeatable)')
+    parser.add_argument('--export', help='Write matching pub_numbers to this file')
+    parser.add_argument('--top', type=int, default=20, help='Archives / DTD versions listed')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"Error: Log file not found: {args.log}")
+        print("Run ./run_diagnostic.sh first")
+        sys.exit(1)
+
+    filters = {'reasons': set(args.reason), 'years': set(args.year), 'archives': set(args.archive)}
+    start = time.time()
+    summary = analyze(args.log, args.workers, filters, args.export)
+    elapsed = time.time() - start
+
+    if args.json:
+        print(json.dumps(to_json(summary), indent=2))
+    else:
+        print_report(summary, args.top)
+        size_mb = os.path.getsize(args.log) / 1e6
+        print(f"\nAnalyzed {size_mb:,.1f} MB in {elapsed:.2f}s ({size_mb / max(elapsed, 1e-9):,.0f} MB/s)")
+    if args.export:
+        print(f"Exported {summary['matched']:,} pub_numbers to {args.export}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
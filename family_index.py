@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Build the patent family index (patent_families) from the bulk XML.
+
+A publication belongs to the family of every application it is tied to:
+its own application (A1, A9 and later republications of one application),
+the parent / child applications of its continuity data (continuation,
+continuation-in-part, division, reissue, ...), its provisionals and its
+foreign / PCT priority claims. Two steps, both resumable:
+
+  links   Streams the weekly archives in raw_xml_path order (like
+          claims_backfill.py --archives), reads only the bibliographic
+          section of each XML and stores the publication's application and
+          linked applications in patent_family_links. Publications already
+          in that table are skipped, so after loading new weekly data only
+          the new publications are read.
+
+  build   Union-find over all links (patent_data_unified.application_number
+          for publications without a links row) and rewrites patent_families
+          with one row per publication of a family of two or more:
+          (pub_number, family_id, family_size), family_id being the lowest
+          pub_number of the family. The new table is swapped in atomically.
+
+Pre-2005 documents have no us-related-documents section and contribute their
+own application only. An application claimed by more than
+FAMILY_MAX_LINK_PUBLICATIONS publications is treated as a data error and not
+followed, so one bad priority number cannot merge unrelated families.
+
+Usage:
+    python family_index.py links [--year 2016]
+    python family_index.py build
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from array import array
+
+import psycopg2
+import psycopg2.extras
+
+from patent_archives import iter_archive_xml, iter_pending_archives, resolve_archive_paths, split_raw_xml_path
+from patent_document import parse_bibliographic
+
+DB = dict(host="localhost", port=5432, dbname="companies_db", user="postgres", password="qwklmn711")
+
+# Override port for remote runs via SSH tunnel (5555 on server)
+try:
+    if os.environ.get("DB_PORT"):
+        DB["port"] = int(os.environ["DB_PORT"])  # type: ignore
+except Exception:
+    pass
+
+BATCH = int(os.environ.get("BATCH", "3000"))
+FAMILY_MAX_LINK_PUBLICATIONS = int(os.environ.get("FAMILY_MAX_LINK_PUBLICATIONS", "500"))
+
+RE_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+# Shorter numbers are placeholders or truncated data
+MIN_NUMBER_LENGTH = 6
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS patent_family_links (
+    pub_number   TEXT PRIMARY KEY,
+    application  TEXT,
+    links        TEXT[] NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS patent_families (
+    pub_number   TEXT PRIMARY KEY,
+    family_id    TEXT NOT NULL,
+    family_size  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS patent_families_family_idx ON patent_families (family_id);
+"""
+
+
+def application_key(country: str, number: str):
+    """'US:16123456' style node key of an application, None if the number is unusable."""
+    number = RE_NON_ALNUM.sub("", (number or "").upper())
+    if len(number) < MIN_NUMBER_LENGTH:
+        return None
+    return f"{(country or 'US').upper()}:{number}"
+
+
+def family_links(data: bytes) -> tuple:
+    """(own application key, sorted linked application keys) of one patent XML."""
+    try:
+        doc = parse_bibliographic(data)
+    except Exception:
+        return None, []
+    own = application_key(doc.application.country, doc.application.doc_number)
+    links = {application_key(d.country, d.doc_number)
+             for d in doc.related + doc.provisionals + doc.priority_claims}
+    links.discard(None)
+    links.discard(own)
+    return own, sorted(links)
+
+
+def links_from_archive(archive_name: str, rows: list) -> list:
+    """Stream one archive; (pub_number, application, links) for every row of it."""
+    by_member = {}
+    for r in rows:
+        parts = split_raw_xml_path(r["raw_xml_path"])
+        if parts:
+            by_member[parts[1]] = r["pub_number"]
+
+    paths = resolve_archive_paths(archive_name, rows[0]["year"])
+    if not paths:
+        print(f"archive not found: {archive_name} ({len(rows)} rows)", flush=True)
+        return []
+
+    out = {}
+    pending = set(by_member)
+    for path in paths:
+        found = set()
+        for member, data in iter_archive_xml(path, pending):
+            out[by_member[member]] = family_links(data)
+            found.add(member)
+        pending -= found
+        if not pending:
+            break
+    # Members missing from the archive get an empty row (build falls back to
+    # application_number) so later runs do not stream the archive again
+    return [(pub, *out.get(pub, (None, []))) for pub in by_member.values()]
+
+
+def collect_links(year=None) -> None:
+    conn = psycopg2.connect(**DB)
+    conn.autocommit = False
+    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    cur.execute(TABLES_SQL)
+    conn.commit()
+    total_rows = 0
+    total_linked = 0
+    skipped = 0
+    start = time.time()
+    archives = iter_pending_archives(
+        cur,
+        "NOT EXISTS (SELECT 1 FROM patent_family_links l WHERE l.pub_number = u.pub_number) "
+        "AND (%s::int IS NULL OR year = %s::int)",
+        (year, year), BATCH,
+    )
+    for archive_name, rows in archives:
+        if archive_name is None:
+            skipped += len(rows)
+            continue
+        t0 = time.time()
+        link_rows = links_from_archive(archive_name, rows)
+        if not link_rows:
+            continue
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO patent_family_links (pub_number, application, links)
+            VALUES %s
+            ON CONFLICT (pub_number)
+            DO UPDATE SET application = EXCLUDED.application, links = EXCLUDED.links
+            """,
+            link_rows,
+            template="(%s, %s, %s::text[])",
+            page_size=1000,
+        )
+        conn.commit()
+        linked = sum(1 for r in link_rows if r[2])
+        total_rows += len(link_rows)
+        total_linked += linked
+        print(f"{archive_name}: {len(link_rows)} rows, {linked} with related applications "
+              f"in {time.time() - t0:.1f}s (total {total_rows})", flush=True)
+
+    dur = time.time() - start
+    print(f"done: {total_rows} publications read, {total_linked} with related applications "
+          f"({skipped} rows not in an archive) in {dur/60:.1f} min", flush=True)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self):
+        self.parent = array("i")
+        self.size = array("i")
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def compute_families(rows) -> list:
+    """
+    (pub_number, family_id, family_size) for every publication in a family
+    of two or more, from (pub_number, application key, link keys) rows.
+    """
+    nodes = {}
+    sets = UnionFind()
+    link_counts = array("i")
+    pubs, pub_nodes = [], array("i")
+    edges_a, edges_b = array("i"), array("i")
+
+    def node(key):
+        n = nodes.get(key)
+        if n is None:
+            n = nodes[key] = sets.add()
+            link_counts.append(0)
+        return n
+
+    for pub_number, application, links in rows:
+        linked = [node(key) for key in links or ()]
+        for n in linked:
+            link_counts[n] += 1
+        if application:
+            own = node(application)
+        elif linked:
+            own = linked[0]
+        else:
+            continue
+        pubs.append(pub_number)
+        pub_nodes.append(own)
+        for n in linked:
+            edges_a.append(own)
+            edges_b.append(n)
+
+    oversized = 0
+    for a, b in zip(edges_a, edges_b):
+        if link_counts[b] > FAMILY_MAX_LINK_PUBLICATIONS:
+            oversized += 1
+            continue
+        sets.union(a, b)
+    if oversized:
+        print(f"ignored {oversized} links to applications claimed by more than "
+              f"{FAMILY_MAX_LINK_PUBLICATIONS} publications", flush=True)
+    del nodes, edges_a, edges_b
+
+    members = {}
+    for pub_number, n in zip(pubs, pub_nodes):
+        members.setdefault(sets.find(n), []).append(pub_number)
+
+    out = []
+    for family in members.values():
+        if len(family) < 2:
+            continue
+        family_id = min(family)
+        out.extend((pub_number, family_id, len(family)) for pub_number in family)
+    return out
+
+
+def build_families() -> None:
+    start = time.time()
+    conn = psycopg2.connect(**DB)
+    conn.autocommit = False
+    cur = conn.cursor()
+    cur.execute(TABLES_SQL)
+    conn.commit()
+
+    read = conn.cursor(name="family_index_build")
+    read.itersize = 20000
+    read.execute(
+        """
+        SELECT u.pub_number, l.application, l.links, u.application_number
+        FROM patent_data_unified u
+        LEFT JOIN patent_family_links l ON l.pub_number = u.pub_number
+        WHERE u.pub_number IS NOT NULL
+        """
+    )
+    rows = ((pub, application or application_key("US", application_number), links)
+            for pub, application, links, application_number in read)
+    families = compute_families(rows)
+    read.close()
+    family_count = len({f[1] for f in families})
+    print(f"{len(families)} publications in {family_count} families "
+          f"({(time.time() - start) / 60:.1f} min)", flush=True)
+
+    # Fill a new table and swap it in, so searches never see a partial index
+    cur.execute("DROP TABLE IF EXISTS patent_families_new")
+    cur.execute(
+        """
+        CREATE TABLE patent_families_new (
+            pub_number   TEXT PRIMARY KEY,
+            family_id    TEXT NOT NULL,
+            family_size  INTEGER NOT NULL
+        )
+        """
+    )
+    psycopg2.extras.execute_values(
+        cur, "INSERT INTO patent_families_new (pub_number, family_id, family_size) VALUES %s",
+        families, page_size=5000,
+    )
+    cur.execute("CREATE INDEX patent_families_new_family_idx ON patent_families_new (family_id)")
+    cur.execute("ANALYZE patent_families_new")
+    cur.execute("DROP TABLE patent_families")
+    cur.execute("ALTER TABLE patent_families_new RENAME TO patent_families")
+    cur.execute("ALTER INDEX patent_families_new_pkey RENAME TO patent_families_pkey")
+    cur.execute("ALTER INDEX patent_families_new_family_idx RENAME TO patent_families_family_idx")
+    conn.commit()
+    conn.close()
+    print(f"done: patent_families rebuilt in {(time.time() - start) / 60:.1f} min", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["links", "build"])
+    parser.add_argument("--year", type=int, help="Only rows of this year (links)")
+    args = parser.parse_args()
+    try:
+        if args.command == "links":
+            collect_links(args.year)
+        else:
+            build_families()
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        sys.exit(130)
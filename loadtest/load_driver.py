@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Search Load Driver
+Simulates N analysts running searches concurrently against a search service
+(/api/professional-search + /api/search-progress polling, as the UI does).
+
+Reports end-to-end search latency (submit -> stage 'complete'),
+p50/p95/p99, throughput, errors and the service's memory growth
+(RSS read from /proc/<pid>/status).
+
+Usage:
+    python loadtest/load_driver.py --url http://localhost:8093 --analysts 10 --searches 5 \
+        --pid $(pgrep -f patent_search_ai_fixed.py)
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+import synthetic  # noqa: E402
+
+
+def read_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class LoadRun:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = []
+        self.stages = {}
+        self.rss = []
+        self.done = threading.Event()
+
+    def record(self, latency=None, error=None):
+        with self.lock:
+            if error:
+                self.errors.append(error)
+            else:
+                self.latencies.append(latency)
+
+    def search(self, session: requests.Session, analyst: int, n: int):
+        args = self.args
+        body = {'invention_description': synthetic.description_text(seed=analyst * 1000 + n, words=args.words)}
+        if args.cpc:
+            body['cpc'] = args.cpc
+
+        start = time.time()
+        try:
+            r = session.post(f"{args.url}/api/professional-search", json=body, timeout=30)
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            self.record(error=f"submit: {e}")
+            return
+        if r.status_code != 200 or not data.get('success'):
+            self.record(error=f"submit HTTP {r.status_code}: {data.get('error', '')}")
+            return
+
+        search_id = data['search_id']
+        while time.time() - start < args.timeout:
+            time.sleep(args.poll_interval)
+            try:
+                progress = session.get(f"{args.url}/api/search-progress/{search_id}", timeout=30).json()
+            except (requests.RequestException, ValueError) as e:
+                self.record(error=f"poll: {e}")
+                return
+            stage = progress.get('stage')
+            with self.lock:
+                self.stages[stage] = self.stages.get(stage, 0) + 1
+            if stage == 'complete':
+                self.record(latency=time.time() - start)
+                return
+            if stage in ('error', 'not_found'):
+                self.record(error=f"search {stage}: {progress.get('error', '')}")
+                return
+        self.record(error='client timeout')
+
+    def analyst(self, analyst: int):
+        session = requests.Session()
+        for n in range(self.args.searches):
+            self.search(session, analyst, n)
+            if self.args.think_time:
+                time.sleep(self.args.think_time)
+
+    def sample_memory(self):
+        while not self.done.is_set():
+            rss = read_rss_mb(self.args.pid)
+            if rss is not None:
+                self.rss.append((time.time(), rss))
+            self.done.wait(1.0)
+
+    def run(self) -> dict:
+        args = self.args
+        sampler = None
+        if args.pid:
+            sampler = threading.Thread(target=self.sample_memory, daemon=True)
+            sampler.start()
+
+        start = time.time()
+        threads = []
+        for analyst in range(args.analysts):
+            t = threading.Thread(target=self.analyst, args=(analyst,), daemon=True)
+            t.start()
+            threads.append(t)
+            time.sleep(args.ramp_up / max(args.analysts, 1))
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+
+        self.done.set()
+        if sampler:
+            sampler.join()
+            final = read_rss_mb(args.pid)
+            if final is not None:
+                self.rss.append((time.time(), final))
+
+        lat = self.latencies
+        report = {
+            'analysts': args.analysts,
+            'searches_requested': args.analysts * args.searches,
+            'completed': len(lat),
+            'errors': len(self.errors),
+            'elapsed_seconds': round(elapsed, 1),
+            'throughput_per_min': round(len(lat) / elapsed * 60, 2) if elapsed else 0,
+            'latency_seconds': {
+                'min': round(min(lat), 2) if lat else 0,
+                'p50': round(percentile(lat, 50), 2),
+                'p95': round(percentile(lat, 95), 2),
+                'p99': round(percentile(lat, 99), 2),
+                'max': round(max(lat), 2) if lat else 0,
+                'mean': round(statistics.mean(lat), 2) if lat else 0,
+            },
+            'poll_stages': self.stages,
+            'error_samples': self.errors[:10],
+        }
+        if self.rss:
+            values = [v for _, v in self.rss]
+            report['service_rss_mb'] = {
+                'start': round(values[0], 1),
+                'peak': round(max(values), 1),
+                'end': round(values[-1], 1),
+                'growth': round(values[-1] - values[0], 1),
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8093', help='Search service base URL')
+    parser.add_argument('--analysts', type=int, default=5, help='Concurrent simulated analysts')
+    parser.add_argument('--searches', type=int, default=3, help='Searches per analyst')
+    parser.add_argument('--words', type=int, default=120, help='Invention description length')
+    parser.add_argument('--cpc', default='', help='Optional CPC prefix filter, e.g. H04W')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Progress poll interval (UI uses 1s)')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Pause between an analyst\'s searches')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='Seconds to start all analysts')
+    parser.add_argument('--timeout', type=float, default=1800.0, help='Give up on a search after this long')
+    parser.add_argument('--pid', type=int, default=None, help='Service PID for RSS sampling')
+    parser.add_argument('--json-out', default=None, help='Write the report as JSON')
+    args = parser.parse_args()
+
+    print(f"Load test: {args.analysts} analysts x {args.searches} searches against {args.url}")
+    report = LoadRun(args).run()
+
+    lat = report['latency_seconds']
+    print("\n" + "=" * 60)
+    print(f"Completed:   {report['completed']}/{report['searches_requested']}  errors: {report['errors']}")
+    print(f"Elapsed:     {report['elapsed_seconds']}s  throughput: {report['throughput_per_min']} searches/min")
+    print(f"Latency (s): p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    if 'service_rss_mb' in report:
+        rss = report['service_rss_mb']
+        print(f"Service RSS: {rss['start']} -> {rss['end']} MB (peak {rss['peak']}, growth {rss['growth']:+})")
+    for err in report['error_samples']:
+        print(f"  error: {err}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report: {args.json_out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama Server
+Stand-in for Ollama's /api/generate so the search services can be load
+tested without a GPU and a 20B model.
+
+Responses follow the scoring format the services parse
+("Score: NN/100" + "Reasoning: ..."), with a score derived from the prompt
+so repeated runs are reproducible. Timing is simulated:
+
+    total = queue wait + prompt latency (--latency) + tokens / --tokens-per-sec
+
+--parallel limits concurrent generations like OLLAMA_NUM_PARALLEL; extra
+requests queue. --failure-rate returns HTTP 500, --timeout-rate hangs for
+--hang-seconds (longer than the services' client timeouts).
+
+Usage:
+    python loadtest/mock_ollama.py --port 11434 --latency lognormal:800,0.5 --tokens-per-sec 35
+    OLLAMA_URL=http://localhost:11434/api/generate python3.11 patent_search_ai_fixed.py
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+REASONS = [
+    "Both describe a similar mechanical arrangement, but the patent targets a different application domain.",
+    "The patent shares the core control concept and sensing approach with the described invention.",
+    "Only the general field overlaps; the claimed structure and purpose are different.",
+    "The claims cover nearly the same combination of components and their interaction.",
+]
+
+
+class LatencyModel:
+    """Prompt-processing latency in seconds: fixed:MS, uniform:MIN,MAX or lognormal:MEDIAN_MS,SIGMA."""
+
+    def __init__(self, spec: str):
+        kind, _, args = spec.partition(':')
+        values = [float(v) for v in args.split(',') if v]
+        if kind == 'fixed' and len(values) == 1:
+            self.sample = lambda: values[0] / 1000
+        elif kind == 'uniform' and len(values) == 2:
+            self.sample = lambda: random.uniform(values[0], values[1]) / 1000
+        elif kind == 'lognormal' and len(values) == 2:
+            mu = math.log(values[0] / 1000)
+            self.sample = lambda: random.lognormvariate(mu, values[1])
+        else:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+
+class MockOllama:
+    def __init__(self, args):
+        self.args = args
+        self.latency = LatencyModel(args.latency)
+        self.slots = threading.Semaphore(args.parallel)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'completed': 0, 'failed': 0, 'hung': 0, 'in_flight': 0, 'queued': 0}
+
+    def count(self, key: str, delta: int = 1):
+        with self.lock:
+            self.stats[key] += delta
+
+    def response_text(self, prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode('utf-8', errors='ignore')).digest()
+        score = 1 + digest[0] % 100
+        reason = REASONS[digest[1] % len(REASONS)]
+        return f"Score: {score}/100\nReasoning: {reason}"
+
+    def tokens(self, text: str, num_predict: int) -> list:
+        """Split into ~token-sized pieces, padded up to the requested length like a verbose model."""
+        pieces = [w + ' ' for w in text.split(' ')]
+        target = min(num_predict, max(len(pieces), self.args.tokens))
+        filler = ' '.join(REASONS).split(' ')
+        while len(pieces) < target:
+            pieces.append(filler[len(pieces) % len(filler)] + ' ')
+        return pieces[:max(target, 1)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'MockOllama/1.0'
+    mock: MockOllama = None
+
+    def log_message(self, fmt, *args):
+        pass  # request logging is done in do_POST
+
+    def _json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._json(200, {'models': [{'name': self.mock.args.model}]})
+        elif self.path == '/stats':
+            with self.mock.lock:
+                self._json(200, dict(self.mock.stats))
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self._json(404, {'error': 'not found'})
+            return
+
+        mock = self.mock
+        args = mock.args
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._json(400, {'error': 'invalid JSON'})
+            return
+
+        mock.count('requests')
+        prompt = request.get('prompt', '')
+        options = request.get('options') or {}
+        stream = request.get('stream', True)  # Ollama streams unless told otherwise
+
+        roll = random.random()
+        if roll < args.failure_rate:
+            mock.count('failed')
+            self._json(500, {'error': 'mock failure injected'})
+            return
+        if roll < args.failure_rate + args.timeout_rate:
+            mock.count('hung')
+            time.sleep(args.hang_seconds)
+            self._json(503, {'error': 'mock timeout injected'})
+            return
+
+        start = time.time()
+        mock.count('queued')
+        with mock.slots:
+            mock.count('queued', -1)
+            mock.count('in_flight')
+            try:
+                self._generate(request, prompt, options, stream, start)
+            finally:
+                mock.count('in_flight', -1)
+        mock.count('completed')
+
+    def _generate(self, request: dict, prompt: str, options: dict, stream: bool, start: float):
+        mock = self.mock
+        args = mock.args
+        model = request.get('model', args.model)
+        prompt_tokens = max(1, len(prompt) // 4)
+
+        prompt_seconds = mock.latency.sample()
+        time.sleep(prompt_seconds)
+
+        pieces = mock.tokens(mock.response_text(prompt), int(options.get('num_predict', args.tokens)))
+        per_token = 1.0 / args.tokens_per_sec
+
+        def final_fields(response_text: str) -> dict:
+            total_ns = int((time.time() - start) * 1e9)
+            return {
+                'model': model,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'response': response_text,
+                'done': True,
+                'done_reason': 'stop',
+                'total_duration': total_ns,
+                'load_duration': 0,
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int(prompt_seconds * 1e9),
+                'eval_count': len(pieces),
+                'eval_duration': int(len(pieces) * per_token * 1e9),
+            }
+
+        if not stream:
+            time.sleep(len(pieces) * per_token)
+            self._json(200, final_fields(''.join(pieces).strip()))
+            logger.info(f"generate {prompt_tokens} prompt tok, {len(pieces)} tok in {time.time() - start:.2f}s")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        try:
+            for piece in pieces:
+                time.sleep(per_token)
+                chunk = {'model': model, 'created_at': datetime.now(timezone.utc).isoformat(),
+                         'response': piece, 'done': False}
+                self.wfile.write(json.dumps(chunk).encode() + b'\n')
+                self.wfile.flush()
+            self.wfile.write(json.dumps(final_fields('')).encode() + b'\n')
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("client disconnected during stream")
+        logger.info(f"stream {prompt_tokens} prompt tok, {len(pieces)} tok in {time.time() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--model', default='gpt-oss:20b')
+    parser.add_argument('--latency', default='lognormal:800,0.5',
+                        help='Prompt latency: fixed:MS | uniform:MIN,MAX | lognormal:MEDIAN_MS,SIGMA')
+    parser.add_argument('--tokens-per-sec', type=float, default=35.0, help='Generation speed per request')
+    parser.add_argument('--tokens', type=int, default=80, help='Response length (capped by num_predict)')
+    parser.add_argument('--parallel', type=int, default=1, help='Concurrent generations (OLLAMA_NUM_PARALLEL)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Fraction of requests that hang')
+    parser.add_argument('--hang-seconds', type=float, default=150.0, help='How long hung requests block')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    Handler.mock = MockOllama(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    logger.info(f"Mock Ollama on http://{args.host}:{args.port}/api/generate "
+                f"(latency {args.latency}, {args.tokens_per_sec} tok/s, parallel {args.parallel}, "
+                f"failures {args.failure_rate:.0%}, timeouts {args.timeout_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Seed a local Postgres database for load tests.
+
+Creates patent_data_unified (same columns as patent_extractor.go writes,
+plus the classification columns) in a separate database and fills it with
+synthetic patents from benchmarks/synthetic.py. Point the services at it
+with DB_NAME.
+
+Usage:
+    python loadtest/seed_db.py --rows 50000
+    DB_NAME=patents_loadtest OLLAMA_URL=http://localhost:11434/api/generate \
+        python3.11 patent_search/patent_search_ai_fixed.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extras
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+import synthetic  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patent_data_unified (
+    pub_number TEXT PRIMARY KEY,
+    title TEXT,
+    abstract_text TEXT,
+    description_text TEXT,
+    claims_text TEXT,
+    description_body TEXT,
+    filing_date DATE,
+    pub_date DATE,
+    inventors JSONB,
+    assignees JSONB,
+    raw_xml_path TEXT,
+    year INTEGER,
+    application_number TEXT
+)
+"""
+
+CPC_CODES = ['H04W4/80', 'H04L67/12', 'G06F3/01', 'G06N20/00', 'A01C7/20', 'A01B63/32',
+             'B60W30/09', 'F02D41/00', 'H01L21/02', 'A61B5/00']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='Drop existing rows first')
+    args = parser.parse_args()
+
+    db_name = os.environ.get('DB_NAME', 'patents_loadtest')
+    if db_name == 'companies_db':
+        print("Refusing to seed the production database (DB_NAME=companies_db)")
+        sys.exit(1)
+
+    conn = psycopg2.connect(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        port=int(os.environ.get('DB_PORT', 5432)),
+        database=db_name,
+        user=os.environ.get('DB_USER', 'mark'),
+        password=os.environ.get('DB_PASSWORD', 'mark123'),
+    )
+    cur = conn.cursor()
+    cur.execute(SCHEMA)
+    # Classification columns, cpc_prefix_expand() and indexes used by the search filters
+    cur.execute((REPO_ROOT / 'classification_backfill.sql').read_text())
+    if args.reset:
+        cur.execute("TRUNCATE patent_data_unified")
+    conn.commit()
+
+    rng = random.Random(args.seed)
+    batch = 2000
+    for start in range(0, args.rows, batch):
+        rows = synthetic.generate_corpus(min(batch, args.rows - start), seed=args.seed * 1000003 + start)
+        values = []
+        for i, row in enumerate(rows):
+            year = rng.randint(2005, 2025)
+            pub_number = f"{year}{start + i:07d}"
+            values.append((
+                pub_number, row['title'], row['abstract_text'], row['description_text'],
+                f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", year,
+                json.dumps([{'name': 'Jane Doe'}]),
+                json.dumps([{'name': rng.choice(['Synthetic Devices Inc.', 'Acme Corp', 'Example GmbH'])}]),
+                f"I{year}0101.tar/US{pub_number}A1-{year}0101/US{pub_number}A1-{year}0101.XML",
+                rng.sample(CPC_CODES, 2),
+            ))
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO patent_data_unified
+                (pub_number, title, abstract_text, description_text, pub_date, year,
+                 inventors, assignees, raw_xml_path, cpc_codes)
+            VALUES %s
+            ON CONFLICT (pub_number) DO NOTHING
+        """, values, template="(%s, %s, %s, %s, %s::date, %s, %s::jsonb, %s::jsonb, %s, %s::text[])")
+        conn.commit()
+        print(f"seeded {start + len(rows)}/{args.rows}", flush=True)
+
+    cur.execute("ANALYZE patent_data_unified")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Convert patent_data_unified into a table range-partitioned by year.
+
+Every search variant scans all publication years; with one partition per
+year, searches bounded by year or publication date (see
+patent_search/search_filters.py) only touch the partitions they need.
+Rows with year 0 / NULL (no publication date parsed) and years without a
+partition go to patent_data_unified_default.
+
+Steps (stop patent_extractor.go and the backfill scripts first):
+
+    python partition_unified.py plan      # years, row counts, indexes to rebuild
+    python partition_unified.py migrate   # build patent_data_unified_part, resumable
+    python partition_unified.py swap      # verify counts, rename tables in one transaction
+    python partition_unified.py add-year 2027
+
+migrate copies one year at a time and skips years already copied, so it
+can be re-run after an interruption. Columns, defaults, generated (FTS)
+columns and CHECK constraints come from the old table; its indexes are
+rebuilt on the partitioned table. The primary key becomes (pub_number, year):
+run the extractor with UNIFIED_PARTITIONED=1 afterwards so its upsert uses
+ON CONFLICT (pub_number, year). The backfill scripts keep working
+unchanged: they update by pub_number, the leading column of the new key.
+The old table is kept as patent_data_unified_unpartitioned until dropped
+by hand.
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+import psycopg2
+
+DB = dict(host="localhost", port=5432, dbname="companies_db", user="postgres", password="qwklmn711")
+
+# Override port for remote runs via SSH tunnel (5555 on server)
+try:
+    if os.environ.get("DB_PORT"):
+        DB["port"] = int(os.environ["DB_PORT"])  # type: ignore
+except Exception:
+    pass
+
+SOURCE = "patent_data_unified"
+TARGET = "patent_data_unified_part"
+RETIRED = "patent_data_unified_unpartitioned"
+DEFAULT_PARTITION = "patent_data_unified_default"
+# Suffix of the new indexes until the swap gives them the old names
+INDEX_SUFFIX = "_part"
+
+MIN_YEAR, MAX_YEAR = 1976, 2100
+
+
+def partition_name(year: int) -> str:
+    return f"patent_data_unified_y{year}"
+
+
+def table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cur.fetchone()[0]
+
+
+def copy_columns(cur, table: str) -> list:
+    """Columns to copy; generated columns are recomputed by the target."""
+    cur.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """,
+        (table,),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def source_years(cur) -> dict:
+    """Row count per partition year of the source table (0 = default partition)."""
+    cur.execute(
+        f"""
+        SELECT CASE WHEN year BETWEEN %s AND %s THEN year ELSE 0 END, count(*)
+        FROM {SOURCE} GROUP BY 1 ORDER BY 1
+        """,
+        (MIN_YEAR, MAX_YEAR),
+    )
+    return dict(cur.fetchall())
+
+
+def source_indexes(cur, table: str = SOURCE) -> list:
+    """(name, is_primary, is_unique, definition) of the indexes on a table."""
+    cur.execute(
+        """
+        SELECT c.relname, ix.indisprimary, ix.indisunique, pg_get_indexdef(ix.indexrelid)
+        FROM pg_index ix JOIN pg_class c ON c.oid = ix.indexrelid
+        WHERE ix.indrelid = %s::regclass
+        ORDER BY c.relname
+        """,
+        (table,),
+    )
+    return cur.fetchall()
+
+
+def target_index_sql(name: str, definition: str) -> str:
+    """Rewrite an index definition of the source table for the partitioned table."""
+    sql = re.sub(r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+",
+                 lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS {name}{INDEX_SUFFIX} ON {TARGET}",
+                 definition, count=1)
+    if sql == definition:
+        raise ValueError(f"Unexpected index definition: {definition}")
+    return sql
+
+
+def plan(cur) -> None:
+    years = source_years(cur)
+    total = sum(years.values())
+    print(f"{SOURCE}: {total:,} rows")
+    for year, count in years.items():
+        name = partition_name(year) if year else DEFAULT_PARTITION
+        print(f"  {name:<32} {count:>12,}")
+    print("\nIndexes:")
+    for name, primary, unique, definition in source_indexes(cur):
+        if primary:
+            print(f"  {name}: primary key -> PRIMARY KEY (pub_number, year)")
+        elif unique and not re.search(r"\byear\b", definition):
+            print(f"  {name}: SKIPPED, unique without year cannot be enforced per partition")
+        else:
+            print(f"  {name}: rebuilt")
+    if table_exists(cur, TARGET):
+        print(f"\n{TARGET} exists; migrate resumes it")
+
+
+def create_target(cur, years) -> None:
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TARGET}
+            (LIKE {SOURCE} INCLUDING ALL EXCLUDING INDEXES)
+            PARTITION BY RANGE (year)
+        """
+    )
+    # Keep a year partition ahead so next year's publications do not land in DEFAULT
+    last = max(max(years, default=0), datetime.date.today().year + 1)
+    first = min((y for y in years if y), default=last)
+    for year in range(first, last + 1):
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF {TARGET} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            (year, year + 1),
+        )
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TARGET} DEFAULT")
+
+
+def copy_year(cur, year: int, columns: list) -> int:
+    """Copy one partition's rows; year 0 copies everything bound for DEFAULT."""
+    select = ", ".join("COALESCE(year, 0)" if c == "year" else c for c in columns)
+    if year:
+        where, params = "year = %s", (year,)
+        partition = partition_name(year)
+    else:
+        where, params = "year IS NULL OR year NOT BETWEEN %s AND %s", (MIN_YEAR, MAX_YEAR)
+        partition = DEFAULT_PARTITION
+    cur.execute(f"TRUNCATE {partition}")
+    cur.execute(
+        f"INSERT INTO {TARGET} ({', '.join(columns)}) SELECT {select} FROM {SOURCE} WHERE {where}",
+        params,
+    )
+    return cur.rowcount
+
+
+def target_years(cur) -> dict:
+    cur.execute(
+        f"""
+        SELECT CASE WHEN year BETWEEN %s AND %s THEN year ELSE 0 END, count(*)
+        FROM {TARGET} GROUP BY 1
+        """,
+        (MIN_YEAR, MAX_YEAR),
+    )
+    return dict(cur.fetchall())
+
+
+def migrate(conn, cur) -> None:
+    # Per-year copies filter on year; without an index each one scans the whole table
+    cur.execute(f"CREATE INDEX IF NOT EXISTS patent_data_unified_year_idx ON {SOURCE} (year)")
+    conn.commit()
+
+    years = source_years(cur)
+    create_target(cur, years)
+    conn.commit()
+
+    columns = copy_columns(cur, SOURCE)
+    copied = target_years(cur)
+    start = time.time()
+    for year, count in years.items():
+        name = year or "default"
+        if copied.get(year) == count:
+            print(f"{name}: {count:,} rows already copied", flush=True)
+            continue
+        t0 = time.time()
+        rows = copy_year(cur, year, columns)
+        conn.commit()
+        print(f"{name}: {rows:,} rows in {time.time() - t0:.1f}s", flush=True)
+
+    t0 = time.time()
+    cur.execute(
+        f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{TARGET}_pkey') THEN
+                ALTER TABLE {TARGET} ADD CONSTRAINT {TARGET}_pkey PRIMARY KEY (pub_number, year);
+            END IF;
+        END $$
+        """
+    )
+    conn.commit()
+    print(f"primary key (pub_number, year) in {time.time() - t0:.1f}s", flush=True)
+
+    for name, primary, unique, definition in source_indexes(cur):
+        if primary:
+            continue
+        if unique and not re.search(r"\byear\b", definition):
+            print(f"skipped {name}: unique without year", flush=True)
+            continue
+        t0 = time.time()
+        cur.execute(target_index_sql(name, definition))
+        conn.commit()
+        print(f"index {name} in {time.time() - t0:.1f}s", flush=True)
+
+    cur.execute(f"ANALYZE {TARGET}")
+    conn.commit()
+    print(f"migrate done in {(time.time() - start) / 60:.1f} min; run 'swap' next", flush=True)
+
+
+def swap(conn, cur) -> None:
+    if not table_exists(cur, TARGET):
+        print(f"{TARGET} does not exist; run 'migrate' first")
+        sys.exit(1)
+
+    # Blocks readers and writers until the renames commit
+    cur.execute(f"LOCK TABLE {SOURCE} IN ACCESS EXCLUSIVE MODE")
+    expected, copied = source_years(cur), target_years(cur)
+    missing = {year: (count, copied.get(year, 0)) for year, count in expected.items()
+               if copied.get(year, 0) != count}
+    if missing:
+        conn.rollback()
+        for year, (count, have) in missing.items():
+            print(f"{year or 'default'}: {SOURCE} {count:,} rows, {TARGET} {have:,}")
+        print("Row counts differ (writes since migrate?); re-run 'migrate' first")
+        sys.exit(1)
+
+    old_indexes = source_indexes(cur)
+    cur.execute(f"ALTER TABLE {SOURCE} RENAME TO {RETIRED}")
+    for name, primary, unique, definition in old_indexes:
+        if primary:
+            cur.execute(f"ALTER TABLE {RETIRED} RENAME CONSTRAINT {name} TO {RETIRED}_pkey")
+        else:
+            cur.execute(f"ALTER INDEX {name} RENAME TO {name}_unpartitioned")
+            cur.execute(f"ALTER INDEX IF EXISTS {name}{INDEX_SUFFIX} RENAME TO {name}")
+    cur.execute(f"ALTER TABLE {TARGET} RENAME TO {SOURCE}")
+    cur.execute(f"ALTER TABLE {SOURCE} RENAME CONSTRAINT {TARGET}_pkey TO {SOURCE}_pkey")
+    conn.commit()
+    print(f"{SOURCE} is now partitioned by year; old table kept as {RETIRED}")
+    print("Run patent_extractor with UNIFIED_PARTITIONED=1 from now on")
+
+
+def add_year(conn, cur, year: int) -> None:
+    """Add a year partition, moving that year's rows out of DEFAULT."""
+    name = partition_name(year)
+    if table_exists(cur, name):
+        print(f"{name} already exists")
+        return
+    cur.execute(f"ALTER TABLE {SOURCE} DETACH PARTITION {DEFAULT_PARTITION}")
+    cur.execute(f"CREATE TABLE {name} PARTITION OF {SOURCE} FOR VALUES FROM (%s) TO (%s)", (year, year + 1))
+    columns = ", ".join(copy_columns(cur, SOURCE))
+    cur.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE year = %s RETURNING *) "
+        f"INSERT INTO {SOURCE} ({columns}) SELECT {columns} FROM moved",
+        (year,),
+    )
+    moved = cur.rowcount
+    cur.execute(f"ALTER TABLE {SOURCE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    conn.commit()
+    print(f"{name} created, {moved:,} rows moved from {DEFAULT_PARTITION}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["plan", "migrate", "swap", "add-year"])
+    parser.add_argument("year", nargs="?", type=int, help="Year for add-year")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB)
+    conn.autocommit = False
+    cur = conn.cursor()
+    if args.command == "plan":
+        plan(cur)
+    elif args.command == "migrate":
+        migrate(conn, cur)
+    elif args.command == "swap":
+        swap(conn, cur)
+    else:
+        if not args.year or not MIN_YEAR <= args.year <= MAX_YEAR:
+            parser.error("add-year needs a year")
+        add_year(conn, cur, args.year)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        sys.exit(130)
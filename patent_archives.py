@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Patent Archive Access
+Shared helpers for locating the weekly USPTO archives referenced by
+raw_xml_path and streaming the patent XML files stored inside them.
+
+raw_xml_path always has the form "<archive>/<member path>", e.g.:
+    I20160526.tar/US20160148332A1-20160526/US20160148332A1-20160526.XML
+    20030313.ZIP/US20030046746A1-20030313/US20030046746A1-20030313.XML
+
+The member path is the XML name as seen by patent_extractor.go, i.e. the
+name inside the nested per-patent ZIP when the archive uses nested ZIPs.
+"""
+
+import io
+import os
+import re
+import sys
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Base path for patent archives (organized as <base>/<year>/<archive>)
+PATENT_ARCHIVE_BASE = os.environ.get('PATENT_ARCHIVE_BASE', '/mnt/patents/data/historical')
+
+# Optional member offset maps for weekly TARs (see build_tar_member_index)
+TAR_INDEX_DIR = os.environ.get('TAR_INDEX_DIR', '/mnt/patents/data/indexes/tar_members')
+
+
+def split_raw_xml_path(raw_xml_path: str) -> Optional[Tuple[str, str]]:
+    """Split raw_xml_path into (archive_name, member_path)."""
+    if not raw_xml_path or '/' not in raw_xml_path:
+        return None
+    archive_name, member = raw_xml_path.split('/', 1)
+    if not archive_name.upper().endswith(('.ZIP', '.TAR', '.TGZ', '.TAR.GZ')):
+        return None
+    return archive_name, member
+
+
+def archive_year(archive_name: str) -> Optional[str]:
+    """Get the publication year encoded in an archive name (I20160526.tar -> 2016)."""
+    match = re.search(r'((?:19|20)\d{2})\d{4}', archive_name)
+    return match.group(1) if match else None
+
+
+def resolve_archive_paths(archive_name: str, year=None) -> List[Path]:
+    """
+    Find the archive file(s) on disk for an archive name.
+
+    Older weekly ZIPs were split by USPTO (20030313A.ZIP, 20030313B.ZIP, ...),
+    so one archive name can resolve to several files.
+    """
+    years = []
+    encoded = archive_year(archive_name)
+    if encoded:
+        years.append(encoded)
+    if year and str(year) not in years and str(year) != '0':
+        years.append(str(year))
+
+    for y in years:
+        year_dir = Path(PATENT_ARCHIVE_BASE) / y
+        exact = year_dir / archive_name
+        if exact.exists():
+            return [exact]
+
+        stem, dot, ext = archive_name.partition('.')
+        split_parts = sorted(year_dir.glob(f"{stem}[A-Z].{ext}")) if year_dir.is_dir() else []
+        if split_parts:
+            return split_parts
+
+    return []
+
+
+def _member_stems(members: Iterable[str]) -> Set[str]:
+    """Per-patent names (US...-YYYYMMDD) used to skip unrelated nested ZIPs."""
+    stems = set()
+    for member in members:
+        path = PurePosixPath(member)
+        stems.add(path.stem.upper())
+        if path.parent.name:
+            stems.add(path.parent.name.upper())
+    return stems
+
+
+def _iter_nested_zip(data: bytes, wanted: Optional[Set[str]]) -> Iterator[Tuple[str, bytes]]:
+    """Yield XML members of a nested per-patent ZIP held in memory."""
+    try:
+        zf = zipfile.ZipFile(BytesIO(data), 'r')
+    except zipfile.BadZipFile:
+        return
+    with zf:
+        for info in zf.infolist():
+            if not info.filename.upper().endswith('.XML'):
+                continue
+            if wanted is not None and info.filename not in wanted:
+                continue
+            yield info.filename, zf.read(info)
+
+
+def _iter_tar_xml(archive_path: Path, wanted: Optional[Set[str]]) -> Iterator[Tuple[str, bytes]]:
+    stems = _member_stems(wanted) if wanted is not None else None
+    mode = 'r:gz' if archive_path.name.lower().endswith(('.tgz', '.tar.gz')) else 'r|'
+    with tarfile.open(archive_path, mode) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            upper = member.name.upper()
+            if upper.endswith('.XML'):
+                if wanted is not None and member.name not in wanted:
+                    continue
+                fileobj = tar.extractfile(member)
+                if fileobj:
+                    yield member.name, fileobj.read()
+            elif upper.endswith('.ZIP'):
+                if stems is not None and PurePosixPath(upper).stem not in stems:
+                    continue
+                fileobj = tar.extractfile(member)
+                if fileobj:
+                    yield from _iter_nested_zip(fileobj.read(), wanted)
+
+
+def _iter_zip_xml(archive_path: Path, wanted: Optional[Set[str]]) -> Iterator[Tuple[str, bytes]]:
+    stems = _member_stems(wanted) if wanted is not None else None
+    with zipfile.ZipFile(archive_path, 'r') as zf:
+        infos = zf.infolist()
+        has_nested = any(i.filename.upper().endswith('.ZIP') for i in infos)
+        for info in infos:
+            upper = info.filename.upper()
+            if has_nested:
+                # Nested ZIPs (2001-2010 format); skip DTD/entity bundles
+                if not upper.endswith('.ZIP') or 'DTDS' in upper or 'ENTITIES' in upper:
+                    continue
+                if stems is not None and PurePosixPath(upper).stem not in stems:
+                    continue
+                yield from _iter_nested_zip(zf.read(info), wanted)
+            elif upper.endswith('.XML'):
+                if wanted is not None and info.filename not in wanted:
+                    continue
+                yield info.filename, zf.read(info)
+
+
+def iter_archive_xml(archive_path, wanted: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream (member_path, xml_bytes) pairs from a weekly archive in archive order.
+
+    Args:
+        archive_path: Path to a TAR or ZIP weekly archive
+        wanted: Optional member paths (raw_xml_path without the archive prefix).
+                When given, only those members are decompressed and the scan
+                stops as soon as all of them have been found.
+    """
+    archive_path = Path(archive_path)
+    remaining = set(wanted) if wanted is not None else None
+    if remaining is not None and not remaining:
+        return
+
+    if archive_path.name.lower().endswith(('.tar', '.tgz', '.tar.gz')):
+        stream = _iter_tar_xml(archive_path, remaining)
+    else:
+        stream = _iter_zip_xml(archive_path, remaining)
+
+    for name, data in stream:
+        yield name, data
+        if remaining is not None:
+            remaining.discard(name)
+            if not remaining:
+                break
+
+
+class TarMemberFile(io.RawIOBase):
+    """
+    Read-only, seekable view of one member's data inside an uncompressed TAR.
+
+    Lets zipfile open a nested per-patent ZIP in place: only the central
+    directory and the requested members are read, nothing is copied.
+    """
+
+    def __init__(self, tar_file, offset: int, size: int):
+        """tar_file is a path, or an open binary file shared by several views."""
+        super().__init__()
+        self._owns_file = isinstance(tar_file, (str, os.PathLike))
+        self._file = open(tar_file, 'rb') if self._owns_file else tar_file
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._size
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._size - self._pos)
+        if n <= 0:
+            return 0
+        self._file.seek(self._offset + self._pos)
+        n = self._file.readinto(memoryview(buffer)[:n])
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed and self._owns_file:
+            self._file.close()
+        super().close()
+
+
+def _tar_index_path(tar_path: Path) -> Path:
+    return Path(TAR_INDEX_DIR) / f"{tar_path.name}.tsv"
+
+
+def build_tar_member_index(tar_path) -> Path:
+    """Write a name/offset/size map of a weekly TAR so members can be opened without a scan."""
+    tar_path = Path(tar_path)
+    index_path = _tar_index_path(tar_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix('.tmp')
+    with tarfile.open(tar_path, 'r:') as tar, open(tmp_path, 'w') as out:
+        for member in tar:
+            if member.isfile():
+                out.write(f"{member.name}\t{member.offset_data}\t{member.size}\n")
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def load_tar_member_index(tar_path) -> Optional[Dict[str, Tuple[str, int, int]]]:
+    """Load the member map of a TAR keyed by upper-case basename, or None if missing/stale."""
+    tar_path = Path(tar_path)
+    index_path = _tar_index_path(tar_path)
+    try:
+        if index_path.stat().st_mtime < tar_path.stat().st_mtime:
+            return None
+        index = {}
+        with open(index_path) as f:
+            for line in f:
+                name, offset, size = line.rstrip('\n').split('\t')
+                index[PurePosixPath(name).name.upper()] = (name, int(offset), int(size))
+        return index
+    except (OSError, ValueError):
+        return None
+
+
+def find_tar_members(tar_path, basenames: Iterable[str]) -> Dict[str, Tuple[str, int, int]]:
+    """
+    Locate members of an uncompressed TAR by basename.
+
+    Returns {BASENAME (upper-case): (name, data_offset, size)} for the members
+    found. Uses the member index when present, otherwise walks the TAR headers
+    once (seeking over member data) and stops when all have been found.
+    """
+    wanted = {b.upper() for b in basenames}
+    if not wanted:
+        return {}
+
+    index = load_tar_member_index(tar_path)
+    if index is not None:
+        return {key: index[key] for key in wanted if key in index}
+
+    found = {}
+    with tarfile.open(tar_path, 'r:') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            key = PurePosixPath(member.name).name.upper()
+            if key in wanted:
+                found[key] = (member.name, member.offset_data, member.size)
+                if len(found) == len(wanted):
+                    break
+    return found
+
+
+def find_tar_member(tar_path, basename: str) -> Optional[Tuple[str, int, int]]:
+    """Locate one TAR member by basename; returns (name, data_offset, size) or None."""
+    return find_tar_members(tar_path, [basename]).get(basename.upper())
+
+
+@contextmanager
+def open_tar_member_zip(tar_file, offset: int, size: int) -> Iterator[zipfile.ZipFile]:
+    """Open a ZIP stored at a known data offset of a TAR (path or open file) in place."""
+    with TarMemberFile(tar_file, offset, size) as fileobj, zipfile.ZipFile(fileobj, 'r') as zf:
+        yield zf
+
+
+@contextmanager
+def open_tar_nested_zip(tar_path, patent_dir: str) -> Iterator[Optional[zipfile.ZipFile]]:
+    """
+    Open the per-patent ZIP (<patent_dir>.ZIP) inside a weekly TAR without copying it.
+
+    Yields None when the TAR has no such member.
+    """
+    found = find_tar_member(tar_path, f"{patent_dir}.ZIP")
+    if not found:
+        yield None
+        return
+    _, offset, size = found
+    with open_tar_member_zip(tar_path, offset, size) as zf:
+        yield zf
+
+
+def group_by_archive(rows: Iterable[dict]) -> Dict[str, List[dict]]:
+    """Group rows carrying a raw_xml_path by archive name, preserving order."""
+    groups: Dict[str, List[dict]] = {}
+    for row in rows:
+        parts = split_raw_xml_path(row.get('raw_xml_path') or '')
+        if not parts:
+            continue
+        groups.setdefault(parts[0], []).append(row)
+    return groups
+
+
+def iter_pending_archives(cur, pending_sql: str, params: tuple = (),
+                          batch: int = 3000) -> Iterator[Tuple[Optional[str], List[dict]]]:
+    """
+    Yield (archive_name, rows) for the patent_data_unified rows (alias u)
+    matching pending_sql, one archive at a time in raw_xml_path order.
+
+    Rows are fetched in pages keyed on raw_xml_path and an archive is only
+    yielded once a row of the next archive (or the end) has been seen, so
+    every archive is streamed exactly once however many publications it
+    holds or however the pages fall. Rows whose path does not point inside
+    an archive come back with archive_name None. The keyset moves past
+    every fetched row, so rows the caller leaves pending are not returned
+    again.
+    """
+    last_path = ''
+    current, group = None, []
+    while True:
+        cur.execute(f"""
+            SELECT pub_number, raw_xml_path, year
+            FROM patent_data_unified u
+            WHERE {pending_sql}
+              AND raw_xml_path IS NOT NULL
+              AND raw_xml_path > %s
+            ORDER BY raw_xml_path
+            LIMIT %s
+        """, (*params, last_path, batch))
+        page = [dict(r) for r in cur.fetchall()]
+        for row in page:
+            parts = split_raw_xml_path(row['raw_xml_path'])
+            name = parts[0] if parts else None
+            if group and name != current:
+                yield current, group
+                group = []
+            current = name
+            group.append(row)
+        if len(page) < batch:
+            break
+        last_path = page[-1]['raw_xml_path']
+        if current is None and group:
+            # Rows outside archives need no streaming; do not hold them across pages
+            yield current, group
+            group = []
+    if group:
+        yield current, group
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'index-tar':
+        print("Usage: python patent_archives.py index-tar <archive.tar> [...]")
+        sys.exit(1)
+    for arg in sys.argv[2:]:
+        print(f"{arg} -> {build_tar_member_index(arg)}")
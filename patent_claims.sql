@@ -0,0 +1,35 @@
+-- Per-claim table: one row per claim of a publication
+-- Purpose: claim-level full-text search and prompt building without re-splitting
+--          claims_text / the CLAIMS: block of description_text at request time
+--
+-- Filled by claims_backfill.py --archives from the <claim> elements of the bulk XML;
+-- depends_on comes from the <claim-ref idref="CLM-00001"> references of each claim.
+
+CREATE TABLE IF NOT EXISTS patent_claims (
+    pub_number      TEXT    NOT NULL,
+    claim_no        INTEGER NOT NULL,
+    depends_on      INTEGER[] NOT NULL DEFAULT '{}',
+    is_independent  BOOLEAN GENERATED ALWAYS AS (cardinality(depends_on) = 0) STORED,
+    text            TEXT    NOT NULL,
+    tsv             TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', text)) STORED,
+    PRIMARY KEY (pub_number, claim_no)
+);
+
+COMMENT ON TABLE patent_claims IS 'Claims of patent_data_unified publications, one row per claim';
+COMMENT ON COLUMN patent_claims.depends_on IS 'Claim numbers referenced by this claim (empty for independent claims)';
+COMMENT ON COLUMN patent_claims.text IS 'Claim text including its leading number, e.g. ''2. The method of claim 1, ...''';
+
+-- Full-text search over claims (claims search endpoint)
+CREATE INDEX IF NOT EXISTS patent_claims_tsv_idx
+    ON patent_claims USING GIN (tsv);
+
+-- Independent claims of a publication
+CREATE INDEX IF NOT EXISTS patent_claims_independent_idx
+    ON patent_claims (pub_number, claim_no)
+    WHERE is_independent;
+
+-- Verify
+SELECT count(DISTINCT pub_number) AS publications,
+       count(*) AS claims,
+       count(*) FILTER (WHERE is_independent) AS independent
+FROM patent_claims;
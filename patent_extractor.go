@@ -47,6 +47,8 @@ type Config struct {
     MinArchiveSizeMB   int64
     ReprocessAll       bool
     ForceOverwrite     bool
+    // patent_data_unified is range-partitioned on year (partition_unified.py)
+    PartitionedUnified bool
 
     PriorityMinYear int
     PriorityMaxYear int
@@ -160,6 +162,7 @@ func loadConfig() {
     cfg.MinArchiveSizeMB = int64(getEnvInt("MIN_ARCHIVE_SIZE_MB", int(cfg.MinArchiveSizeMB)))
     cfg.ReprocessAll = getEnvBool("REPROCESS_ALL", cfg.ReprocessAll)
     cfg.ForceOverwrite = getEnvBool("FORCE_OVERWRITE", cfg.ForceOverwrite)
+    cfg.PartitionedUnified = getEnvBool("UNIFIED_PARTITIONED", cfg.PartitionedUnified)
     cfg.PriorityMinYear = getEnvInt("PRIORITY_MIN_YEAR", 0)
     cfg.PriorityMaxYear = getEnvInt("PRIORITY_MAX_YEAR", 0)
 
@@ -175,6 +178,7 @@ func loadConfig() {
     flag.BoolVar(&cfg.Recursive, "recursive", cfg.Recursive, "Recursively scan directories")
     flag.BoolVar(&cfg.ReprocessAll, "reprocess", cfg.ReprocessAll, "Reprocess already processed archives")
     flag.BoolVar(&cfg.ForceOverwrite, "force", cfg.ForceOverwrite, "Force overwrite of existing records")
+    flag.BoolVar(&cfg.PartitionedUnified, "partitioned", cfg.PartitionedUnified, "patent_data_unified is partitioned by year (primary key pub_number, year)")
     flag.BoolVar(&cfg.TestConfig, "test-config", false, "Test configuration and database connection then exit")
     
     flag.Parse()
@@ -976,6 +980,15 @@ func (e *Extractor) insertPatents(patents []Patent) int {
         updateDesc = "description_text = EXCLUDED.description_text,\n            claims_text = EXCLUDED.claims_text,\n            description_body = EXCLUDED.description_body,"
     }
 
+    // A partitioned table's primary key includes the partition key, and year
+    // is part of the conflict target, so it is never updated in place
+    conflictTarget := "pub_number"
+    updateYear := "year = CASE WHEN patent_data_unified.year IS NULL THEN EXCLUDED.year ELSE patent_data_unified.year END,"
+    if cfg.PartitionedUnified {
+        conflictTarget = "pub_number, year"
+        updateYear = ""
+    }
+
     upsertSQL := fmt.Sprintf(`
         INSERT INTO patent_data_unified (
             pub_number, title, abstract_text, description_text,
@@ -983,7 +996,7 @@ func (e *Extractor) insertPatents(patents []Patent) int {
             filing_date, pub_date, inventors, assignees,
             raw_xml_path, year, application_number
         ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::jsonb, $10::jsonb, $11, $12, $13)
-        ON CONFLICT (pub_number) DO UPDATE SET
+        ON CONFLICT (%s) DO UPDATE SET
             title = CASE WHEN patent_data_unified.title IS NULL OR btrim(patent_data_unified.title) = '' THEN EXCLUDED.title ELSE patent_data_unified.title END,
             abstract_text = CASE WHEN patent_data_unified.abstract_text IS NULL OR btrim(patent_data_unified.abstract_text) = '' THEN EXCLUDED.abstract_text ELSE patent_data_unified.abstract_text END,
             %s
@@ -992,9 +1005,9 @@ func (e *Extractor) insertPatents(patents []Patent) int {
             raw_xml_path = COALESCE(patent_data_unified.raw_xml_path, EXCLUDED.raw_xml_path),
             filing_date = CASE WHEN patent_data_unified.filing_date IS NULL THEN EXCLUDED.filing_date ELSE patent_data_unified.filing_date END,
             pub_date = CASE WHEN patent_data_unified.pub_date IS NULL THEN EXCLUDED.pub_date ELSE patent_data_unified.pub_date END,
-            year = CASE WHEN patent_data_unified.year IS NULL THEN EXCLUDED.year ELSE patent_data_unified.year END,
+            %s
             application_number = CASE WHEN patent_data_unified.application_number IS NULL OR btrim(patent_data_unified.application_number) = '' THEN EXCLUDED.application_number ELSE patent_data_unified.application_number END
-    `, updateDesc)
+    `, conflictTarget, updateDesc, updateYear)
 
     stmt, err := tx.Prepare(upsertSQL)
 	if err != nil {
@@ -1049,6 +1062,14 @@ func (e *Extractor) insertPatents(patents []Patent) int {
 			}
 		}
 
+		// Year 0 (no publication date parsed) would land in the DEFAULT partition
+		// next to the row already corrected from the pub_number (YEAR_ZERO_FIX_SUMMARY.md)
+		if cfg.PartitionedUnified && patent.Year == 0 && len(patent.PubNumber) >= 4 {
+			if y, err := strconv.Atoi(patent.PubNumber[:4]); err == nil && y >= 2000 && y <= 2100 {
+				patent.Year = y
+			}
+		}
+
 		_, err := stmt.Exec(
 			patent.PubNumber,
 			patent.Title,
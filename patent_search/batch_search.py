@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Batch Search - score many invention descriptions offline
+
+Runs the claims search stages for a whole batch at once instead of one
+interactive search after another:
+
+  1. retrieval  - concept extraction + database search for every description
+  2. dedupe     - candidates shared between descriptions are resolved once;
+                  other members of a candidate's patent family
+                  (family_store.py) and its near-duplicates
+                  (near_duplicates.py) are attached to it instead of being scored
+  3. claims     - one patent_claims lookup for all unique patents, then
+                  find_and_extract_claims for the ones not in the table
+  4. scoring    - one LLM call per (description, patent) pair, queued
+                  description by description at 'batch' priority: the
+                  llm_scheduler cap of that class (LLM_CLASS_CAPS) holds
+                  across processes, so a command line run and the search
+                  services together never send Ollama more batch calls
+                  than the cap and the remaining slots stay free for
+                  interactive searches
+
+Input is JSONL, one description per line:
+    {"id": "D-1042", "description": "A planter row unit ...", "cpc": "A01C"}
+("id" defaults to the line number, "cpc" is the optional search filter.)
+
+Output is JSONL, one line per finished description. Every scored pair is
+also appended to <output>.pairs, so re-running the same command after a
+crash skips finished descriptions and already scored pairs. A pair whose
+LLM call failed (timeout, Ollama error) is not written to either file and
+its description is left unfinished; re-run the command to score the
+missing pairs and finish it.
+
+Usage:
+    cd patent_search
+    python3.11 batch_search.py disclosures.jsonl results.jsonl [--top-k 50]
+
+The claims search service (8095) runs the same job behind
+POST /api/batch-search.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import requests
+
+import claims_store
+import family_store
+import llm_scheduler
+import ollama_client
+import prompt_builder
+from search_filters import parse_search_filters
+
+try:
+    from near_duplicates import collapse_candidates
+except ImportError:  # numpy not installed
+    collapse_candidates = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SEARCH_DIR = os.environ.get('BATCH_SEARCH_DIR', '/mnt/patents/data/batch_search')
+BATCH_TOP_K = int(os.environ.get('BATCH_TOP_K', 50))
+BATCH_RETRIEVAL_WORKERS = int(os.environ.get('BATCH_RETRIEVAL_WORKERS', 4))
+BATCH_CLAIMS_WORKERS = int(os.environ.get('BATCH_CLAIMS_WORKERS', 4))
+# Calls kept in flight: enough that the next prompt is always waiting for a free Ollama slot
+BATCH_LLM_WORKERS = int(os.environ.get('BATCH_LLM_WORKERS', 2 * llm_scheduler.OLLAMA_SLOTS))
+BATCH_LLM_TIMEOUT = int(os.environ.get('BATCH_LLM_TIMEOUT', 180))
+
+
+def parse_descriptions(lines: Iterable[str]) -> List[Dict]:
+    """Read JSONL description records; raises ValueError on a bad line."""
+    descriptions = []
+    seen = set()
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {n}: invalid JSON ({e})")
+        if isinstance(record, str):
+            record = {'description': record}
+        description = (record.get('description') or record.get('invention_description') or '').strip()
+        if not description:
+            raise ValueError(f"Line {n}: description required")
+        record_id = str(record.get('id', n))
+        if record_id in seen:
+            raise ValueError(f"Line {n}: duplicate id {record_id}")
+        seen.add(record_id)
+        descriptions.append({
+            'id': record_id,
+            'description': description,
+            'filters': parse_search_filters(record),
+        })
+    return descriptions
+
+
+def read_jsonl(path: str) -> List[Dict]:
+    """Records from a JSONL file written by this job, ignoring a torn last line."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping incomplete line in {path}")
+    return records
+
+
+def terminate_last_line(path: str):
+    """Newline-terminate a line torn by a crash so the next append starts a fresh record."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+class BatchSearchJob:
+    def __init__(self, engine, descriptions: List[Dict], output_path: str, ollama_url: str, model: str,
+                 batch_id: str = None, top_k: int = BATCH_TOP_K, llm_workers: int = BATCH_LLM_WORKERS):
+        self.engine = engine
+        self.descriptions = descriptions
+        self.output_path = output_path
+        self.pairs_path = output_path + '.pairs'
+        self.ollama_url = ollama_url
+        self.model = model
+        self.batch_id = batch_id or os.path.basename(output_path)
+        self.top_k = top_k
+        self.llm_workers = max(1, llm_workers)
+        self.write_lock = threading.Lock()
+        # (description id, pub_number) -> near-duplicates attached to that result
+        self.siblings = {}
+        # (description id, pub_number) -> family members attached to that result
+        self.family_members = {}
+        self.progress = {
+            'stage': 'pending',
+            'descriptions': len(descriptions),
+            'completed': 0,
+            'candidates': 0,
+            'unique_candidates': 0,
+            'near_duplicates': 0,
+            'family_members': 0,
+            'claims_resolved': 0,
+            'pairs_total': 0,
+            'pairs_scored': 0,
+            'score_errors': 0,
+            'unfinished': 0,
+            'started': None,
+            'finished': None,
+            'error': None,
+        }
+
+    def _append(self, path: str, record: Dict):
+        line = json.dumps(record, default=str) + '\n'
+        with self.write_lock, open(path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Stage 1
+    def retrieve(self, item: Dict) -> List[Dict]:
+        concepts = self.engine.extract_concepts(item['description'])
+        return self.engine.search_by_concepts(concepts, item['filters'])
+
+    # Stage 3
+    def resolve_claims(self, patent: Dict):
+        claims = self.engine.claims_extractor.find_and_extract_claims(patent['pub_number'], patent.get('pub_date'))
+        patent['claims_text'] = claims[:prompt_builder.CLAIMS_KEEP_CHARS] if claims else None
+        with self.write_lock:
+            self.progress['claims_resolved'] += 1
+
+    # Stage 4
+    def score_pair(self, item: Dict, patent: Dict) -> Dict:
+        prompt = prompt_builder.build_claims_prompt(item['description'], patent)
+        with llm_scheduler.work(self.batch_id, 'batch'):
+            try:
+                response = ollama_client.generate(self.ollama_url, {
+                    'model': self.model,
+                    'prompt': prompt,
+                    'stream': False,
+                    'keep_alive': '30m',  # keep the model loaded between batch calls
+                    'options': prompt_builder.scoring_options(prompt)
+                }, timeout=BATCH_LLM_TIMEOUT)
+            except requests.exceptions.RequestException as e:
+                return {'score': prompt_builder.DEFAULT_SCORE, 'reasoning': None, 'error': str(e)[:200]}
+        if response.status_code != 200:
+            return {'score': prompt_builder.DEFAULT_SCORE, 'reasoning': None,
+                    'error': f"Ollama returned status {response.status_code}"}
+        score, reasoning = prompt_builder.parse_score(response.json().get('response', ''))
+        return {'score': score, 'reasoning': reasoning}
+
+    def run(self) -> Dict:
+        progress = self.progress
+        progress['started'] = datetime.now().isoformat()
+        try:
+            self._run()
+            progress['stage'] = 'complete'
+        except Exception as e:
+            logger.error(f"Batch {self.batch_id} failed: {e}")
+            progress['stage'] = 'error'
+            progress['error'] = str(e)
+        progress['finished'] = datetime.now().isoformat()
+        return progress
+
+    def _run(self):
+        progress = self.progress
+        terminate_last_line(self.output_path)
+        terminate_last_line(self.pairs_path)
+        done_ids = {r['id'] for r in read_jsonl(self.output_path)}
+        pair_scores = {(r['id'], r['pub_number']): r for r in read_jsonl(self.pairs_path)}
+        pending = [d for d in self.descriptions if d['id'] not in done_ids]
+        progress['completed'] = len(self.descriptions) - len(pending)
+        if done_ids:
+            logger.info(f"Resuming batch {self.batch_id}: {len(done_ids)} descriptions done, "
+                        f"{len(pair_scores)} pairs scored")
+
+        progress['stage'] = 'retrieval'
+        with ThreadPoolExecutor(max_workers=BATCH_RETRIEVAL_WORKERS) as pool:
+            retrieved = list(pool.map(self.retrieve, pending))
+
+        progress['stage'] = 'dedupe'
+        # One patent_families lookup for every retrieved candidate
+        families = self.engine.families_of(sorted({row['pub_number'] for rows in retrieved for row in rows}))
+        candidates = {}
+        per_description = {}
+        for item, rows in zip(pending, retrieved):
+            collapsed = family_store.collapse_families(rows, families)
+            progress['family_members'] += len(rows) - len(collapsed)
+            rows = collapsed
+            if collapse_candidates:
+                collapsed = collapse_candidates(rows)
+                progress['near_duplicates'] += len(rows) - len(collapsed)
+                rows = collapsed
+            pubs = []
+            for row in rows:
+                pub = row['pub_number']
+                if row.get('near_duplicates'):
+                    self.siblings[(item['id'], pub)] = row.pop('near_duplicates')
+                if row.get('family_members'):
+                    self.family_members[(item['id'], pub)] = row.pop('family_members')
+                if pub not in pubs:
+                    pubs.append(pub)
+                    candidates.setdefault(pub, dict(row))
+            per_description[item['id']] = pubs
+            progress['candidates'] += len(pubs)
+        progress['unique_candidates'] = len(candidates)
+        logger.info(f"Batch {self.batch_id}: {progress['candidates']} candidates, {len(candidates)} unique")
+
+        progress['stage'] = 'claims'
+        unscored = {pub for item in pending for pub in per_description[item['id']]
+                    if (item['id'], pub) not in pair_scores}
+        stored = self.engine.claims_extractor.claims_from_table(sorted(unscored))
+        for pub, claims in stored.items():
+            candidates[pub]['claims'] = claims
+            candidates[pub]['claims_text'] = claims_store.claims_text(claims)[:prompt_builder.CLAIMS_KEEP_CHARS]
+        progress['claims_resolved'] += len(stored)
+        with ThreadPoolExecutor(max_workers=BATCH_CLAIMS_WORKERS) as pool:
+            list(pool.map(self.resolve_claims, [candidates[pub] for pub in unscored - set(stored)]))
+
+        progress['stage'] = 'scoring'
+        remaining = {}
+        failed = set()
+        jobs = []
+        for item in pending:
+            todo = [pub for pub in per_description[item['id']] if (item['id'], pub) not in pair_scores]
+            remaining[item['id']] = len(todo)
+            jobs.extend((item, candidates[pub]) for pub in todo)
+        progress['pairs_total'] = len(jobs)
+
+        for item in pending:
+            if remaining[item['id']] == 0:
+                self.finish_description(item, per_description[item['id']], candidates, pair_scores)
+
+        def score(item, patent):
+            result = self.score_pair(item, patent)
+            record = {'id': item['id'], 'pub_number': patent['pub_number'],
+                      'has_claims': bool(patent.get('claims_text')), **result}
+            if 'error' not in result:
+                self._append(self.pairs_path, record)
+            with self.write_lock:
+                if 'error' in result:
+                    # Neither the pair nor its description is written, so a resumed run scores it again
+                    progress['score_errors'] += 1
+                    failed.add(item['id'])
+                else:
+                    pair_scores[(item['id'], patent['pub_number'])] = record
+                    progress['pairs_scored'] += 1
+                remaining[item['id']] -= 1
+                finished = remaining[item['id']] == 0
+                if finished and item['id'] in failed:
+                    progress['unfinished'] += 1
+            if finished and item['id'] in failed:
+                logger.warning(f"Batch {self.batch_id}: description {item['id']} has unscored pairs; "
+                               f"re-run the batch to finish it")
+            elif finished:
+                self.finish_description(item, per_description[item['id']], candidates, pair_scores)
+
+        # Submitted description by description, so descriptions finish (and are written) in order
+        with ThreadPoolExecutor(max_workers=self.llm_workers) as pool:
+            for future in [pool.submit(score, item, patent) for item, patent in jobs]:
+                future.result()
+
+    def finish_description(self, item: Dict, pubs: List[str], candidates: Dict, pair_scores: Dict):
+        results = []
+        for pub in pubs:
+            patent = candidates[pub]
+            scored = pair_scores[(item['id'], pub)]
+            result = {
+                'pub_number': pub,
+                'title': patent.get('title'),
+                'year': patent.get('year'),
+                'pub_date': patent.get('pub_date'),
+                'relevance_score': scored['score'] / 100.0,
+                'has_claims': scored.get('has_claims', False),
+                'ai_reasoning': scored.get('reasoning'),
+            }
+            if (item['id'], pub) in self.siblings:
+                result['near_duplicates'] = self.siblings[(item['id'], pub)]
+            if patent.get('family_id'):
+                result['family_id'] = patent['family_id']
+                result['family_size'] = patent['family_size']
+            if (item['id'], pub) in self.family_members:
+                result['family_members'] = self.family_members[(item['id'], pub)]
+            results.append(result)
+        results.sort(key=lambda r: r['relevance_score'], reverse=True)
+
+        self._append(self.output_path, {
+            'id': item['id'],
+            'candidates': len(pubs),
+            'results': results[:self.top_k],
+            'completed_at': datetime.now().isoformat(),
+        })
+        with self.write_lock:
+            self.progress['completed'] += 1
+        logger.info(f"Batch {self.batch_id}: description {item['id']} done "
+                    f"({self.progress['completed']}/{self.progress['descriptions']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSONL file of descriptions')
+    parser.add_argument('output', help='JSONL results file (re-run to resume)')
+    parser.add_argument('--top-k', type=int, default=BATCH_TOP_K, help='Results kept per description')
+    parser.add_argument('--llm-workers', type=int, default=BATCH_LLM_WORKERS, help='Scoring calls kept in flight')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    try:
+        with open(args.input) as f:
+            descriptions = parse_descriptions(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    from patent_search_ai_with_claims import OLLAMA_URL, MODEL_NAME, SmartPatentSearchWithClaims
+
+    start = time.time()
+    job = BatchSearchJob(SmartPatentSearchWithClaims(), descriptions, args.output, OLLAMA_URL, MODEL_NAME,
+                         top_k=args.top_k, llm_workers=args.llm_workers)
+    progress = job.run()
+    elapsed = time.time() - start
+
+    print("\n" + "=" * 60)
+    print(f"Batch {progress['stage']}: {progress['completed']}/{progress['descriptions']} descriptions "
+          f"in {elapsed / 60:.1f} min")
+    print(f"Candidates: {progress['candidates']} ({progress['unique_candidates']} unique, "
+          f"{progress['family_members']} family members and {progress['near_duplicates']} near-duplicates attached), pairs scored: {progress['pairs_scored']}, score errors: {progress['score_errors']}")
+    if progress['unfinished']:
+        print(f"{progress['unfinished']} descriptions have unscored pairs: re-run the same command to finish them")
+    if progress['error']:
+        print(f"Error: {progress['error']}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Citation Graph - compact CSR adjacency over grants and publications
+
+Build (offline job, re-run after new grant archives are loaded):
+    python citation_graph.py build [graph_dir]
+
+The build streams the weekly grant archives (ipgYYMMDD.zip) once, pulls the
+US patent citations out of every grant and writes NumPy arrays indexed by a
+dense node id. The search services memory-map those arrays and expand the
+top candidates one or two hops along cites / cited-by edges.
+
+Node keys are normalized document numbers: publications keep their 11 digit
+pub_number (20160148332), grants drop leading zeros (09668909 -> 9668909).
+A grant whose application was also published is merged into the publication
+node, so expansions come back as pub_numbers usable against patent_data_unified.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 5432)),
+    'database': os.environ.get('DB_NAME', 'companies_db'),
+    'user': os.environ.get('DB_USER', 'mark'),
+    'password': os.environ.get('DB_PASSWORD', 'mark123')
+}
+
+CITATION_GRAPH_DIR = os.environ.get('CITATION_GRAPH_DIR', '/mnt/patents/data/indexes/citation_graph')
+GRANTS_ARCHIVE_BASE = os.environ.get('GRANTS_ARCHIVE_BASE', '/mnt/patents/data/grants/xml')
+
+KEY_DTYPE = 'S12'
+
+RE_DOC_START = re.compile(rb'<\?xml ')
+RE_GRANT_NUMBER = re.compile(rb'(?s)<publication-reference>.*?<doc-number>([^<]+)</doc-number>')
+RE_PATCIT = re.compile(rb'(?s)<patcit\b[^>]*>(.*?)</patcit>')
+RE_COUNTRY = re.compile(rb'<country>([^<]+)</country>')
+RE_DOC_NUMBER = re.compile(rb'<doc-number>([^<]+)</doc-number>')
+
+
+def normalize_doc_number(number) -> str:
+    """Normalize a publication or grant number to its graph key."""
+    if isinstance(number, bytes):
+        number = number.decode('ascii', errors='ignore')
+    number = re.sub(r'[^A-Za-z0-9]', '', number or '').upper()
+    if number.startswith('US'):
+        number = number[2:]
+    # Drop a trailing kind code (A1, B2, S1, ...)
+    number = re.sub(r'(?<=\d)[A-Z]\d?$', '', number)
+    if re.fullmatch(r'(19|20)\d{9}', number):
+        return number  # publication
+    match = re.fullmatch(r'([A-Z]*)0*(\d+)', number)
+    if match:
+        return match.group(1) + match.group(2)  # grant
+    return number
+
+
+class CitationGraph:
+    """Read-only, memory-mapped citation graph."""
+
+    FILES = ('nodes', 'alias_keys', 'alias_ids',
+             'cites_indptr', 'cites_indices', 'cited_by_indptr', 'cited_by_indices')
+
+    def __init__(self, graph_dir: str = CITATION_GRAPH_DIR):
+        self.graph_dir = Path(graph_dir)
+        arrays = {name: np.load(self.graph_dir / f"{name}.npy", mmap_mode='r') for name in self.FILES}
+        self.nodes = arrays['nodes']
+        self.alias_keys = arrays['alias_keys']
+        self.alias_ids = arrays['alias_ids']
+        self.adjacency = {
+            'cites': (arrays['cites_indptr'], arrays['cites_indices']),
+            'cited_by': (arrays['cited_by_indptr'], arrays['cited_by_indices']),
+        }
+        meta_path = self.graph_dir / 'meta.json'
+        self.meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node_id(self, number: str) -> Optional[int]:
+        """Dense node id for a publication or grant number, or None."""
+        key = normalize_doc_number(number).encode('ascii')
+        for keys, ids in ((self.nodes, None), (self.alias_keys, self.alias_ids)):
+            if len(keys) == 0:
+                continue
+            pos = int(np.searchsorted(keys, key))
+            if pos < len(keys) and keys[pos] == key:
+                return pos if ids is None else int(ids[pos])
+        return None
+
+    def key(self, node_id: int) -> str:
+        return self.nodes[node_id].decode('ascii')
+
+    def neighbors(self, node_ids: np.ndarray, direction: str = 'both') -> np.ndarray:
+        """All neighbours (with repetition) of a set of node ids."""
+        directions = ('cites', 'cited_by') if direction == 'both' else (direction,)
+        parts = []
+        for d in directions:
+            indptr, indices = self.adjacency[d]
+            for node in node_ids:
+                start, end = indptr[node], indptr[node + 1]
+                if end > start:
+                    parts.append(indices[start:end])
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate(parts)
+
+    def expand(self, numbers: Iterable[str], hops: int = 2, limit: int = 100,
+               direction: str = 'both') -> List[Dict]:
+        """
+        Expand seed documents along citation edges.
+
+        Returns dicts with 'pub_number', 'hop' and 'links' (how many edges
+        connect the document to the previous frontier), ordered by hop and
+        then by links so co-cited documents come first.
+        """
+        seeds = [i for i in (self.node_id(n) for n in numbers) if i is not None]
+        if not seeds:
+            return []
+
+        frontier = np.unique(np.asarray(seeds, dtype=np.int32))
+        seen = frontier
+        expanded = []
+        for hop in range(1, hops + 1):
+            ids, counts = np.unique(self.neighbors(frontier, direction), return_counts=True)
+            fresh = ~np.isin(ids, seen, assume_unique=True)
+            ids, counts = ids[fresh], counts[fresh]
+            if len(ids) == 0:
+                break
+            order = np.argsort(-counts, kind='stable')
+            for node, links in zip(ids[order], counts[order]):
+                expanded.append({'pub_number': self.key(int(node)), 'hop': hop, 'links': int(links)})
+            if len(expanded) >= limit:
+                break
+            seen = np.union1d(seen, ids)
+            frontier = ids
+        return expanded[:limit]
+
+
+_graph = None
+_graph_lock = threading.Lock()
+_graph_missing_logged = False
+
+
+def get_citation_graph() -> Optional[CitationGraph]:
+    """Process-wide graph, loaded lazily; None when no graph has been built."""
+    global _graph, _graph_missing_logged
+    if _graph is not None:
+        return _graph
+    with _graph_lock:
+        if _graph is None:
+            try:
+                _graph = CitationGraph(CITATION_GRAPH_DIR)
+                logger.info(f"Citation graph loaded: {len(_graph)} nodes from {CITATION_GRAPH_DIR}")
+            except FileNotFoundError:
+                if not _graph_missing_logged:
+                    logger.warning(f"No citation graph at {CITATION_GRAPH_DIR}, citation expansion disabled")
+                    _graph_missing_logged = True
+    return _graph
+
+
+# ---------------------------------------------------------------------------
+# Build job
+# ---------------------------------------------------------------------------
+
+def iter_grant_documents(archive_path: Path) -> Iterator[bytes]:
+    """Stream the concatenated grant XML documents of one ipg archive."""
+    with zipfile.ZipFile(archive_path, 'r') as zf:
+        for info in zf.infolist():
+            if not info.filename.lower().endswith('.xml'):
+                continue
+            with zf.open(info) as fh:
+                doc = []
+                for line in fh:
+                    if RE_DOC_START.match(line) and doc:
+                        yield b''.join(doc)
+                        doc = []
+                    doc.append(line)
+                if doc:
+                    yield b''.join(doc)
+
+
+def parse_grant_citations(doc: bytes) -> Tuple[Optional[str], List[str]]:
+    """Return (grant_number, cited US document numbers) for one grant XML."""
+    match = RE_GRANT_NUMBER.search(doc)
+    if not match:
+        return None, []
+    cited = []
+    for block in RE_PATCIT.findall(doc):
+        country = RE_COUNTRY.search(block)
+        number = RE_DOC_NUMBER.search(block)
+        if number and (not country or country.group(1).strip() == b'US'):
+            cited.append(normalize_doc_number(number.group(1)))
+    return normalize_doc_number(match.group(1)), cited
+
+
+def resolve_grant_archive(archive_name: str) -> Optional[Path]:
+    """ipg250107.zip -> <GRANTS_ARCHIVE_BASE>/2025/ipg250107.zip"""
+    match = re.match(r'ipg(\d{2})\d{4}', archive_name)
+    if match:
+        path = Path(GRANTS_ARCHIVE_BASE) / f"20{match.group(1)}" / archive_name
+        if path.exists():
+            return path
+    found = list(Path(GRANTS_ARCHIVE_BASE).glob(f"*/{archive_name}"))
+    return found[0] if found else None
+
+
+def _lookup_ids(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Vectorized key -> index lookup; -1 where the key is absent."""
+    if len(sorted_keys) == 0 or len(keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, len(sorted_keys) - 1)
+    return np.where(sorted_keys[pos] == keys, pos, -1)
+
+
+def _to_csr(src: np.ndarray, dst: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst.astype(np.int32)
+
+
+def build_graph(graph_dir: str = CITATION_GRAPH_DIR) -> None:
+    import psycopg2
+
+    start = time.time()
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+
+    # Publications are the primary nodes
+    cur.execute("SELECT pub_number FROM patent_data_unified WHERE pub_number IS NOT NULL")
+    pub_keys = np.array([normalize_doc_number(r[0]) for r in cur.fetchall()], dtype=KEY_DTYPE)
+    logger.info(f"Loaded {len(pub_keys)} publications")
+
+    # Grants merge into the publication of the same application when there is one
+    cur.execute("""
+        SELECT g.grant_number, MIN(u.pub_number)
+        FROM patent_grants g
+        LEFT JOIN patent_data_unified u
+               ON u.application_number = g.application_number
+              AND g.application_number IS NOT NULL AND g.application_number <> ''
+        GROUP BY g.grant_number
+    """)
+    grant_rows = cur.fetchall()
+    cur.execute("SELECT DISTINCT split_part(raw_xml_source, '/', 1) FROM patent_grants WHERE raw_xml_source IS NOT NULL")
+    archives = sorted(r[0] for r in cur.fetchall() if r[0])
+    cur.close()
+    conn.close()
+
+    standalone = [normalize_doc_number(g) for g, pub in grant_rows if not pub]
+    nodes = np.unique(np.concatenate([pub_keys, np.array(standalone, dtype=KEY_DTYPE)]))
+    del pub_keys
+
+    aliased = [(normalize_doc_number(g), normalize_doc_number(pub)) for g, pub in grant_rows if pub]
+    alias_keys = np.array([a for a, _ in aliased], dtype=KEY_DTYPE)
+    alias_ids = _lookup_ids(nodes, np.array([p for _, p in aliased], dtype=KEY_DTYPE))
+    order = np.argsort(alias_keys, kind='stable')
+    alias_keys, alias_ids = alias_keys[order], alias_ids[order].astype(np.int32)
+    logger.info(f"{len(nodes)} nodes, {len(alias_keys)} grants merged into publications")
+
+    def resolve(keys: List[str]) -> np.ndarray:
+        arr = np.array(keys, dtype=KEY_DTYPE)
+        ids = _lookup_ids(nodes, arr)
+        missing = ids < 0
+        if missing.any():
+            via_alias = _lookup_ids(alias_keys, arr[missing])
+            ids[missing] = np.where(via_alias >= 0, alias_ids[np.maximum(via_alias, 0)], -1)
+        return ids
+
+    src_parts, dst_parts = [], []
+    for n, archive_name in enumerate(archives, 1):
+        path = resolve_grant_archive(archive_name)
+        if not path:
+            logger.warning(f"Grant archive not found: {archive_name}")
+            continue
+        citing, cited = [], []
+        for doc in iter_grant_documents(path):
+            grant, refs = parse_grant_citations(doc)
+            if grant:
+                citing.extend([grant] * len(refs))
+                cited.extend(refs)
+        if citing:
+            src, dst = resolve(citing), resolve(cited)
+            keep = (src >= 0) & (dst >= 0) & (src != dst)
+            src_parts.append(src[keep].astype(np.int32))
+            dst_parts.append(dst[keep].astype(np.int32))
+        logger.info(f"[{n}/{len(archives)}] {archive_name}: {len(citing)} citations")
+
+    src = np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int32)
+    dst = np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int32)
+    # De-duplicate edges (a grant and its publication can both cite the same document)
+    edges = np.unique(src.astype(np.int64) * len(nodes) + dst)
+    src, dst = (edges // len(nodes)).astype(np.int32), (edges % len(nodes)).astype(np.int32)
+
+    cites_indptr, cites_indices = _to_csr(src, dst, len(nodes))
+    cited_by_indptr, cited_by_indices = _to_csr(dst, src, len(nodes))
+
+    # Write to a sibling directory and swap, so running services never see a partial graph
+    out_dir = Path(graph_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, arr in (('nodes', nodes), ('alias_keys', alias_keys), ('alias_ids', alias_ids),
+                      ('cites_indptr', cites_indptr), ('cites_indices', cites_indices),
+                      ('cited_by_indptr', cited_by_indptr), ('cited_by_indices', cited_by_indices)):
+        np.save(tmp_dir / f"{name}.npy", arr)
+    (tmp_dir / 'meta.json').write_text(json.dumps({
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'nodes': int(len(nodes)),
+        'edges': int(len(src)),
+        'grant_archives': len(archives),
+    }, indent=2))
+
+    old_dir = out_dir.with_name(out_dir.name + '.old')
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    logger.info(f"Citation graph written to {out_dir}: {len(nodes)} nodes, {len(src)} edges "
+                f"in {(time.time() - start) / 60:.1f} min")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        print("Usage: python citation_graph.py build [graph_dir]")
+        sys.exit(1)
+    build_graph(sys.argv[2] if len(sys.argv) >= 3 else CITATION_GRAPH_DIR)
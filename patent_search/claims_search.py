@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Claims Search - full-text search over the patent_claims table
+
+Queries run against the GIN-indexed tsvector of patent_claims (see
+../patent_claims.sql) instead of LIKE over title/abstract/description, so
+claim language can be searched by phrase and word distance:
+
+    antenna beamforming                 both words in the same claim
+    "phased array antenna"              exact phrase
+    antenna NEAR/5 beamforming          within 5 words, either order
+    antenna <-> array, antenna <3> beam ordered, exactly 1 / 3 words apart
+    (antenna OR aerial) NOT radar       alternatives, exclusion ("-radar" too)
+    beamform*                           prefix
+
+Words are stemmed with the 'english' configuration, like the tsvector.
+Results are grouped by publication, best claim rank first, with up to
+CLAIMS_SEARCH_SNIPPETS highlighted matching claims each. Ranking covers at
+most CLAIMS_SEARCH_MAX_HITS matching claims; broader queries report
+'truncated' and should be narrowed (or filtered by year / CPC).
+"""
+
+import os
+import re
+from typing import Dict, List, Tuple
+
+from search_filters import build_filter_sql
+
+CLAIMS_SEARCH_MAX_HITS = int(os.environ.get('CLAIMS_SEARCH_MAX_HITS', 20000))
+CLAIMS_SEARCH_SNIPPETS = 3
+MAX_PAGE_SIZE = 100
+# NEAR/N expands to 2*N distance alternatives
+MAX_NEAR_DISTANCE = 20
+
+HEADLINE_OPTIONS = ('StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, '
+                    'MaxFragments=2, FragmentDelimiter=" ... "')
+
+TOKEN_RE = re.compile(r'"[^"]*"|\(|\)|<->|<\d+>|NEAR/\d+|-(?=[\w("])|[\w*]+(?:[\'.-][\w*]+)*')
+WORD_RE = re.compile(r'[A-Za-z0-9]+')
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+class _Parser:
+    """
+    Recursive descent over the query tokens, precedence low to high:
+    OR, AND (implicit), NOT / -, distance operators (NEAR/N, <->, <N>).
+    """
+
+    def __init__(self, query: str):
+        self.tokens = TOKEN_RE.findall(query)
+        self.pos = 0
+        self.negated = 0
+        self.positive = False
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self) -> str:
+        if not self.tokens:
+            raise ValueError("Empty query")
+        expr = self.or_expr()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()}' in query")
+        if not self.positive:
+            # A purely negative query cannot use the index and would scan every claim
+            raise ValueError("Query needs at least one term that is not negated")
+        return expr
+
+    def or_expr(self) -> str:
+        parts = [self.and_expr()]
+        while self.peek() == 'OR':
+            self.take()
+            parts.append(self.and_expr())
+        return parts[0] if len(parts) == 1 else '(' + ' | '.join(parts) + ')'
+
+    def and_expr(self) -> str:
+        parts = [self.not_expr()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            parts.append(self.not_expr())
+        return parts[0] if len(parts) == 1 else '(' + ' & '.join(parts) + ')'
+
+    def not_expr(self) -> str:
+        if self.peek() in ('NOT', '-'):
+            self.take()
+            self.negated += 1
+            expr = '!' + self.not_expr()
+            self.negated -= 1
+            return expr
+        return self.distance_expr()
+
+    def distance_expr(self) -> str:
+        expr = self.atom()
+        while self.peek() and (self.peek().startswith('NEAR/') or self.peek().startswith('<')):
+            operator = self.take()
+            right = self.atom()
+            if operator.startswith('NEAR/'):
+                distance = int(operator[5:])
+                if not 1 <= distance <= MAX_NEAR_DISTANCE:
+                    raise ValueError(f"NEAR distance must be 1-{MAX_NEAR_DISTANCE}")
+                # tsquery <N> is an exact ordered distance: spell out every distance both ways
+                expr = '(' + ' | '.join(f"{a} <{n}> {b}" for n in range(1, distance + 1)
+                                        for a, b in ((expr, right), (right, expr))) + ')'
+            else:
+                if operator != '<->' and not 1 <= int(operator[1:-1]) <= 100:
+                    raise ValueError(f"Invalid distance operator {operator}")
+                expr = f"({expr} {operator} {right})"
+        return expr
+
+    def atom(self) -> str:
+        token = self.take()
+        if token is None:
+            raise ValueError("Query ends with an operator")
+        if token == '(':
+            expr = self.or_expr()
+            if self.take() != ')':
+                raise ValueError("Unbalanced parentheses in query")
+            return expr
+        if token in OPERATORS or token == ')' or token.startswith(('NEAR/', '<')):
+            raise ValueError(f"Unexpected '{token}' in query")
+        if not self.negated:
+            self.positive = True
+        if token.startswith('"'):
+            words = WORD_RE.findall(token)
+            if not words:
+                raise ValueError("Empty phrase in query")
+            return '(' + ' <-> '.join(words) + ')' if len(words) > 1 else words[0]
+        return self.word(token)
+
+    @staticmethod
+    def word(token: str) -> str:
+        # Hyphenated and dotted words are indexed as their parts in sequence
+        words = WORD_RE.findall(token)
+        if not words:
+            raise ValueError(f"Invalid term '{token}' in query")
+        if token.endswith('*'):
+            words[-1] += ':*'
+        return '(' + ' <-> '.join(words) + ')' if len(words) > 1 else words[0]
+
+
+def to_tsquery_text(query: str) -> str:
+    """Translate the claims query syntax into to_tsquery() input; ValueError if malformed."""
+    return _Parser(query.strip()).parse()
+
+
+def build_search_sql(tsquery: str, independent_only: bool, filters: Dict,
+                     page: int, limit: int) -> Tuple[str, List]:
+    """One statement: match, rank and page publications, then highlight their best claims."""
+    filter_sql, filter_params = build_filter_sql(filters or {})
+    join = ''
+    if filter_sql:
+        join = 'JOIN patent_data_unified u ON u.pub_number = c.pub_number AND ' + filter_sql
+
+    sql = f"""
+        WITH q AS (SELECT to_tsquery('english', %s) AS query),
+        hits AS (
+            SELECT c.pub_number, c.claim_no, c.is_independent, c.text, c.tsv
+            FROM patent_claims c {join}, q
+            WHERE c.tsv @@ q.query
+              AND (NOT %s OR c.is_independent)
+            LIMIT %s
+        ),
+        ranked AS (
+            SELECT hits.*, ts_rank_cd(hits.tsv, q.query) AS rank FROM hits, q
+        ),
+        page AS (
+            SELECT pub_number, max(rank) AS rank, count(*) AS matched_claims,
+                   count(*) OVER () AS total
+            FROM ranked
+            GROUP BY pub_number
+            ORDER BY max(rank) DESC, pub_number
+            LIMIT %s OFFSET %s
+        )
+        SELECT p.pub_number, p.rank, p.matched_claims, p.total, n.hits,
+               u.title, u.year, u.pub_date,
+               s.claim_no, s.is_independent, s.rank AS claim_rank,
+               ts_headline('english', s.text, q.query, %s) AS snippet
+        FROM page p
+        CROSS JOIN q
+        CROSS JOIN (SELECT count(*) AS hits FROM hits) n
+        LEFT JOIN patent_data_unified u ON u.pub_number = p.pub_number
+        CROSS JOIN LATERAL (
+            SELECT r.claim_no, r.is_independent, r.rank, r.text FROM ranked r
+            WHERE r.pub_number = p.pub_number
+            ORDER BY r.rank DESC, r.claim_no
+            LIMIT %s
+        ) s
+        ORDER BY p.rank DESC, p.pub_number, s.rank DESC, s.claim_no
+    """
+    params = ([tsquery] + filter_params +
+              [independent_only, CLAIMS_SEARCH_MAX_HITS, limit, (page - 1) * limit,
+               HEADLINE_OPTIONS, CLAIMS_SEARCH_SNIPPETS])
+    return sql, params
+
+
+def search_claims(conn, query: str, independent_only: bool = False, filters: Dict = None,
+                  page: int = 1, limit: int = 20) -> Dict:
+    """Run a claims query; returns the page of publications with their highlighted claims."""
+    tsquery = to_tsquery_text(query)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    page = max(1, page)
+    sql, params = build_search_sql(tsquery, independent_only, filters, page, limit)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+
+    results, by_pub, total, hits = [], {}, 0, 0
+    for (pub_number, rank, matched, total, hits, title, year, pub_date,
+         claim_no, is_independent, claim_rank, snippet) in rows:
+        if pub_number not in by_pub:
+            by_pub[pub_number] = {
+                'pub_number': pub_number,
+                'title': title,
+                'year': year,
+                'pub_date': pub_date.isoformat() if pub_date else None,
+                'rank': round(rank, 4),
+                'matched_claims': matched,
+                'claims': [],
+            }
+            results.append(by_pub[pub_number])
+        by_pub[pub_number]['claims'].append({
+            'claim_no': claim_no,
+            'independent': is_independent,
+            'rank': round(claim_rank, 4),
+            'snippet': snippet,
+        })
+
+    return {
+        'query': query,
+        'tsquery': tsquery,
+        'independent_only': independent_only,
+        'page': page,
+        'limit': limit,
+        'total': total,
+        'truncated': hits >= CLAIMS_SEARCH_MAX_HITS,
+        'results': results,
+    }
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Claims Store - per-claim rows from the patent_claims table
+
+patent_claims (see ../patent_claims.sql, filled by claims_backfill.py
+--archives) holds one row per claim with the claims it depends on. One
+query returns the claims of every candidate of a search already split,
+instead of re-splitting claims_text or the CLAIMS: block of
+description_text for each candidate at request time.
+
+Claims are returned in the shape of prompt_builder.parse_claims():
+    {'num': 2, 'text': '2. The method of claim 1, ...', 'depends_on': [1]}
+
+Until the table exists every lookup returns nothing (logged once) and the
+callers fall back to the text columns; restart the service after creating it.
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+_table_missing = False
+
+
+def fetch_claims(conn, pub_numbers: Iterable[str], independent_only: bool = False) -> Dict[str, List[Dict]]:
+    """Claims per pub_number in claim order; pub_numbers without stored claims are absent."""
+    global _table_missing
+    pub_numbers = list(pub_numbers)
+    if _table_missing or not pub_numbers:
+        return {}
+
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT pub_number, claim_no, depends_on, text
+            FROM patent_claims
+            WHERE pub_number = ANY(%s)
+              AND (NOT %s OR is_independent)
+            ORDER BY pub_number, claim_no
+        """, (pub_numbers, independent_only))
+        rows = cur.fetchall()
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        _table_missing = True
+        logger.warning("patent_claims does not exist; claims come from the text columns")
+        return {}
+    finally:
+        cur.close()
+
+    claims = {}
+    for pub_number, claim_no, depends_on, text in rows:
+        claims.setdefault(pub_number, []).append(
+            {'num': claim_no, 'text': text, 'depends_on': list(depends_on or [])})
+    return claims
+
+
+def independent_claims(conn, pub_numbers: Iterable[str]) -> Dict[str, List[Dict]]:
+    """Independent claims only (the partial index on is_independent serves this)."""
+    return fetch_claims(conn, pub_numbers, independent_only=True)
+
+
+def claims_text(claims: List[Dict]) -> str:
+    """Claims joined one per line, the format of patent_data_unified.claims_text."""
+    return '\n'.join(c['text'] for c in claims)
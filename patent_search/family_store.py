@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Family Store - patent families from the patent_families table
+
+patent_families (built by ../family_index.py) maps every publication of a
+family of two or more to a family_id: publications tied together by their
+application, continuity data (continuation, division, ...), provisionals
+or priority claims. Publications that are absent form a family of one.
+
+Before scoring, collapse_families() keeps the first (best ranked) candidate
+of each family and attaches the other candidates of that family to it as
+'family_members', so the LLM scores one representative per family. The
+whole family, including publications that were not candidates, is listed
+by family_members() (GET /api/patent/<pub_number>/family).
+
+Until the table exists every lookup returns nothing (logged once) and every
+candidate is scored; restart the service after building it.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+_table_missing = False
+
+
+def fetch_families(conn, pub_numbers: Iterable[str]) -> Dict[str, Tuple[str, int]]:
+    """(family_id, family_size) per pub_number; publications without a family are absent."""
+    global _table_missing
+    pub_numbers = list(pub_numbers)
+    if _table_missing or not pub_numbers:
+        return {}
+
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT pub_number, family_id, family_size
+            FROM patent_families
+            WHERE pub_number = ANY(%s)
+        """, (pub_numbers,))
+        rows = cur.fetchall()
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        _table_missing = True
+        logger.warning("patent_families does not exist; family members are scored separately")
+        return {}
+    finally:
+        cur.close()
+
+    return {pub_number: (family_id, family_size) for pub_number, family_id, family_size in rows}
+
+
+def collapse_families(candidates: List[Dict], families: Dict[str, Tuple[str, int]]) -> List[Dict]:
+    """
+    One representative per family, in the original order.
+
+    The representative gets 'family_id', 'family_size' (the whole family)
+    and 'family_members' (pub_number, title, year of the other candidates
+    of the family), which are not scored themselves.
+    """
+    representatives = []
+    by_family = {}
+    for patent in candidates:
+        family = families.get(patent['pub_number'])
+        if family is None:
+            representatives.append(patent)
+            continue
+        family_id, family_size = family
+        rep = by_family.get(family_id)
+        if rep is not None:
+            rep.setdefault('family_members', []).append({
+                'pub_number': patent['pub_number'],
+                'title': patent.get('title'),
+                'year': patent.get('year'),
+            })
+            continue
+        patent['family_id'] = family_id
+        patent['family_size'] = family_size
+        by_family[family_id] = patent
+        representatives.append(patent)
+
+    if len(representatives) < len(candidates):
+        logger.info(f"Families: {len(candidates)} candidates -> {len(representatives)} to score")
+    return representatives
+
+
+def family_members(conn, pub_number: str) -> List[Dict]:
+    """All publications of the family of pub_number, oldest publication date first; empty without a family."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT m.pub_number, u.title, u.year, u.pub_date, u.application_number
+            FROM patent_families f
+            JOIN patent_families m ON m.family_id = f.family_id
+            LEFT JOIN patent_data_unified u ON u.pub_number = m.pub_number
+            WHERE f.pub_number = %s
+            ORDER BY u.pub_date NULLS LAST, m.pub_number
+        """, (pub_number,))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+
+    return [{
+        'pub_number': member,
+        'title': title,
+        'year': year,
+        'pub_date': pub_date.isoformat() if pub_date else None,
+        'application_number': application_number,
+    } for member, title, year, pub_date, application_number in rows]
@@ -0,0 +1,180 @@
+"""
+LLM work scheduler: every Ollama call in a search service takes a slot here.
+
+Ollama serves OLLAMA_SLOTS generations at a time (match OLLAMA_NUM_PARALLEL);
+everything else waits in this process instead of piling up inside Ollama.
+When a slot frees up the next call is chosen by:
+
+  1. priority class - interactive before batch before report
+  2. per-class cap  - a class never holds more than its cap of slots
+                      (LLM_CLASS_CAPS, e.g. "interactive=2,batch=1,report=1"),
+                      so background work only uses otherwise idle capacity
+  3. round-robin    - between owners (searches, batch jobs) of the same
+                      class, one call each in turn, so a 50-patent search
+                      cannot starve a search submitted after it
+
+The owner and class come from work() set around a unit of work:
+
+    with llm_scheduler.work(search_id, 'interactive'):
+        ...  # every ollama_client.generate() in here is scheduled as search_id
+
+Calls made outside work() are scheduled as interactive, one owner per thread.
+The scheduler is per process; the two search services each hold their own.
+The per-class cap of the background classes (batch, report) also holds
+across processes: such a call first takes one of its class's cap lock files
+in LLM_LOCK_DIR (flock), so a batch_search.py run from the command line and
+the services together never send more background calls than the cap.
+"""
+
+import contextvars
+import fcntl
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Tuple
+
+PRIORITIES = ('interactive', 'batch', 'report')
+
+OLLAMA_SLOTS = int(os.environ.get('OLLAMA_SLOTS', 1))
+LLM_LOCK_DIR = os.environ.get('LLM_LOCK_DIR', '/tmp/patent_search_llm_slots')
+SHARED_SLOT_POLL_SECONDS = 0.2
+
+
+def parse_class_caps(value: str, slots: int) -> Dict[str, int]:
+    """'interactive=2,batch=1' -> caps per class; unset classes may use every slot."""
+    caps = {p: slots for p in PRIORITIES}
+    for item in (value or '').split(','):
+        name, _, cap = item.partition('=')
+        name = name.strip()
+        if not name:
+            continue
+        if name not in caps:
+            raise ValueError(f"Unknown LLM priority class: {name}")
+        caps[name] = max(1, min(int(cap), slots))
+    return caps
+
+
+_work = contextvars.ContextVar('llm_work', default=None)
+
+
+@contextmanager
+def work(owner: str, priority: str = 'interactive'):
+    """Schedule LLM calls made inside this block as `owner` in class `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority class: {priority}")
+    token = _work.set((owner, priority))
+    try:
+        yield
+    finally:
+        _work.reset(token)
+
+
+def current_work() -> Tuple[str, str]:
+    return _work.get() or (threading.current_thread().name, 'interactive')
+
+
+@contextmanager
+def shared_slot(priority: str, cap: int):
+    """Hold one of `cap` lock files of a class, shared by every process on this host."""
+    os.makedirs(LLM_LOCK_DIR, exist_ok=True)
+    while True:
+        for i in range(cap):
+            f = open(os.path.join(LLM_LOCK_DIR, f"{priority}.{i}.lock"), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            try:
+                yield
+            finally:
+                # Closing the file releases the lock, also when the process dies
+                f.close()
+            return
+        time.sleep(SHARED_SLOT_POLL_SECONDS)
+
+
+class LLMScheduler:
+    def __init__(self, slots: int = OLLAMA_SLOTS, caps: Dict[str, int] = None):
+        self.slots = max(1, slots)
+        self.caps = caps or parse_class_caps(os.environ.get('LLM_CLASS_CAPS', ''), self.slots)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.in_use_by_class = {p: 0 for p in PRIORITIES}
+        # class -> owner -> deque of waiting events; owner order is the round-robin order
+        self.waiting = {p: OrderedDict() for p in PRIORITIES}
+
+    def _dispatch(self):
+        """Hand free slots to waiters. Caller holds self.lock."""
+        while self.in_use < self.slots:
+            for priority in PRIORITIES:
+                owners = self.waiting[priority]
+                if owners and self.in_use_by_class[priority] < self.caps[priority]:
+                    owner, queue = next(iter(owners.items()))
+                    event = queue.popleft()
+                    # Owner goes to the back of the line if it has more calls waiting
+                    del owners[owner]
+                    if queue:
+                        owners[owner] = queue
+                    self.in_use += 1
+                    self.in_use_by_class[priority] += 1
+                    event.set()
+                    break
+            else:
+                return
+
+    @contextmanager
+    def slot(self, owner: str = None, priority: str = None):
+        """Block until this call may run; yields the seconds spent waiting."""
+        if owner is None or priority is None:
+            default_owner, default_priority = current_work()
+            owner = owner or default_owner
+            priority = priority or default_priority
+
+        start = time.time()
+        with ExitStack() as stack:
+            if priority != 'interactive':
+                # Taken before queueing here, so waiting for another process never holds a local slot
+                stack.enter_context(shared_slot(priority, self.caps[priority]))
+            event = threading.Event()
+            with self.lock:
+                self.waiting[priority].setdefault(owner, deque()).append(event)
+                self._dispatch()
+            event.wait()
+            try:
+                yield time.time() - start
+            finally:
+                with self.lock:
+                    self.in_use -= 1
+                    self.in_use_by_class[priority] -= 1
+                    self._dispatch()
+
+    def waiting_count(self) -> int:
+        with self.lock:
+            return sum(len(q) for owners in self.waiting.values() for q in owners.values())
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'slots': self.slots,
+                'in_use': self.in_use,
+                'caps': dict(self.caps),
+                'in_use_by_class': dict(self.in_use_by_class),
+                'waiting_by_class': {p: sum(len(q) for q in owners.values())
+                                     for p, owners in self.waiting.items()},
+                'waiting_owners': {p: len(owners) for p, owners in self.waiting.items()},
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
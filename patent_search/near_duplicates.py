@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Near Duplicates - MinHash signatures for collapsing scoring candidates
+
+Build (offline job, re-run after new archives are loaded):
+    python near_duplicates.py build [signature_dir] [--workers N]
+
+Continuations, divisionals and republished A1/A9 documents share almost all
+of their abstract and claims, and each one costs a full LLM scoring call.
+The build computes a MinHash signature over word shingles of the abstract
+and claims of every patent_data_unified row and writes NumPy arrays:
+
+    keys.npy        sorted pub_numbers (S12)
+    signatures.npy  one row of MINHASH_PERMUTATIONS uint32 values per key
+
+The search services memory-map them. Before scoring, collapse_candidates()
+buckets the candidates by LSH bands of their signatures, keeps the first
+(best ranked) candidate of each cluster and attaches the others to it as
+'near_duplicates', so only one candidate per cluster goes to the LLM.
+Candidates missing from the index (loaded after the last build) get a
+signature computed from the text they carry.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from prompt_builder import patent_claims_text
+from signature_build import KEY_DTYPE, build_signatures, fresh_tmp_dir, swap_dir
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATES_DIR = os.environ.get('NEAR_DUPLICATES_DIR', '/mnt/patents/data/indexes/near_duplicates')
+
+# Estimated Jaccard similarity at or above which two candidates are collapsed
+NEAR_DUP_THRESHOLD = float(os.environ.get('NEAR_DUP_THRESHOLD', 0.8))
+
+# 16 bands x 4 rows: pairs above ~0.5 Jaccard share a band with high probability,
+# the threshold check then keeps only true near-duplicates
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_WORDS = 4
+MINHASH_SEED = 20240611
+
+EMPTY = np.uint32(0xFFFFFFFF)
+
+RE_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _permutations(count: int = MINHASH_PERMUTATIONS, seed: int = MINHASH_SEED):
+    """Multiply-shift hash parameters; identical for the build and the services."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=count, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=count, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutations()
+
+
+def signature_text(patent: Dict) -> str:
+    """Abstract and claims, the parts that repeat across continuations and republications."""
+    return f"{patent.get('abstract_text') or ''}\n{patent_claims_text(patent) or ''}"
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MINHASH_PERMUTATIONS uint32 values; all EMPTY when the text has no shingles."""
+    words = RE_WORD.findall((text or '').lower())
+    if not words:
+        return np.full(MINHASH_PERMUTATIONS, EMPTY, dtype=np.uint32)
+    n = max(1, len(words) - SHINGLE_WORDS + 1)
+    return minhash({' '.join(words[i:i + SHINGLE_WORDS]) for i in range(n)})
+
+
+def minhash(items: Set[str]) -> np.ndarray:
+    """MinHash signature of a non-empty set of strings (shingles, words)."""
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in items), dtype=np.uint64, count=len(items))
+    # uint64 arithmetic wraps around; the high 32 bits are the permuted hash
+    return ((_A * hashes + _B) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def band_keys(signature: np.ndarray, bands: int = LSH_BANDS) -> List[bytes]:
+    rows = len(signature) // bands
+    return [bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+
+class SignatureIndex:
+    """Read-only, memory-mapped MinHash signatures keyed by pub_number."""
+
+    def __init__(self, index_dir: str = NEAR_DUPLICATES_DIR):
+        self.index_dir = Path(index_dir)
+        self.keys = np.load(self.index_dir / 'keys.npy', mmap_mode='r')
+        self.signatures = np.load(self.index_dir / 'signatures.npy', mmap_mode='r')
+        meta_path = self.index_dir / 'meta.json'
+        self.meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if self.meta.get('permutations', MINHASH_PERMUTATIONS) != MINHASH_PERMUTATIONS or \
+                self.meta.get('seed', MINHASH_SEED) != MINHASH_SEED:
+            raise ValueError(f"Signatures in {index_dir} were built with other MinHash parameters")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, pub_numbers: List[str]) -> Dict[str, np.ndarray]:
+        """Signatures of the pub_numbers present in the index."""
+        if not pub_numbers or len(self.keys) == 0:
+            return {}
+        wanted = np.array([str(p).encode('ascii', errors='ignore') for p in pub_numbers], dtype=KEY_DTYPE)
+        pos = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        found = self.keys[pos] == wanted
+        return {pub_numbers[i]: np.array(self.signatures[pos[i]]) for i in np.flatnonzero(found)}
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_missing_logged = False
+
+
+def get_signature_index() -> Optional[SignatureIndex]:
+    """Process-wide index, loaded lazily; None when no index has been built."""
+    global _index, _index_missing_logged
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = SignatureIndex(NEAR_DUPLICATES_DIR)
+                logger.info(f"Near-duplicate signatures loaded: {len(_index)} rows from {NEAR_DUPLICATES_DIR}")
+            except FileNotFoundError:
+                if not _index_missing_logged:
+                    logger.warning(f"No near-duplicate signatures at {NEAR_DUPLICATES_DIR}, "
+                                   f"computing them from candidate text")
+                    _index_missing_logged = True
+    return _index
+
+
+def collapse_candidates(candidates: List[Dict], threshold: float = NEAR_DUP_THRESHOLD,
+                        index: Optional[SignatureIndex] = None) -> List[Dict]:
+    """
+    One representative per near-duplicate cluster, in the original order.
+
+    Siblings are attached to their representative as 'near_duplicates'
+    (pub_number, title, year, similarity) and are not scored themselves.
+    """
+    if len(candidates) < 2:
+        return candidates
+    if index is None:
+        index = get_signature_index()
+    known = index.lookup([c['pub_number'] for c in candidates]) if index is not None else {}
+
+    representatives = []
+    buckets: Dict[bytes, List[int]] = {}
+    for patent in candidates:
+        signature = known.get(patent['pub_number'])
+        if signature is None:
+            signature = minhash_signature(signature_text(patent))
+        if (signature == EMPTY).all():
+            representatives.append((patent, None))
+            continue
+
+        keys = band_keys(signature)
+        best, best_similarity = None, threshold
+        for rep in sorted({r for key in keys for r in buckets.get(key, ())}):
+            score = similarity(signature, representatives[rep][1])
+            if score >= best_similarity:
+                best, best_similarity = rep, score
+        if best is not None:
+            representatives[best][0].setdefault('near_duplicates', []).append({
+                'pub_number': patent['pub_number'],
+                'title': patent.get('title'),
+                'year': patent.get('year'),
+                'similarity': round(best_similarity, 3),
+            })
+            continue
+
+        for key in keys:
+            buckets.setdefault(key, []).append(len(representatives))
+        representatives.append((patent, signature))
+
+    if len(representatives) < len(candidates):
+        logger.info(f"Near duplicates: {len(candidates)} candidates -> {len(representatives)} to score")
+    return [patent for patent, _ in representatives]
+
+
+# ---------------------------------------------------------------------------
+# Build job
+# ---------------------------------------------------------------------------
+
+def _signature_chunk(rows: List[tuple]) -> np.ndarray:
+    """Worker: signatures for (pub_number, abstract_text, claims_text, description_head) rows."""
+    out = np.empty((len(rows), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    for i, (_, abstract, claims, description) in enumerate(rows):
+        out[i] = minhash_signature(signature_text({
+            'abstract_text': abstract, 'claims_text': claims, 'description_text': description,
+        }))
+    return out
+
+
+# Claims embedded in description_text (CLAIMS: ... DESCRIPTION:) sit at its start.
+# The whole CLAIMS: block is fetched up to and including the DESCRIPTION: marker (or
+# the first 3000 characters without one), so patent_claims_text() cuts it exactly as
+# it does for candidates carrying the full description at search time.
+SIGNATURE_SQL = """
+    SELECT pub_number, abstract_text, claims_text,
+           CASE WHEN claims_text IS NULL AND description_text LIKE 'CLAIMS:%' THEN
+               left(description_text,
+                    CASE WHEN strpos(description_text, E'\\n\\nDESCRIPTION:') > 0
+                         THEN strpos(description_text, E'\\n\\nDESCRIPTION:') + 13
+                         ELSE 3000 END)
+           END
+    FROM patent_data_unified
+    WHERE pub_number IS NOT NULL
+"""
+
+
+def build(index_dir: str = NEAR_DUPLICATES_DIR, workers: int = os.cpu_count() or 4) -> None:
+    start = time.time()
+    out_dir = Path(index_dir)
+    tmp_dir = fresh_tmp_dir(out_dir)
+    count = build_signatures(tmp_dir, SIGNATURE_SQL, _signature_chunk, MINHASH_PERMUTATIONS,
+                             workers, 'near_duplicates_build')
+
+    (tmp_dir / 'meta.json').write_text(json.dumps({
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rows': int(count),
+        'permutations': MINHASH_PERMUTATIONS,
+        'bands': LSH_BANDS,
+        'shingle_words': SHINGLE_WORDS,
+        'seed': MINHASH_SEED,
+    }, indent=2))
+    swap_dir(tmp_dir, out_dir)
+
+    logger.info(f"Near-duplicate signatures written to {out_dir}: {count} rows "
+                f"in {(time.time() - start) / 60:.1f} min")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    workers = os.cpu_count() or 4
+    if '--workers' in args:
+        i = args.index('--workers')
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if not args or args[0] != 'build':
+        print("Usage: python near_duplicates.py build [signature_dir] [--workers N]")
+        sys.exit(1)
+    build(args[1] if len(args) >= 2 else NEAR_DUPLICATES_DIR, workers)
@@ -0,0 +1,53 @@
+"""
+Ollama /api/generate calls shared by the patent search services.
+
+generate() is a drop-in for requests.post(OLLAMA_URL, json=..., timeout=...):
+callers keep their own status / timeout handling, while every call waits
+for a slot from llm_scheduler, is timed, has its token counts recorded in
+search_metrics and gets an 'ollama_generate' span in the current search
+trace. The timeout applies to the request itself, not the slot wait.
+"""
+
+import time
+from typing import Dict
+
+import requests
+
+import llm_scheduler
+import search_metrics
+import search_tracing
+
+
+def generate(url: str, payload: Dict, timeout: float) -> requests.Response:
+    """POST a non-streaming generate request and record latency and tokens."""
+    owner, priority = llm_scheduler.current_work()
+    with search_tracing.span('ollama_generate', timeout=timeout, prompt_chars=len(payload.get('prompt', '')),
+                             priority=priority) as s, \
+            llm_scheduler.get_scheduler().slot(owner, priority) as waited:
+        s.set('queue_ms', round(waited * 1000, 1))
+        search_metrics.LLM_QUEUE_SECONDS.labels(priority=priority).observe(waited)
+        start = time.time()
+        try:
+            response = requests.post(url, json=payload, timeout=timeout)
+        except requests.exceptions.Timeout:
+            search_metrics.observe_ollama('timeout', time.time() - start)
+            raise
+        except requests.exceptions.RequestException:
+            search_metrics.observe_ollama('error', time.time() - start)
+            raise
+
+        elapsed = time.time() - start
+        s.set('status_code', response.status_code)
+        if response.status_code != 200:
+            search_metrics.observe_ollama('http_error', elapsed)
+            return response
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        search_metrics.observe_ollama('ok', elapsed, result)
+        if result:
+            s.set('prompt_eval_count', result.get('prompt_eval_count'))
+            s.set('eval_count', result.get('eval_count'))
+        return response
@@ -3,7 +3,7 @@
 Patent Search - Final Version with AI, Progress Bar, and Original Modal Format
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
@@ -14,9 +14,23 @@ import logging
 from typing import List, Dict
 import requests
 import uuid
-import threading
 import time
 
+from search_filters import parse_search_filters, build_filter_sql
+import family_store
+import llm_scheduler
+import ollama_client
+import prompt_builder
+import search_metrics
+import search_refine
+import search_tracing
+from search_executor import SearchExecutor, QueueFull
+
+try:
+    from near_duplicates import collapse_candidates
+except ImportError:  # numpy not installed
+    collapse_candidates = None
+
 app = Flask(__name__,
             template_folder='../templates',
             static_folder='../static')
@@ -33,10 +47,23 @@ DB_CONFIG = {
     'password': os.environ.get('DB_PASSWORD', 'mark123')
 }
 
-OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434/api/generate')
 MODEL_NAME = 'gpt-oss:20b'
 
+# Abstract scoring options; num_ctx is sized per prompt by prompt_builder.scoring_options
+ABSTRACT_SCORING_OPTIONS = {
+    'temperature': 0.3,
+    'num_predict': 200,
+    'num_ctx': 4096
+}
+
 search_sessions = {}
+search_metrics.track_sessions(search_sessions)
+
+# Searches run on a fixed worker pool; excess requests wait in a bounded queue
+search_executor = SearchExecutor()
+search_metrics.track_queue(search_executor)
+search_metrics.track_llm_scheduler(llm_scheduler.get_scheduler())
 
 class SmartPatentSearch:
     def __init__(self):
@@ -58,7 +85,8 @@ class SmartPatentSearch:
         
         return {'primary_terms': keywords[:30]}
     
-    def search_by_concepts(self, concepts: Dict[str, List[str]]) -> List[Dict]:
+    def search_by_concepts(self, concepts: Dict[str, List[str]], filters: Dict = None,
+                           exclude: List[str] = None) -> List[Dict]:
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
@@ -75,6 +103,16 @@ class SmartPatentSearch:
                 kw_pattern = f'%{keyword.lower()}%'
                 params.extend([kw_pattern, kw_pattern])
             
+            where_sql = ' OR '.join(conditions)
+            filter_sql, filter_params = build_filter_sql(filters or {})
+            if filter_sql:
+                where_sql = f"({where_sql}) AND {filter_sql}" if where_sql else filter_sql
+                params.extend(filter_params)
+            if exclude:
+                # Candidates already held by the search being refined
+                where_sql = f"({where_sql}) AND u.pub_number <> ALL(%s)"
+                params.append(list(exclude))
+            
             query = f"""
             SELECT 
                 u.pub_number,
@@ -85,13 +123,15 @@ class SmartPatentSearch:
                 u.inventors,
                 u.assignees
             FROM patent_data_unified u
-            WHERE {' OR '.join(conditions)}
+            WHERE {where_sql}
             ORDER BY u.year DESC
             LIMIT 50
             """
             
+            query_start = time.time()
             cur.execute(query, params)
             results = cur.fetchall()
+            search_metrics.observe_db_query('concept_search', time.time() - query_start, len(results))
             
             for patent in results:
                 for field in ['inventors', 'assignees']:
@@ -110,17 +150,47 @@ class SmartPatentSearch:
             cur.close()
             conn.close()
     
-    def score_with_ai_async(self, results: List[Dict], description: str, search_id: str):
-        if not results:
-            search_sessions[search_id]['stage'] = 'complete'
+    def families_of(self, pub_numbers: List[str]) -> Dict:
+        """Family of each candidate from patent_families in one query."""
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            query_start = time.time()
+            families = family_store.fetch_families(conn, pub_numbers)
+            search_metrics.observe_db_query('families', time.time() - query_start, len(families))
+        finally:
+            conn.close()
+        return families
+    
+    def score_with_ai_async(self, results: List[Dict], description: str, search_id: str,
+                            scored: List[Dict] = None):
+        """Score results with the LLM; scored are candidates carried over with their scores."""
+        if not results and not scored:
             search_sessions[search_id]['results'] = []
+            search_metrics.set_stage(search_sessions[search_id], 'complete')
             return
         
-        search_sessions[search_id]['stage'] = 'scoring'
+        if len(results) > 1:
+            # One LLM call per patent family; the other members ride along on the representative
+            with search_tracing.span('collapse_families', candidates=len(results)) as s:
+                families = self.families_of([p['pub_number'] for p in results])
+                collapsed = family_store.collapse_families(results, families)
+                s.set('kept', len(collapsed))
+            search_metrics.FAMILY_MEMBERS.inc(len(results) - len(collapsed))
+            results = collapsed
+        
+        if collapse_candidates and len(results) > 1:
+            # One LLM call per near-duplicate cluster; siblings ride along on the representative
+            with search_tracing.span('collapse_near_duplicates', candidates=len(results)) as s:
+                collapsed = collapse_candidates(results)
+                s.set('kept', len(collapsed))
+            search_metrics.NEAR_DUPLICATES.inc(len(results) - len(collapsed))
+            results = collapsed
+        
+        search_metrics.set_stage(search_sessions[search_id], 'scoring')
         search_sessions[search_id]['total'] = len(results)
         search_sessions[search_id]['current'] = 0
         
-        scored_results = []
+        scored_results = list(scored or [])
         
         for i, patent in enumerate(results):
             try:
@@ -133,9 +203,11 @@ class SmartPatentSearch:
                 logger.debug(f"Abstract length: {len(patent_abstract)} chars")
                 
                 # Limit abstract length to prevent timeouts
-                if len(patent_abstract) > 3000:
-                    logger.info(f"Patent {i+1} abstract truncated from {len(patent_abstract)} to 3000 chars")
-                    patent_abstract = patent_abstract[:3000] + "..."
+                truncated = prompt_builder.truncate_tokens(patent_abstract, prompt_builder.PROMPT_ABSTRACT_SCORING_TOKENS)
+                if len(truncated) < len(patent_abstract):
+                    logger.info(f"Patent {i+1} abstract truncated from {prompt_builder.estimate_tokens(patent_abstract)} "
+                                f"to {prompt_builder.PROMPT_ABSTRACT_SCORING_TOKENS} tokens")
+                    patent_abstract = truncated
                 
                 # Skip if abstract is empty or too short
                 if len(patent_abstract) < 10:
@@ -159,7 +231,7 @@ Important rules:
 - Keep reasoning concise and factual
 - Do not invent overlaps that are not present
 
-User's invention description: {description[:2000] if len(description) > 2000 else description}
+User's invention description: {prompt_builder.truncate_tokens(description, prompt_builder.PROMPT_DESCRIPTION_TOKENS)}
 
 Patent description: {patent_abstract}
 
@@ -168,15 +240,11 @@ Score: [number]/100
 Reasoning: [explanation]"""
 
                 # Start with shorter timeout, AI usually responds in 10-30 seconds
-                response = requests.post(OLLAMA_URL, json={
+                response = ollama_client.generate(OLLAMA_URL, {
                     'model': MODEL_NAME,
                     'prompt': prompt,
                     'stream': False,
-                    'options': {
-                        'temperature': 0.3,
-                        'num_predict': 200,
-                        'num_ctx': 4096
-                    }
+                    'options': prompt_builder.scoring_options(prompt, ABSTRACT_SCORING_OPTIONS)
                 }, timeout=45)  # 45 second initial timeout
                 
                 if response.status_code == 200:
@@ -213,15 +281,11 @@ Reasoning: [explanation]"""
                 logger.warning(f"Ollama timeout for patent {i+1} after 45s - retrying with longer timeout")
                 # Try one more time with longer timeout for complex patents
                 try:
-                    response = requests.post(OLLAMA_URL, json={
+                    response = ollama_client.generate(OLLAMA_URL, {
                         'model': MODEL_NAME,
                         'prompt': prompt,
                         'stream': False,
-                        'options': {
-                            'temperature': 0.3,
-                            'num_predict': 200,
-                            'num_ctx': 4096
-                        }
+                        'options': prompt_builder.scoring_options(prompt, ABSTRACT_SCORING_OPTIONS)
                     }, timeout=120)  # 2 minute retry for complex patents
                     
                     if response.status_code == 200:
@@ -255,8 +319,8 @@ Reasoning: [explanation]"""
         
         scored_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
         
-        search_sessions[search_id]['stage'] = 'complete'
         search_sessions[search_id]['results'] = scored_results[:50]
+        search_metrics.set_stage(search_sessions[search_id], 'complete')
 
 search_engine = SmartPatentSearch()
 
@@ -622,7 +686,10 @@ SEARCH_HTML = '''<!DOCTYPE html>
                     const response = await fetch('/api/search-progress/' + currentSearchId);
                     const data = await response.json();
                     
-                    if (data.stage === 'extracting') {
+                    if (data.stage === 'queued') {
+                        const wait = data.estimated_wait_seconds ? ' (about ' + Math.ceil(data.estimated_wait_seconds / 60) + ' min)' : '';
+                        updateProgress(5, 'Queued: position ' + (data.queue_position || 1) + wait + '...', 1);
+                    } else if (data.stage === 'extracting') {
                         updateProgress(10, 'Extracting keywords...', 1);
                     } else if (data.stage === 'searching') {
                         updateProgress(30, 'Searching database...', 2);
@@ -779,43 +846,168 @@ def professional_search():
         if not description:
             return jsonify({'success': False, 'error': 'Description required'}), 400
         
+        try:
+            filters = parse_search_filters(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         search_id = str(uuid.uuid4())
         
         search_sessions[search_id] = {
-            'stage': 'extracting',
+            'created': time.time(),
             'current': 0,
             'total': 0,
             'results': []
         }
+        search_metrics.set_stage(search_sessions[search_id], 'queued')
         
-        thread = threading.Thread(target=process_search, args=(search_id, description))
-        thread.start()
+        try:
+            search_executor.submit(search_id, process_search, search_id, description, filters)
+        except QueueFull as e:
+            del search_sessions[search_id]
+            search_metrics.REJECTED_SEARCHES.inc()
+            logger.warning(f"Search rejected, queue full ({search_executor.queued()} waiting)")
+            return jsonify({
+                'success': False,
+                'error': f'Too many searches in progress, please retry in {e.retry_after} seconds',
+                'retry_after': e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
         
         return jsonify({
             'success': True,
-            'search_id': search_id
+            'search_id': search_id,
+            'queue_position': search_executor.position(search_id)
         })
         
     except Exception as e:
         logger.error(f"Search error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def process_search(search_id, description):
+def process_search(search_id, description, filters=None):
+    search_metrics.ACTIVE_SEARCHES.inc()
     try:
-        search_sessions[search_id]['stage'] = 'extracting'
-        concepts = search_engine.extract_concepts(description)
-        time.sleep(0.5)
+        with search_tracing.trace_search(search_id), llm_scheduler.work(search_id, 'interactive'):
+            search_metrics.set_stage(search_sessions[search_id], 'extracting')
+            with search_tracing.span('extract_concepts'):
+                concepts = search_engine.extract_concepts(description)
+            remember_query(search_id, description, filters, concepts)
+            time.sleep(0.5)
+            
+            search_metrics.set_stage(search_sessions[search_id], 'searching')
+            with search_tracing.span('search_by_concepts') as s:
+                results = search_engine.search_by_concepts(concepts, filters)
+                s.set('rows', len(results))
+            time.sleep(0.5)
+            
+            search_engine.score_with_ai_async(results, description, search_id)
         
-        search_sessions[search_id]['stage'] = 'searching'
-        results = search_engine.search_by_concepts(concepts)
-        time.sleep(0.5)
+    except Exception as e:
+        logger.error(f"Background search error: {e}")
+        search_sessions[search_id]['error'] = str(e)
+        search_metrics.set_stage(search_sessions[search_id], 'error')
+    finally:
+        search_metrics.ACTIVE_SEARCHES.dec()
+
+def remember_query(search_id, description, filters, concepts):
+    """Keep what a later /api/refine-search needs to compare against."""
+    session = search_sessions[search_id]
+    session['description'] = description
+    session['filters'] = filters or {}
+    session['terms'] = concepts.get('primary_terms', [])
+
+@app.route('/api/refine-search', methods=['POST'])
+def refine_search():
+    """Re-run a finished search with an edited description, reusing its candidates and scores."""
+    try:
+        data = request.get_json()
+        previous_id = data.get('search_id', '')
+        description = data.get('invention_description', '').strip()
         
-        search_engine.score_with_ai_async(results, description, search_id)
+        if not description:
+            return jsonify({'success': False, 'error': 'Description required'}), 400
+        previous = search_sessions.get(previous_id)
+        if not previous:
+            return jsonify({'success': False, 'error': 'Unknown search_id'}), 404
+        if previous['stage'] != 'complete':
+            return jsonify({'success': False, 'error': 'Previous search has not finished'}), 409
+        
+        try:
+            filters = parse_search_filters(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        search_id = str(uuid.uuid4())
+        search_sessions[search_id] = {
+            'created': time.time(),
+            'refined_from': previous_id,
+            'current': 0,
+            'total': 0,
+            'results': []
+        }
+        search_metrics.set_stage(search_sessions[search_id], 'queued')
+        
+        try:
+            search_executor.submit(search_id, process_refine, search_id, previous_id, description, filters)
+        except QueueFull as e:
+            del search_sessions[search_id]
+            search_metrics.REJECTED_SEARCHES.inc()
+            return jsonify({
+                'success': False,
+                'error': f'Too many searches in progress, please retry in {e.retry_after} seconds',
+                'retry_after': e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
+        
+        return jsonify({
+            'success': True,
+            'search_id': search_id,
+            'refined_from': previous_id,
+            'queue_position': search_executor.position(search_id)
+        })
         
     except Exception as e:
-        logger.error(f"Background search error: {e}")
-        search_sessions[search_id]['stage'] = 'error'
+        logger.error(f"Refine error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def process_refine(search_id, previous_id, description, filters):
+    search_metrics.ACTIVE_SEARCHES.inc()
+    try:
+        with search_tracing.trace_search(search_id, refined_from=previous_id), \
+                llm_scheduler.work(search_id, 'interactive'):
+            previous = search_sessions[previous_id]
+            search_metrics.set_stage(search_sessions[search_id], 'extracting')
+            with search_tracing.span('extract_concepts'):
+                concepts = search_engine.extract_concepts(description)
+            remember_query(search_id, description, filters, concepts)
+            
+            search_metrics.set_stage(search_sessions[search_id], 'searching')
+            if (filters or {}) != previous.get('filters', {}):
+                # Different filters select a different candidate set: nothing to reuse
+                with search_tracing.span('search_by_concepts') as s:
+                    results = search_engine.search_by_concepts(concepts, filters)
+                    s.set('rows', len(results))
+                search_engine.score_with_ai_async(results, description, search_id)
+                return
+            
+            plan = search_refine.plan_refinement(previous, description, concepts.get('primary_terms', []),
+                                                 ('title', 'abstract_text'))
+            new_results = []
+            if plan['added_terms']:
+                with search_tracing.span('search_by_concepts', terms=len(plan['added_terms'])) as s:
+                    new_results = search_engine.search_by_concepts({'primary_terms': plan['added_terms']},
+                                                                   filters, exclude=plan['exclude'])
+                    s.set('rows', len(new_results))
+            search_sessions[search_id]['refinement'] = search_refine.summary(plan, len(new_results))
+            logger.info(f"Refining {previous_id}: {search_sessions[search_id]['refinement']}")
+            
+            search_engine.score_with_ai_async(plan['rescore'] + new_results, description, search_id,
+                                              scored=plan['reused'])
+        
+    except Exception as e:
+        logger.error(f"Background refine error: {e}")
         search_sessions[search_id]['error'] = str(e)
+        search_metrics.set_stage(search_sessions[search_id], 'error')
+    finally:
+        search_metrics.ACTIVE_SEARCHES.dec()
 
 @app.route('/api/search-progress/<search_id>')
 def get_progress(search_id):
@@ -823,12 +1015,34 @@ def get_progress(search_id):
         return jsonify({'stage': 'not_found'})
     
     session = search_sessions[search_id]
-    return jsonify({
+    progress = {
         'stage': session['stage'],
         'current': session.get('current', 0),
         'total': session.get('total', 0),
         'results': session.get('results', [])
-    })
+    }
+    if session.get('refinement'):
+        progress['refinement'] = session['refinement']
+    if session['stage'] == 'queued':
+        position = search_executor.position(search_id)
+        if position:
+            progress['queue_position'] = position
+            progress['estimated_wait_seconds'] = search_executor.estimated_wait(position)
+    return jsonify(progress)
+
+@app.route('/metrics')
+def metrics():
+    body, content_type, status = search_metrics.render()
+    return Response(body, status=status, content_type=content_type)
+
+@app.route('/api/search-trace/<search_id>')
+def search_trace(search_id):
+    trace = search_tracing.render_trace(search_id)
+    if trace is None:
+        return jsonify({'error': 'No trace for this search'}), 404
+    if request.args.get('format') == 'text':
+        return Response(search_tracing.render_text(trace), content_type='text/plain')
+    return jsonify(trace)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8093))
@@ -4,7 +4,7 @@ Patent Search with Claims - Enhanced AI Relevance Scoring
 Extracts patent claims for better AI scoring
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
@@ -18,13 +18,37 @@ import uuid
 import threading
 import time
 import zipfile
+import sys
 import tarfile
-import xml.etree.ElementTree as ET
 import tempfile
 import shutil
 from datetime import datetime
+from collections import OrderedDict
 import glob
 
+# patent_document.py (the XML claims parser shared with claims_backfill.py) lives in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import patent_document
+
+from search_filters import parse_search_filters, build_filter_sql
+import llm_scheduler
+import batch_search
+import claims_search
+import claims_store
+import family_store
+import ollama_client
+import prompt_builder
+import query_language
+import search_metrics
+import search_refine
+import search_tracing
+from search_executor import SearchExecutor, QueueFull
+
+try:
+    from near_duplicates import collapse_candidates
+except ImportError:  # numpy not installed
+    collapse_candidates = None
+
 app = Flask(__name__,
             template_folder='../templates',
             static_folder='../static')
@@ -41,21 +65,47 @@ DB_CONFIG = {
     'password': os.environ.get('DB_PASSWORD', 'mark123')
 }
 
-OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434/api/generate')
 MODEL_NAME = 'gpt-oss:20b'
 
 STORES = ['/mnt/store1/originals', '/mnt/store2/originals']
 TEMP_DIR = '/tmp/patent_extraction'
+# Archive lookups (claims or a miss) remembered per pub_number
+CLAIMS_CACHE_SIZE = int(os.environ.get('CLAIMS_CACHE_SIZE', 5000))
 
 search_sessions = {}
+search_metrics.track_sessions(search_sessions)
+
+# Searches run on a fixed worker pool; excess requests wait in a bounded queue
+search_executor = SearchExecutor()
+search_metrics.track_queue(search_executor)
+search_metrics.track_llm_scheduler(llm_scheduler.get_scheduler())
 
 class ClaimsExtractor:
     """Extract claims from patent XML files"""
     
     def __init__(self):
-        self.archive_cache = {}
+        self.archive_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
         os.makedirs(TEMP_DIR, exist_ok=True)
         
+    def claims_from_table(self, patent_numbers):
+        """Split claims of many patents from patent_claims in one query."""
+        if not patent_numbers:
+            return {}
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            query_start = time.time()
+            with search_tracing.span('claims_table_lookup', patents=len(patent_numbers)) as s:
+                claims = claims_store.fetch_claims(conn, patent_numbers)
+                s.set('found', len(claims))
+            search_metrics.observe_db_query('claims_table', time.time() - query_start, len(claims))
+        finally:
+            conn.close()
+        for _ in claims:
+            search_metrics.count_claims_source('claims_table')
+        return claims
+    
     def find_and_extract_claims(self, patent_number, pub_date=None):
         """Find patent in archives and extract claims"""
         
@@ -64,13 +114,16 @@ class ClaimsExtractor:
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
         try:
-            cur.execute("""
-                SELECT description_text 
-                FROM patent_data_unified 
-                WHERE pub_number = %s
-            """, (patent_number,))
-            
-            result = cur.fetchone()
+            query_start = time.time()
+            with search_tracing.span('claims_db_lookup'):
+                cur.execute("""
+                    SELECT description_text 
+                    FROM patent_data_unified 
+                    WHERE pub_number = %s
+                """, (patent_number,))
+                
+                result = cur.fetchone()
+            search_metrics.observe_db_query('claims_lookup', time.time() - query_start, 1 if result else 0)
             if result and result['description_text']:
                 # Check if claims are already in description
                 if result['description_text'].startswith('CLAIMS:'):
@@ -82,19 +135,40 @@ class ClaimsExtractor:
                     
                     if claims_text:
                         logger.info(f"Found claims in database for {patent_number}")
+                        search_metrics.count_claims_source('database')
                         return claims_text
         finally:
             cur.close()
             conn.close()
         
-        # Otherwise, extract from XML archives
+        with self.cache_lock:
+            cached = patent_number in self.archive_cache
+            if cached:
+                self.archive_cache.move_to_end(patent_number)
+                claims = self.archive_cache[patent_number]
+        search_metrics.count_cache('claims_archive', cached)
+        
+        if not cached:
+            claims = self.search_archives_for_claims(patent_number, pub_date)
+            with self.cache_lock:
+                self.archive_cache[patent_number] = claims
+                while len(self.archive_cache) > CLAIMS_CACHE_SIZE:
+                    self.archive_cache.popitem(last=False)
+        
+        search_metrics.count_claims_source('archive' if claims else 'none')
+        return claims
+    
+    def search_archives_for_claims(self, patent_number, pub_date):
+        """Extract claims from the XML archives"""
         logger.info(f"Searching archives for patent {patent_number} claims")
         
         # Determine likely archive based on date or patent number
         archives_to_check = self.get_likely_archives(patent_number, pub_date)
         
         for archive_path in archives_to_check:
-            claims = self.extract_claims_from_archive(archive_path, patent_number)
+            with search_tracing.span('archive', archive=os.path.basename(archive_path)) as s:
+                claims = self.extract_claims_from_archive(archive_path, patent_number)
+                s.set('found', bool(claims))
             if claims:
                 return claims
                 
@@ -164,24 +238,12 @@ class ClaimsExtractor:
         return None
         
     def parse_claims_from_xml(self, xml_path):
-        """Parse claims from patent XML"""
+        """Parse claims from patent XML, one claim per line like claims_text"""
         try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            
-            claims = []
-            claims_elem = root.find('.//claims')
-            if claims_elem is not None:
-                for claim in claims_elem.findall('.//claim'):
-                    claim_text = ' '.join(claim.itertext()).strip()
-                    if claim_text:
-                        # Clean up claim text
-                        claim_text = re.sub(r'\s+', ' ', claim_text)
-                        claims.append(claim_text)
-            
+            claims = patent_document.parse_claims(xml_path)
             if claims:
                 logger.info(f"Extracted {len(claims)} claims from {xml_path}")
-                return '\n\n'.join(claims)
+                return patent_document.claims_text(claims) or None
                 
         except Exception as e:
             logger.error(f"Error parsing XML {xml_path}: {e}")
@@ -209,7 +271,8 @@ class SmartPatentSearchWithClaims:
         
         return {'primary_terms': keywords[:30]}
     
-    def search_by_concepts(self, concepts: Dict[str, List[str]]) -> List[Dict]:
+    def search_by_concepts(self, concepts: Dict[str, List[str]], filters: Dict = None,
+                           exclude: List[str] = None) -> List[Dict]:
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
@@ -227,6 +290,16 @@ class SmartPatentSearchWithClaims:
                 kw_pattern = f'%{keyword.lower()}%'
                 params.extend([kw_pattern, kw_pattern, kw_pattern])
             
+            where_sql = ' OR '.join(conditions)
+            filter_sql, filter_params = build_filter_sql(filters or {})
+            if filter_sql:
+                where_sql = f"({where_sql}) AND {filter_sql}" if where_sql else filter_sql
+                params.extend(filter_params)
+            if exclude:
+                # Candidates already held by the search being refined
+                where_sql = f"({where_sql}) AND u.pub_number <> ALL(%s)"
+                params.append(list(exclude))
+            
             query = f"""
             SELECT 
                 u.pub_number,
@@ -238,13 +311,15 @@ class SmartPatentSearchWithClaims:
                 u.inventors,
                 u.assignees
             FROM patent_data_unified u
-            WHERE {' OR '.join(conditions)}
+            WHERE {where_sql}
             ORDER BY u.year DESC
             LIMIT 50
             """
             
+            query_start = time.time()
             cur.execute(query, params)
             results = cur.fetchall()
+            search_metrics.observe_db_query('concept_search', time.time() - query_start, len(results))
             
             for patent in results:
                 for field in ['inventors', 'assignees']:
@@ -263,99 +338,91 @@ class SmartPatentSearchWithClaims:
             cur.close()
             conn.close()
     
-    def score_with_ai_async(self, results: List[Dict], description: str, search_id: str):
-        if not results:
-            search_sessions[search_id]['stage'] = 'complete'
+    def families_of(self, pub_numbers: List[str]) -> Dict:
+        """Family of each candidate from patent_families in one query."""
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            query_start = time.time()
+            families = family_store.fetch_families(conn, pub_numbers)
+            search_metrics.observe_db_query('families', time.time() - query_start, len(families))
+        finally:
+            conn.close()
+        return families
+    
+    def score_with_ai_async(self, results: List[Dict], description: str, search_id: str,
+                            scored: List[Dict] = None):
+        """Score results with the LLM; scored are candidates carried over with their scores."""
+        if not results and not scored:
             search_sessions[search_id]['results'] = []
+            search_metrics.set_stage(search_sessions[search_id], 'complete')
             return
         
-        search_sessions[search_id]['stage'] = 'extracting_claims'
+        if len(results) > 1:
+            # One LLM call per patent family; the other members ride along on the representative
+            with search_tracing.span('collapse_families', candidates=len(results)) as s:
+                families = self.families_of([p['pub_number'] for p in results])
+                collapsed = family_store.collapse_families(results, families)
+                s.set('kept', len(collapsed))
+            search_metrics.FAMILY_MEMBERS.inc(len(results) - len(collapsed))
+            results = collapsed
+        
+        if collapse_candidates and len(results) > 1:
+            # One LLM call per near-duplicate cluster; siblings ride along on the representative
+            with search_tracing.span('collapse_near_duplicates', candidates=len(results)) as s:
+                collapsed = collapse_candidates(results)
+                s.set('kept', len(collapsed))
+            search_metrics.NEAR_DUPLICATES.inc(len(results) - len(collapsed))
+            results = collapsed
+        
+        search_metrics.set_stage(search_sessions[search_id], 'extracting_claims')
         search_sessions[search_id]['total'] = len(results)
         search_sessions[search_id]['current'] = 0
         
         # Extract claims for each patent
         logger.info(f"Extracting claims for {len(results)} patents")
+        stored = self.claims_extractor.claims_from_table(
+            [p['pub_number'] for p in results if 'claims_text' not in p])
         for i, patent in enumerate(results):
             search_sessions[search_id]['current'] = i + 1
+            if 'claims_text' in patent:
+                continue  # resolved by the search being refined
+            if patent['pub_number'] in stored:
+                patent['claims'] = stored[patent['pub_number']]
+                patent['claims_text'] = claims_store.claims_text(patent['claims'])[:prompt_builder.CLAIMS_KEEP_CHARS]
+                continue
             
             # Try to extract claims
-            claims = self.claims_extractor.find_and_extract_claims(
-                patent['pub_number'],
-                patent.get('pub_date')
-            )
+            with search_tracing.span('find_and_extract_claims', pub_number=patent['pub_number']) as s:
+                claims = self.claims_extractor.find_and_extract_claims(
+                    patent['pub_number'],
+                    patent.get('pub_date')
+                )
+                s.set('found', bool(claims))
             
             if claims:
-                patent['claims_text'] = claims[:5000]  # Limit claims length
+                patent['claims_text'] = claims[:prompt_builder.CLAIMS_KEEP_CHARS]  # Limit claims length
                 logger.info(f"Patent {i+1}: Found claims ({len(claims)} chars)")
             else:
                 patent['claims_text'] = None
                 logger.info(f"Patent {i+1}: No claims found")
         
         # Now score with AI including claims
-        search_sessions[search_id]['stage'] = 'scoring'
+        search_metrics.set_stage(search_sessions[search_id], 'scoring')
         search_sessions[search_id]['current'] = 0
         
-        scored_results = []
+        scored_results = list(scored or [])
         
         for i, patent in enumerate(results):
             try:
                 search_sessions[search_id]['current'] = i + 1
                 
-                # Prepare patent content for AI
-                patent_content = f"Title: {patent.get('title', 'N/A')}\n\n"
-                
-                # Add abstract
-                patent_abstract = patent.get('abstract_text', '')
-                if patent_abstract:
-                    patent_content += f"Abstract: {patent_abstract[:2000]}\n\n"
-                
-                # Add claims if available - MOST IMPORTANT FOR RELEVANCE
-                if patent.get('claims_text'):
-                    patent_content += f"Claims: {patent['claims_text'][:3000]}\n\n"
-                elif patent.get('description_text') and patent['description_text'].startswith('CLAIMS:'):
-                    # Extract claims from description if stored there
-                    claims_end = patent['description_text'].find('\n\nDESCRIPTION:')
-                    if claims_end > 0:
-                        claims = patent['description_text'][7:claims_end]
-                    else:
-                        claims = patent['description_text'][7:3000]
-                    patent_content += f"Claims: {claims[:3000]}\n\n"
-                
-                # Create enhanced prompt with claims emphasis
-                prompt = f"""You are an expert in patents and intellectual property. Your task is to compare a user's invention description against a patent's claims, abstract, and title.
+                prompt = prompt_builder.build_claims_prompt(description, patent)
 
-IMPORTANT: Patent claims define the legal scope of the invention. Pay special attention to claim language when scoring relevance.
-
-Provide:
-1. Relevance Score: A number from 1 to 100, where:
-   - 90-100 = Claims directly overlap with user's invention
-   - 70-89 = Strong overlap in claims or technical approach
-   - 40-69 = Some shared technical concepts but different claims
-   - 1-39 = Different technical field or no claim overlap
-
-2. Reasoning: A short explanation (2-5 sentences) focusing on:
-   - How the patent claims relate to the user's invention
-   - Key technical similarities or differences
-   - Whether the patent would block or relate to the user's invention
-
-User's invention description: {description[:2000] if len(description) > 2000 else description}
-
-Patent information:
-{patent_content}
-
-Output format:
-Score: [number]/100
-Reasoning: [explanation focusing on claim overlap]"""
-
-                response = requests.post(OLLAMA_URL, json={
+                response = ollama_client.generate(OLLAMA_URL, {
                     'model': MODEL_NAME,
                     'prompt': prompt,
                     'stream': False,
-                    'options': {
-                        'temperature': 0.3,
-                        'num_predict': 250,
-                        'num_ctx': 6000  # Increased context for claims
-                    }
+                    'options': prompt_builder.scoring_options(prompt)
                 }, timeout=60)  # 60 second timeout
                 
                 if response.status_code == 200:
@@ -364,24 +431,9 @@ Reasoning: [explanation focusing on claim overlap]"""
                     
                     if score_text:
                         logger.info(f"AI response: {score_text[:200]}")
-                        
-                        # Extract score
-                        score_match = re.search(r'Score:\s*(\d+)', score_text, re.IGNORECASE)
-                        if score_match:
-                            score = min(100, max(1, int(score_match.group(1))))
-                        else:
-                            numbers = re.findall(r'\d+', score_text)
-                            if numbers:
-                                score = min(100, max(1, int(numbers[0])))
-                            else:
-                                score = 50
-                                
-                        # Extract reasoning
-                        reasoning_match = re.search(r'Reasoning:\s*(.+)', score_text, re.IGNORECASE | re.DOTALL)
-                        if reasoning_match:
-                            patent['ai_reasoning'] = reasoning_match.group(1).strip()[:500]
-                    else:
-                        score = 50
+                    score, reasoning = prompt_builder.parse_score(score_text)
+                    if reasoning:
+                        patent['ai_reasoning'] = reasoning
                 else:
                     logger.error(f"Ollama returned status {response.status_code}")
                     score = 50
@@ -393,6 +445,7 @@ Reasoning: [explanation focusing on claim overlap]"""
                 logger.error(f"AI scoring error for patent {i+1}: {e}")
                 score = 50
             
+            patent.pop('claims', None)  # split claims were only needed for the prompt
             patent['relevance_score'] = score / 100.0
             patent['has_claims'] = bool(patent.get('claims_text'))
             scored_results.append(patent)
@@ -400,8 +453,8 @@ Reasoning: [explanation focusing on claim overlap]"""
         
         scored_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
         
-        search_sessions[search_id]['stage'] = 'complete'
         search_sessions[search_id]['results'] = scored_results[:50]
+        search_metrics.set_stage(search_sessions[search_id], 'complete')
 
 search_engine = SmartPatentSearchWithClaims()
 
@@ -789,7 +842,10 @@ SEARCH_HTML = '''<!DOCTYPE html>
                     const response = await fetch('/api/search-progress/' + currentSearchId);
                     const data = await response.json();
                     
-                    if (data.stage === 'extracting') {
+                    if (data.stage === 'queued') {
+                        const wait = data.estimated_wait_seconds ? ' (about ' + Math.ceil(data.estimated_wait_seconds / 60) + ' min)' : '';
+                        updateProgress(5, 'Queued: position ' + (data.queue_position || 1) + wait + '...', 1);
+                    } else if (data.stage === 'extracting') {
                         updateProgress(10, 'Extracting keywords...', 1);
                     } else if (data.stage === 'searching') {
                         updateProgress(25, 'Searching database...', 2);
@@ -971,43 +1027,168 @@ def professional_search():
         if not description:
             return jsonify({'success': False, 'error': 'Description required'}), 400
         
+        try:
+            filters = parse_search_filters(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         search_id = str(uuid.uuid4())
         
         search_sessions[search_id] = {
-            'stage': 'extracting',
+            'created': time.time(),
             'current': 0,
             'total': 0,
             'results': []
         }
+        search_metrics.set_stage(search_sessions[search_id], 'queued')
         
-        thread = threading.Thread(target=process_search, args=(search_id, description))
-        thread.start()
+        try:
+            search_executor.submit(search_id, process_search, search_id, description, filters)
+        except QueueFull as e:
+            del search_sessions[search_id]
+            search_metrics.REJECTED_SEARCHES.inc()
+            logger.warning(f"Search rejected, queue full ({search_executor.queued()} waiting)")
+            return jsonify({
+                'success': False,
+                'error': f'Too many searches in progress, please retry in {e.retry_after} seconds',
+                'retry_after': e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
         
         return jsonify({
             'success': True,
-            'search_id': search_id
+            'search_id': search_id,
+            'queue_position': search_executor.position(search_id)
         })
         
     except Exception as e:
         logger.error(f"Search error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def process_search(search_id, description):
+def process_search(search_id, description, filters=None):
+    search_metrics.ACTIVE_SEARCHES.inc()
+    try:
+        with search_tracing.trace_search(search_id), llm_scheduler.work(search_id, 'interactive'):
+            search_metrics.set_stage(search_sessions[search_id], 'extracting')
+            with search_tracing.span('extract_concepts'):
+                concepts = search_engine.extract_concepts(description)
+            remember_query(search_id, description, filters, concepts)
+            time.sleep(0.5)
+            
+            search_metrics.set_stage(search_sessions[search_id], 'searching')
+            with search_tracing.span('search_by_concepts') as s:
+                results = search_engine.search_by_concepts(concepts, filters)
+                s.set('rows', len(results))
+            time.sleep(0.5)
+            
+            search_engine.score_with_ai_async(results, description, search_id)
+        
+    except Exception as e:
+        logger.error(f"Background search error: {e}")
+        search_sessions[search_id]['error'] = str(e)
+        search_metrics.set_stage(search_sessions[search_id], 'error')
+    finally:
+        search_metrics.ACTIVE_SEARCHES.dec()
+
+def remember_query(search_id, description, filters, concepts):
+    """Keep what a later /api/refine-search needs to compare against."""
+    session = search_sessions[search_id]
+    session['description'] = description
+    session['filters'] = filters or {}
+    session['terms'] = concepts.get('primary_terms', [])
+
+@app.route('/api/refine-search', methods=['POST'])
+def refine_search():
+    """Re-run a finished search with an edited description, reusing its candidates and scores."""
     try:
-        search_sessions[search_id]['stage'] = 'extracting'
-        concepts = search_engine.extract_concepts(description)
-        time.sleep(0.5)
+        data = request.get_json()
+        previous_id = data.get('search_id', '')
+        description = data.get('invention_description', '').strip()
         
-        search_sessions[search_id]['stage'] = 'searching'
-        results = search_engine.search_by_concepts(concepts)
-        time.sleep(0.5)
+        if not description:
+            return jsonify({'success': False, 'error': 'Description required'}), 400
+        previous = search_sessions.get(previous_id)
+        if not previous:
+            return jsonify({'success': False, 'error': 'Unknown search_id'}), 404
+        if previous['stage'] != 'complete':
+            return jsonify({'success': False, 'error': 'Previous search has not finished'}), 409
         
-        search_engine.score_with_ai_async(results, description, search_id)
+        try:
+            filters = parse_search_filters(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        search_id = str(uuid.uuid4())
+        search_sessions[search_id] = {
+            'created': time.time(),
+            'refined_from': previous_id,
+            'current': 0,
+            'total': 0,
+            'results': []
+        }
+        search_metrics.set_stage(search_sessions[search_id], 'queued')
+        
+        try:
+            search_executor.submit(search_id, process_refine, search_id, previous_id, description, filters)
+        except QueueFull as e:
+            del search_sessions[search_id]
+            search_metrics.REJECTED_SEARCHES.inc()
+            return jsonify({
+                'success': False,
+                'error': f'Too many searches in progress, please retry in {e.retry_after} seconds',
+                'retry_after': e.retry_after
+            }), 429, {'Retry-After': str(e.retry_after)}
+        
+        return jsonify({
+            'success': True,
+            'search_id': search_id,
+            'refined_from': previous_id,
+            'queue_position': search_executor.position(search_id)
+        })
         
     except Exception as e:
-        logger.error(f"Background search error: {e}")
-        search_sessions[search_id]['stage'] = 'error'
+        logger.error(f"Refine error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def process_refine(search_id, previous_id, description, filters):
+    search_metrics.ACTIVE_SEARCHES.inc()
+    try:
+        with search_tracing.trace_search(search_id, refined_from=previous_id), \
+                llm_scheduler.work(search_id, 'interactive'):
+            previous = search_sessions[previous_id]
+            search_metrics.set_stage(search_sessions[search_id], 'extracting')
+            with search_tracing.span('extract_concepts'):
+                concepts = search_engine.extract_concepts(description)
+            remember_query(search_id, description, filters, concepts)
+            
+            search_metrics.set_stage(search_sessions[search_id], 'searching')
+            if (filters or {}) != previous.get('filters', {}):
+                # Different filters select a different candidate set: nothing to reuse
+                with search_tracing.span('search_by_concepts') as s:
+                    results = search_engine.search_by_concepts(concepts, filters)
+                    s.set('rows', len(results))
+                search_engine.score_with_ai_async(results, description, search_id)
+                return
+            
+            plan = search_refine.plan_refinement(previous, description, concepts.get('primary_terms', []),
+                                                 ('title', 'abstract_text', 'description_text'))
+            new_results = []
+            if plan['added_terms']:
+                with search_tracing.span('search_by_concepts', terms=len(plan['added_terms'])) as s:
+                    new_results = search_engine.search_by_concepts({'primary_terms': plan['added_terms']},
+                                                                   filters, exclude=plan['exclude'])
+                    s.set('rows', len(new_results))
+            search_sessions[search_id]['refinement'] = search_refine.summary(plan, len(new_results))
+            logger.info(f"Refining {previous_id}: {search_sessions[search_id]['refinement']}")
+            
+            search_engine.score_with_ai_async(plan['rescore'] + new_results, description, search_id,
+                                              scored=plan['reused'])
+        
+    except Exception as e:
+        logger.error(f"Background refine error: {e}")
         search_sessions[search_id]['error'] = str(e)
+        search_metrics.set_stage(search_sessions[search_id], 'error')
+    finally:
+        search_metrics.ACTIVE_SEARCHES.dec()
 
 @app.route('/api/search-progress/<search_id>')
 def get_progress(search_id):
@@ -1015,12 +1196,191 @@ def get_progress(search_id):
         return jsonify({'stage': 'not_found'})
     
     session = search_sessions[search_id]
-    return jsonify({
+    progress = {
         'stage': session['stage'],
         'current': session.get('current', 0),
         'total': session.get('total', 0),
         'results': session.get('results', [])
-    })
+    }
+    if session.get('refinement'):
+        progress['refinement'] = session['refinement']
+    if session['stage'] == 'queued':
+        position = search_executor.position(search_id)
+        if position:
+            progress['queue_position'] = position
+            progress['estimated_wait_seconds'] = search_executor.estimated_wait(position)
+    return jsonify(progress)
+
+@app.route('/metrics')
+def metrics():
+    body, content_type, status = search_metrics.render()
+    return Response(body, status=status, content_type=content_type)
+
+@app.route('/api/search-trace/<search_id>')
+def search_trace(search_id):
+    trace = search_tracing.render_trace(search_id)
+    if trace is None:
+        return jsonify({'error': 'No trace for this search'}), 404
+    if request.args.get('format') == 'text':
+        return Response(search_tracing.render_text(trace), content_type='text/plain')
+    return jsonify(trace)
+
+@app.route('/api/claims-search', methods=['POST'])
+def claims_full_text_search():
+    """Synchronous claim-language search: phrases, NEAR/N and <N> distances (see claims_search.py)."""
+    data = request.get_json(silent=True) or {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'query required'}), 400
+    try:
+        filters = parse_search_filters(data)
+        page = int(data.get('page', 1))
+        limit = int(data.get('limit', 20))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        query_start = time.time()
+        result = claims_search.search_claims(conn, query, bool(data.get('independent_only')),
+                                             filters, page, limit)
+        elapsed = time.time() - query_start
+        search_metrics.observe_db_query('claims_search', elapsed, len(result['results']))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except psycopg2.errors.UndefinedTable:
+        return jsonify({'success': False, 'error': 'patent_claims table not available'}), 503
+    except Exception as e:
+        logger.error(f"Claims search error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        conn.close()
+    
+    return jsonify(dict(result, success=True, elapsed_ms=round(elapsed * 1000, 1)))
+
+def query_language_request(run, metric=None):
+    """Shared handling of /api/query-search and /api/query-preview."""
+    data = request.get_json(silent=True) or {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'query required'}), 400
+    try:
+        filters = parse_search_filters(data)
+        page = int(data.get('page', 1))
+        limit = int(data.get('limit', 20))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        query_start = time.time()
+        result = run(conn, query, filters, page, limit)
+        elapsed = time.time() - query_start
+        if metric:
+            search_metrics.observe_db_query(metric, elapsed, len(result['results']))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except psycopg2.Error as e:
+        logger.error(f"Query language error: {e}")
+        return jsonify({'success': False, 'error': str(e).strip()}), 500
+    finally:
+        conn.close()
+    
+    return jsonify(dict(result, success=True, elapsed_ms=round(elapsed * 1000, 1)))
+
+@app.route('/api/query-search', methods=['POST'])
+def query_language_search():
+    """Fielded boolean query, e.g. ti:(drone AND battery) NOT as:acme yr:2015..2020 (see query_language.py)."""
+    return query_language_request(query_language.search_query, metric='query_language')
+
+@app.route('/api/query-preview', methods=['POST'])
+def query_language_preview():
+    """Compiled SQL, predicate order and EXPLAIN cost of a query, without running it."""
+    return query_language_request(
+        lambda conn, query, filters, page, limit: query_language.preview_query(conn, query, filters, limit))
+
+batch_jobs = {}
+
+# A file name inside BATCH_SEARCH_DIR: no separators, no leading dot ('.', '..', hidden)
+BATCH_ID_RE = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+
+def batch_dir(batch_id):
+    return os.path.join(batch_search.BATCH_SEARCH_DIR, batch_id)
+
+@app.route('/api/batch-search', methods=['POST'])
+def start_batch_search():
+    """Start (or resume, with an existing batch_id) an offline batch of descriptions."""
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            # Raw JSONL upload
+            data = {'descriptions': request.get_data(as_text=True).splitlines()}
+        batch_id = data.get('batch_id') or str(uuid.uuid4())
+        if not BATCH_ID_RE.match(batch_id):
+            return jsonify({'success': False, 'error': 'Invalid batch_id'}), 400
+        
+        job = batch_jobs.get(batch_id)
+        if job and job.progress['stage'] not in ('complete', 'error'):
+            return jsonify({'success': False, 'error': 'Batch is already running'}), 409
+        
+        directory = batch_dir(batch_id)
+        input_path = os.path.join(directory, 'input.jsonl')
+        lines = data.get('descriptions')
+        if lines:
+            lines = [line if isinstance(line, str) else json.dumps(line) for line in lines]
+        elif os.path.exists(input_path):
+            with open(input_path) as f:
+                lines = f.read().splitlines()
+        else:
+            return jsonify({'success': False, 'error': 'descriptions required'}), 400
+        
+        try:
+            descriptions = batch_search.parse_descriptions(lines)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            top_k = int(data.get('top_k', batch_search.BATCH_TOP_K))
+        except (TypeError, ValueError):
+            top_k = 0
+        if top_k < 1:
+            return jsonify({'success': False, 'error': 'top_k must be a positive integer'}), 400
+        
+        os.makedirs(directory, exist_ok=True)
+        with open(input_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        
+        job = batch_search.BatchSearchJob(search_engine, descriptions, os.path.join(directory, 'results.jsonl'),
+                                          OLLAMA_URL, MODEL_NAME, batch_id=batch_id,
+                                          top_k=top_k)
+        batch_jobs[batch_id] = job
+        threading.Thread(target=job.run, name=f"batch-{batch_id}", daemon=True).start()
+        
+        return jsonify({'success': True, 'batch_id': batch_id, 'descriptions': len(descriptions)})
+        
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/batch-search/<batch_id>')
+def batch_search_progress(batch_id):
+    job = batch_jobs.get(batch_id)
+    if job:
+        return jsonify(dict(job.progress, batch_id=batch_id))
+    
+    results_path = os.path.join(batch_dir(batch_id), 'results.jsonl')
+    if not BATCH_ID_RE.match(batch_id) or not os.path.exists(results_path):
+        return jsonify({'stage': 'not_found'}), 404
+    # Started by an earlier process: POST the batch_id again to resume
+    return jsonify({'batch_id': batch_id, 'stage': 'stopped',
+                    'completed': len(batch_search.read_jsonl(results_path))})
+
+@app.route('/api/batch-search/<batch_id>/results')
+def batch_search_results(batch_id):
+    results_path = os.path.join(batch_dir(batch_id), 'results.jsonl')
+    if not BATCH_ID_RE.match(batch_id) or not os.path.exists(results_path):
+        return jsonify({'error': 'No results for this batch'}), 404
+    with open(results_path) as f:
+        return Response(f.read(), content_type='application/x-ndjson')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8095))
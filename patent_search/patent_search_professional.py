@@ -15,6 +15,8 @@ from typing import List, Dict
 import hashlib
 import time
 
+import family_store
+
 app = Flask(__name__)
 CORS(app)
 
@@ -640,16 +642,58 @@ async function showPatentDetail(pubNumber) {
                 <p>${patent.description_text.substring(0, 2000)}${patent.description_text.length > 2000 ? '...' : ''}</p>
             </div>
             ` : ''}
+            
+            <div class="patent-detail-section" id="patentFamily"></div>
+            
+            <div class="patent-detail-section" id="similarPatents"></div>
         `;
         
         document.getElementById('patentDetail').innerHTML = detailHTML;
         document.getElementById('patentModal').classList.add('active');
+        loadPatentFamily(patent.pub_number);
+        loadSimilarPatents(patent.pub_number);
         
     } catch (error) {
         alert('Failed to load patent details: ' + error.message);
     }
 }
 
+async function loadPatentFamily(pubNumber) {
+    try {
+        const response = await fetch(`/api/patent/${pubNumber}/family`);
+        const data = await response.json();
+        if (!data.members || data.members.length < 2) return;
+        
+        const items = data.members.filter(m => m.pub_number !== pubNumber).map(m => `
+            <li style="cursor: pointer; margin-bottom: 6px;" onclick="showPatentDetail('${m.pub_number}')">
+                <strong>${m.pub_number}</strong> ${m.title || 'Untitled'} (${m.pub_date || m.year || 'N/A'})
+            </li>
+        `).join('');
+        document.getElementById('patentFamily').innerHTML =
+            `<h3>Patent Family (${data.members.length} publications)</h3><ul>${items}</ul>`;
+    } catch (error) {
+        // The family is optional; the detail view stays as it is
+    }
+}
+
+async function loadSimilarPatents(pubNumber) {
+    try {
+        const response = await fetch(`/api/patent/${pubNumber}/similar`);
+        const data = await response.json();
+        if (!data.similar || data.similar.length === 0) return;
+        
+        const items = data.similar.map(s => `
+            <li style="cursor: pointer; margin-bottom: 6px;" onclick="showPatentDetail('${s.pub_number}')">
+                <strong>${s.pub_number}</strong> ${s.title || 'Untitled'} (${s.year || 'N/A'})
+                - ${Math.round(s.similarity * 100)}% similar
+            </li>
+        `).join('');
+        document.getElementById('similarPatents').innerHTML = `<h3>Similar Patents</h3><ul>${items}</ul>`;
+    } catch (error) {
+        // Similar patents are optional; the detail view stays as it is
+    }
+}
+
 function closeModal() {
     document.getElementById('patentModal').classList.remove('active');
 }
@@ -802,6 +846,60 @@ def get_patent_detail(pub_number):
         logger.error(f"Error fetching patent {pub_number}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/patent/<pub_number>/similar')
+def get_similar_patents(pub_number):
+    """Precomputed neighbour list of a patent (see similar_patents.py)"""
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+        # One primary key lookup; LEFT JOIN LATERAL keeps a row for an empty list
+        cur.execute("""
+            SELECT s.pub_number, s.similarity, u.title, u.year, u.pub_date
+            FROM patent_similar_neighbors n
+            LEFT JOIN LATERAL unnest(n.neighbors, n.similarities)
+                WITH ORDINALITY AS s(pub_number, similarity, rank) ON true
+            LEFT JOIN patent_data_unified u ON u.pub_number = s.pub_number
+            WHERE n.pub_number = %s
+            ORDER BY s.rank
+        """, (pub_number,))
+        
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        
+        similar = [dict(row, similarity=round(row['similarity'], 3)) for row in rows if row['pub_number']]
+        return jsonify({'pub_number': pub_number, 'computed': bool(rows), 'similar': similar})
+        
+    except psycopg2.errors.UndefinedTable:
+        return jsonify({'error': 'Similar patents have not been computed (run similar_patents.py build)'}), 503
+    except Exception as e:
+        logger.error(f"Error fetching similar patents for {pub_number}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/patent/<pub_number>/family')
+def get_patent_family(pub_number):
+    """Publications of the patent's family (see ../family_index.py)"""
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            members = family_store.family_members(conn, pub_number)
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'pub_number': pub_number,
+            # family_id is the lowest pub_number of the family
+            'family_id': min(m['pub_number'] for m in members) if members else None,
+            'members': members
+        })
+        
+    except psycopg2.errors.UndefinedTable:
+        return jsonify({'error': 'Patent families have not been built (run family_index.py build)'}), 503
+    except Exception as e:
+        logger.error(f"Error fetching family of {pub_number}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8092))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -11,11 +11,20 @@ from psycopg2.extras import RealDictCursor, Json
 import json
 import re
 import os
-import requests
 import logging
 from datetime import datetime
 from typing import List, Dict, Tuple
 import hashlib
+import uuid
+
+from search_filters import parse_search_filters, build_filter_sql
+import llm_scheduler
+import ollama_client
+
+try:
+    from citation_graph import get_citation_graph
+except ImportError:  # numpy not installed
+    get_citation_graph = None
 
 app = Flask(__name__)
 CORS(app)
@@ -72,7 +81,7 @@ Description: {description[:1000]}
 JSON:"""
         
         try:
-            response = requests.post(OLLAMA_URL, json={
+            response = ollama_client.generate(OLLAMA_URL, {
                 'model': MODEL_NAME,
                 'prompt': prompt,
                 'stream': False,
@@ -111,7 +120,8 @@ JSON:"""
         sorted_keywords = sorted(keyword_count.items(), key=lambda x: x[1], reverse=True)
         return [word for word, count in sorted_keywords[:20]]
     
-    def search_patents_advanced(self, invention_elements: Dict, description: str, limit: int = 50) -> List[Dict]:
+    def search_patents_advanced(self, invention_elements: Dict, description: str, limit: int = 50,
+                                filters: Dict = None) -> List[Dict]:
         """Advanced patent search using multiple strategies"""
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -119,6 +129,10 @@ JSON:"""
         all_results = []
         seen_pub_numbers = set()
         
+        # CPC classification filter: restricts every strategy to a technology area
+        # before any text matching (GIN index on cpc_prefix_expand(cpc_codes))
+        filter_sql, filter_params = build_filter_sql(filters or {})
+        
         try:
             # 1. Search by technical field and components
             all_keywords = []
@@ -145,6 +159,11 @@ JSON:"""
                     kw_pattern = f'%{keyword.lower()}%'
                     params.extend([kw_pattern, kw_pattern, kw_pattern])
                 
+                where_sql = ' OR '.join(conditions)
+                if filter_sql:
+                    where_sql = f"({where_sql}) AND {filter_sql}"
+                    params.extend(filter_params)
+                
                 query = f"""
                 SELECT 
                     u.pub_number,
@@ -158,7 +177,7 @@ JSON:"""
                     u.applicants,
                     COUNT(*) OVER() as total_matches
                 FROM patent_data_unified u
-                WHERE {' OR '.join(conditions)}
+                WHERE {where_sql}
                 ORDER BY u.pub_date DESC
                 LIMIT %s
                 """
@@ -172,17 +191,48 @@ JSON:"""
                         seen_pub_numbers.add(patent['pub_number'])
                         all_results.append(patent)
             
-            # 2. CPC Classification search (if we had CPC data)
-            # This would search based on classification codes
-            
-            # 3. Citation analysis - find patents that cite relevant patents
+            # 2. Citation analysis - find patents that cite relevant patents
             if all_results and len(all_results) < limit:
                 # Get top patent numbers
                 top_patents = [p['pub_number'] for p in all_results[:5]]
                 
-                # In a full implementation, we would search citation tables
-                # For now, we'll do a similarity search based on assignees
+                # Follow cites / cited-by edges (one and two hops) from the top candidates
+                graph = get_citation_graph() if get_citation_graph else None
+                if graph is not None:
+                    expanded = graph.expand(top_patents, hops=2, limit=(limit - len(all_results)) * 2)
+                    expanded_numbers = [e['pub_number'] for e in expanded
+                                        if e['pub_number'] not in seen_pub_numbers]
+                    citation_info = {e['pub_number']: e for e in expanded}
+                    
+                    if expanded_numbers:
+                        citation_query = f"""
+                        SELECT
+                            u.pub_number,
+                            u.title,
+                            u.abstract_text,
+                            u.description_text,
+                            u.pub_date,
+                            u.year,
+                            u.inventors,
+                            u.assignees,
+                            u.applicants
+                        FROM patent_data_unified u
+                        WHERE u.pub_number = ANY(%s)
+                        {'AND ' + filter_sql if filter_sql else ''}
+                        """
+                        cur.execute(citation_query, (expanded_numbers, *filter_params))
+                        
+                        # Keep the graph ordering (closest hop, most links first)
+                        rank = {num: i for i, num in enumerate(expanded_numbers)}
+                        citation_results = sorted(cur.fetchall(), key=lambda p: rank[p['pub_number']])
+                        for patent in citation_results[:limit - len(all_results)]:
+                            seen_pub_numbers.add(patent['pub_number'])
+                            patent['citation_hop'] = citation_info[patent['pub_number']]['hop']
+                            all_results.append(patent)
+                    
+                    return all_results
                 
+                # No citation graph built yet - fall back to a similarity search based on assignees
                 assignees = []
                 for patent in all_results[:5]:
                     if patent.get('assignees'):
@@ -197,7 +247,7 @@ JSON:"""
                 
                 if assignees:
                     # Search for patents by same assignees
-                    assignee_query = """
+                    assignee_query = f"""
                     SELECT DISTINCT
                         u.pub_number,
                         u.title,
@@ -211,6 +261,7 @@ JSON:"""
                     FROM patent_data_unified u
                     WHERE u.assignees::text ILIKE ANY(%s)
                     AND u.pub_number NOT IN %s
+                    {'AND ' + filter_sql if filter_sql else ''}
                     ORDER BY u.pub_date DESC
                     LIMIT %s
                     """
@@ -219,6 +270,7 @@ JSON:"""
                     cur.execute(assignee_query, (
                         assignee_patterns,
                         tuple(seen_pub_numbers) if seen_pub_numbers else ('',),
+                        *filter_params,
                         limit - len(all_results)
                     ))
                     
@@ -265,7 +317,7 @@ Patent: {patent_text}
 Provide structured analysis:"""
         
         try:
-            response = requests.post(OLLAMA_URL, json={
+            response = ollama_client.generate(OLLAMA_URL, {
                 'model': MODEL_NAME,
                 'prompt': prompt,
                 'stream': False,
@@ -335,6 +387,7 @@ Provide structured analysis:"""
                 'search_strategies': [
                     'Keyword-based search across title, abstract, and description',
                     'Technical field classification search',
+                    'Citation graph expansion (cites / cited-by)',
                     'Assignee and inventor analysis',
                     'AI-powered relevance ranking'
                 ],
@@ -431,25 +484,33 @@ def professional_search():
         if not invention_description:
             return jsonify({'error': 'Invention description is required'}), 400
         
-        # Extract invention elements
-        invention_elements = search_engine.extract_invention_elements(invention_description)
-        
-        # Conduct advanced search
-        search_results = search_engine.search_patents_advanced(
-            invention_elements, 
-            invention_description,
-            limit=100
-        )
+        try:
+            filters = parse_search_filters(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Score and rank results
-        for patent in search_results:
-            relevance = search_engine.analyze_relevance_detailed(
-                patent, 
+        # Ollama calls of this request share the LLM scheduler with the other services
+        with llm_scheduler.work(f"progress-{uuid.uuid4()}", 'interactive'):
+            # Extract invention elements
+            invention_elements = search_engine.extract_invention_elements(invention_description)
+            
+            # Conduct advanced search
+            search_results = search_engine.search_patents_advanced(
                 invention_elements, 
-                invention_description
+                invention_description,
+                limit=100,
+                filters=filters
             )
-            patent['relevance_score'] = relevance['overall_score']
-            patent['relevance_analysis'] = relevance
+            
+            # Score and rank results
+            for patent in search_results:
+                relevance = search_engine.analyze_relevance_detailed(
+                    patent, 
+                    invention_elements, 
+                    invention_description
+                )
+                patent['relevance_score'] = relevance['overall_score']
+                patent['relevance_analysis'] = relevance
         
         # Sort by relevance
         search_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
@@ -0,0 +1,215 @@
+"""
+Relevance scoring prompts shared by the claims search service and batch search.
+
+build_claims_prompt() assembles the title / abstract / claims prompt the
+claims service has always sent; parse_score() reads the "Score: NN/100" and
+"Reasoning: ..." lines back out of the model response.
+
+Prompt parts are sized in (estimated) tokens rather than characters. Claims
+are parsed into numbered claims with their dependencies; independent claims
+are packed first, then dependent claims, until PROMPT_PATENT_TOKENS is used
+up. The abstract scoring prompt of patent_search_ai_fixed.py is cut with the
+same truncate_tokens(). scoring_options() then asks Ollama for a context just
+large enough for the prompt and the answer instead of a fixed num_ctx.
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Ollama options for claims scoring; num_ctx is the ceiling scoring_options() sizes under
+CLAIMS_SCORING_OPTIONS = {
+    'temperature': 0.3,
+    'num_predict': 250,
+    'num_ctx': 6000
+}
+
+DEFAULT_SCORE = 50
+
+# Rough chars per token for English patent text (no tokenizer for the served model here)
+PROMPT_CHARS_PER_TOKEN = float(os.environ.get('PROMPT_CHARS_PER_TOKEN', 3.5))
+PROMPT_DESCRIPTION_TOKENS = int(os.environ.get('PROMPT_DESCRIPTION_TOKENS', 600))
+PROMPT_ABSTRACT_TOKENS = int(os.environ.get('PROMPT_ABSTRACT_TOKENS', 500))
+# Abstract + claims; claims get whatever the abstract leaves
+PROMPT_PATENT_TOKENS = int(os.environ.get('PROMPT_PATENT_TOKENS', 2000))
+# Abstract (or description_text without one) in the abstract scoring prompt, which has no claims
+PROMPT_ABSTRACT_SCORING_TOKENS = int(os.environ.get('PROMPT_ABSTRACT_SCORING_TOKENS', 850))
+
+# Ollama reloads the model when num_ctx changes, so sizes are rounded up to a few steps
+NUM_CTX_STEP = 1024
+NUM_CTX_MIN = 2048
+
+# Claims kept on a candidate; packing into the prompt happens in build_claims_prompt
+CLAIMS_KEEP_CHARS = 20000
+
+RE_CLAIM_START = re.compile(r'(?:^|(?<=\n)|(?<=[.;] ))\s*(\d{1,3})\s*\.\s+(?=\S)')
+RE_CLAIM_REF = re.compile(r'\bclaims?\s+(\d{1,3})(?:\s*(-|\u2013|to|through|or|and|,)\s*(\d{1,3}))?',
+                          re.IGNORECASE)
+CLAIM_RANGE_SEPARATORS = {'-', '\u2013', 'to', 'through'}
+
+
+def patent_claims_text(patent: Dict) -> Optional[str]:
+    """Claims resolved for the patent, or the CLAIMS: block stored in description_text."""
+    if patent.get('claims_text'):
+        return patent['claims_text']
+    description = patent.get('description_text')
+    if description and description.startswith('CLAIMS:'):
+        claims_end = description.find('\n\nDESCRIPTION:')
+        if claims_end > 0:
+            return description[7:claims_end]
+        return description[7:3000]
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or '') / PROMPT_CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, tokens: int) -> str:
+    """Cut text to about `tokens` tokens, at a word boundary."""
+    text = text or ''
+    limit = int(tokens * PROMPT_CHARS_PER_TOKEN)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(' ', 0, limit)
+    return text[:cut if cut > limit // 2 else limit] + '...'
+
+
+def parse_claims(text: str) -> List[Dict]:
+    """
+    Split claims text into [{'num', 'text', 'depends_on'}].
+
+    Works on the "1. A method ..." numbering of every claims source (XML
+    extraction, claims_text, CLAIMS: blocks); a number only starts a claim
+    when it is the next one in sequence. Returns [] when no numbering is found.
+    """
+    text = text or ''
+    starts = []
+    for match in RE_CLAIM_START.finditer(text):
+        if int(match.group(1)) == len(starts) + 1:
+            starts.append(match)
+    if not starts:
+        return []
+
+    claims = []
+    for i, match in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(text)
+        num = i + 1
+        body = re.sub(r'\s+', ' ', text[match.start():end]).strip()
+        depends_on = []
+        for ref in RE_CLAIM_REF.finditer(body):
+            first, separator, last = ref.groups()
+            refs = [int(first)]
+            if last:
+                if separator.lower() in CLAIM_RANGE_SEPARATORS and int(first) < int(last):
+                    # "claims 1 to 3" / "claims 1-3" depend on claim 2 as well
+                    refs = list(range(int(first), int(last) + 1))
+                else:
+                    refs.append(int(last))
+            for ref_num in refs:
+                if 0 < ref_num < num and ref_num not in depends_on:
+                    depends_on.append(ref_num)
+        claims.append({'num': num, 'text': body, 'depends_on': depends_on})
+    return claims
+
+
+def pack_claims(claims_text: str, budget_tokens: int) -> str:
+    """Claims text packed into the token budget, see pack_claim_list()."""
+    claims = parse_claims(claims_text)
+    if not claims:
+        return truncate_tokens(claims_text, budget_tokens)
+    return pack_claim_list(claims, budget_tokens)
+
+
+def pack_claim_list(claims: List[Dict], budget_tokens: int) -> str:
+    """
+    Claims that fit the token budget: independent claims first, then dependent
+    claims in order, listed in claim number order. A dependent claim is only
+    packed when every claim it depends on is. An independent claim that does
+    not fit whole is truncated only when nothing else has been packed.
+    """
+    chosen, used = set(), 0
+    for claim in sorted(claims, key=lambda c: (bool(c['depends_on']), c['num'])):
+        if not chosen.issuperset(claim['depends_on']):
+            continue
+        cost = estimate_tokens(claim['text']) + 1
+        if used + cost <= budget_tokens:
+            chosen.add(claim['num'])
+            used += cost
+        elif not chosen:
+            return truncate_tokens(claim['text'], budget_tokens)
+    return '\n'.join(c['text'] for c in claims if c['num'] in chosen)
+
+
+def build_claims_prompt(description: str, patent: Dict) -> str:
+    """Prompt comparing an invention description with a patent's title, abstract and claims."""
+    patent_content = f"Title: {patent.get('title', 'N/A')}\n\n"
+
+    budget = PROMPT_PATENT_TOKENS
+    patent_abstract = patent.get('abstract_text', '')
+    if patent_abstract:
+        patent_abstract = truncate_tokens(patent_abstract, PROMPT_ABSTRACT_TOKENS)
+        budget -= estimate_tokens(patent_abstract)
+        patent_content += f"Abstract: {patent_abstract}\n\n"
+
+    # Claims define the legal scope - most important for relevance
+    if patent.get('claims'):
+        # Already split, from the patent_claims table (claims_store.py)
+        patent_content += f"Claims: {pack_claim_list(patent['claims'], budget)}\n\n"
+    else:
+        claims = patent_claims_text(patent)
+        if claims:
+            patent_content += f"Claims: {pack_claims(claims, budget)}\n\n"
+
+    return f"""You are an expert in patents and intellectual property. Your task is to compare a user's invention description against a patent's claims, abstract, and title.
+
+IMPORTANT: Patent claims define the legal scope of the invention. Pay special attention to claim language when scoring relevance.
+
+Provide:
+1. Relevance Score: A number from 1 to 100, where:
+   - 90-100 = Claims directly overlap with user's invention
+   - 70-89 = Strong overlap in claims or technical approach
+   - 40-69 = Some shared technical concepts but different claims
+   - 1-39 = Different technical field or no claim overlap
+
+2. Reasoning: A short explanation (2-5 sentences) focusing on:
+   - How the patent claims relate to the user's invention
+   - Key technical similarities or differences
+   - Whether the patent would block or relate to the user's invention
+
+User's invention description: {truncate_tokens(description, PROMPT_DESCRIPTION_TOKENS)}
+
+Patent information:
+{patent_content}
+
+Output format:
+Score: [number]/100
+Reasoning: [explanation focusing on claim overlap]"""
+
+
+def scoring_options(prompt: str, options: Dict = CLAIMS_SCORING_OPTIONS) -> Dict:
+    """Copy of options with num_ctx sized for the prompt plus num_predict, capped at options' num_ctx."""
+    needed = estimate_tokens(prompt) + options.get('num_predict', 256)
+    num_ctx = max(NUM_CTX_MIN, math.ceil(needed / NUM_CTX_STEP) * NUM_CTX_STEP)
+    return {**options, 'num_ctx': min(num_ctx, options.get('num_ctx', num_ctx))}
+
+
+def parse_score(score_text: str) -> Tuple[int, Optional[str]]:
+    """(score 1-100, reasoning) from a model response; DEFAULT_SCORE if no number is found."""
+    score_text = (score_text or '').strip()
+    if not score_text:
+        return DEFAULT_SCORE, None
+
+    score_match = re.search(r'Score:\s*(\d+)', score_text, re.IGNORECASE)
+    if score_match:
+        score = min(100, max(1, int(score_match.group(1))))
+    else:
+        numbers = re.findall(r'\d+', score_text)
+        score = min(100, max(1, int(numbers[0]))) if numbers else DEFAULT_SCORE
+
+    reasoning = None
+    reasoning_match = re.search(r'Reasoning:\s*(.+)', score_text, re.IGNORECASE | re.DOTALL)
+    if reasoning_match:
+        reasoning = reasoning_match.group(1).strip()[:500]
+    return score, reasoning
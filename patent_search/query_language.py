@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Query Language - fielded boolean queries compiled to indexed SQL
+
+    ti:(drone AND battery) AND cl:"wireless charging" NOT as:acme yr:2015..2020
+
+Fields (run ../query_language.sql first for the indexes):
+    ti:   title            english full text
+    ab:   abstract         english full text
+    cl:   claims           patent_claims.tsv (see ../patent_claims.sql)
+    as:   assignee names   simple full text (no stemming)
+    in:   inventor names   simple full text
+    yr:   year             yr:2016, yr:2015..2020, yr:2015.., yr:..2020
+    cpc:  CPC prefixes     cpc:H04W4, cpc:H04W,H04B
+Unfielded terms search title or abstract.
+
+A field takes a word, a "quoted phrase" or a parenthesized group in the
+claims search syntax (AND, OR, NOT, NEAR/N, <->, prefix*; see
+claims_search.py). Predicates combine with AND (implicit), OR, NOT / -
+and parentheses.
+
+Every predicate compiles to a parameterized condition whose expression
+matches an index. The planner estimates each predicate's row count with
+EXPLAIN (cheap: planning only), puts the most selective predicate of an
+AND first and the most likely alternative of an OR first, and
+preview_query() returns the EXPLAIN of the whole query: estimated rows and
+cost, indexes used and any sequential scans.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from claims_search import to_tsquery_text
+from search_filters import build_filter_sql, parse_cpc_prefixes, parse_year
+
+MAX_PAGE_SIZE = 100
+
+# Index expressions, identical to ../query_language.sql
+TEXT_FIELDS = {
+    'ti': ("to_tsvector('english', coalesce(u.title, ''))", 'english'),
+    'ab': ("to_tsvector('english', coalesce(u.abstract_text, ''))", 'english'),
+    'as': ("to_tsvector('simple', coalesce(jsonb_path_query_array(u.assignees, '$[*].name')::text, ''))", 'simple'),
+    'in': ("to_tsvector('simple', coalesce(jsonb_path_query_array(u.inventors, '$[*].name')::text, ''))", 'simple'),
+}
+FIELDS = set(TEXT_FIELDS) | {'cl', 'yr', 'cpc'}
+
+FIELD_RE = re.compile(r'([A-Za-z]+):')
+BARE_RE = re.compile(r'[^\s()"]+')
+YEAR_RANGE_RE = re.compile(r'^(\d{4})?(?:\.\.(\d{4})?)?$')
+
+
+class Predicate:
+    """One fielded condition, e.g. ti:(drone AND battery)."""
+
+    def __init__(self, label: str, sql: str, params: List):
+        self.label = label
+        self.sql = sql
+        self.params = params
+        self.estimate = None
+
+
+class BoolOp:
+    """AND / OR of child nodes."""
+
+    def __init__(self, op: str, children: List):
+        self.op = op
+        self.children = children
+        self.estimate = None
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+        self.estimate = None
+
+
+def compile_predicate(field: str, value: str) -> Predicate:
+    label = f"{field}:{value}" if field != 'tx' else value
+    if field == 'yr':
+        m = YEAR_RANGE_RE.match(value)
+        if not m or not (m.group(1) or m.group(2)):
+            raise ValueError(f"Invalid year range: {value}")
+        low = parse_year(m.group(1), 'yr')
+        high = low if '..' not in value else parse_year(m.group(2), 'yr')
+        if low is not None and high is not None:
+            if low > high:
+                raise ValueError(f"Invalid year range: {value}")
+            return Predicate(label, "u.year BETWEEN %s AND %s", [low, high])
+        if low is not None:
+            return Predicate(label, "u.year >= %s", [low])
+        return Predicate(label, "u.year <= %s", [high])
+    if field == 'cpc':
+        prefixes = parse_cpc_prefixes([p for p in re.split(r'[\s,;]+', value.strip('()"')) if p != 'OR'])
+        if not prefixes:
+            raise ValueError(f"Invalid CPC prefix: {value}")
+        return Predicate(label, "cpc_prefix_expand(u.cpc_codes) && %s::text[]", [prefixes])
+
+    tsquery = to_tsquery_text(value)
+    if field == 'cl':
+        return Predicate(label, "u.pub_number IN (SELECT c.pub_number FROM patent_claims c "
+                                "WHERE c.tsv @@ to_tsquery('english', %s))", [tsquery])
+    if field == 'tx':
+        title, abstract = TEXT_FIELDS['ti'][0], TEXT_FIELDS['ab'][0]
+        return Predicate(label, f"({title} @@ to_tsquery('english', %s) "
+                                f"OR {abstract} @@ to_tsquery('english', %s))", [tsquery, tsquery])
+    expression, config = TEXT_FIELDS[field]
+    return Predicate(label, f"{expression} @@ to_tsquery('{config}', %s)", [tsquery])
+
+
+def tokenize(text: str) -> List[Tuple[str, Optional[Tuple[str, str]]]]:
+    """('(' | ')' | 'AND' | 'OR' | 'NOT', None) or ('TERM', (field, value)) tokens."""
+    tokens = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch.isspace():
+            i += 1
+        elif ch in '()':
+            tokens.append((ch, None))
+            i += 1
+        elif ch == '-' and i + 1 < len(text) and not text[i + 1].isspace():
+            tokens.append(('NOT', None))
+            i += 1
+        elif ch == '"':
+            value, i = read_value(text, i)
+            tokens.append(('TERM', ('tx', value)))
+        else:
+            m = FIELD_RE.match(text, i)
+            if m:
+                if m.group(1).lower() not in FIELDS:
+                    # A mistyped field must not silently become a text term
+                    raise ValueError(f"Unknown field {m.group(1)}")
+                value, i = read_value(text, m.end())
+                tokens.append(('TERM', (m.group(1).lower(), value)))
+                continue
+            word = BARE_RE.match(text, i).group()
+            i += len(word)
+            if word in ('AND', 'OR', 'NOT'):
+                tokens.append((word, None))
+            else:
+                tokens.append(('TERM', ('tx', word)))
+    return tokens
+
+
+def read_value(text: str, i: int) -> Tuple[str, int]:
+    """A field value at text[i]: "phrase", (group) with nested parentheses, or a bare word."""
+    if i >= len(text) or text[i].isspace():
+        raise ValueError("Missing value after field")
+    if text[i] == '"':
+        end = text.find('"', i + 1)
+        if end < 0:
+            raise ValueError("Unterminated phrase in query")
+        return text[i:end + 1], end + 1
+    if text[i] == '(':
+        depth = 0
+        for j in range(i, len(text)):
+            depth += {'(': 1, ')': -1}.get(text[j], 0)
+            if depth == 0:
+                return text[i:j + 1], j + 1
+        raise ValueError("Unbalanced parentheses in query")
+    m = BARE_RE.match(text, i)
+    if not m:
+        raise ValueError("Missing value after field")
+    return m.group(), m.end()
+
+
+class _Parser:
+    """OR, AND (implicit), NOT / - over predicates, lowest precedence first."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty query")
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()}' in query")
+        return node
+
+    def or_expr(self):
+        children = [self.and_expr()]
+        while self.peek() == 'OR':
+            self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else BoolOp('OR', children)
+
+    def and_expr(self):
+        children = [self.not_expr()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            children.append(self.not_expr())
+        return children[0] if len(children) == 1 else BoolOp('AND', children)
+
+    def not_expr(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return Not(self.not_expr())
+        return self.atom()
+
+    def atom(self):
+        if self.peek() is None:
+            raise ValueError("Query ends with an operator")
+        kind, value = self.take()
+        if kind == '(':
+            node = self.or_expr()
+            if self.peek() != ')':
+                raise ValueError("Unbalanced parentheses in query")
+            self.take()
+            return node
+        if kind != 'TERM':
+            raise ValueError(f"Unexpected '{kind}' in query")
+        return compile_predicate(*value)
+
+
+def has_positive(node) -> bool:
+    """False when the query only excludes rows: that would read the whole table."""
+    if isinstance(node, Predicate):
+        return True
+    if isinstance(node, Not):
+        return False
+    if node.op == 'AND':
+        return any(has_positive(c) for c in node.children)
+    return all(has_positive(c) for c in node.children)
+
+
+def parse_query(text: str):
+    """Parse a query into a tree of Predicate / BoolOp / Not; ValueError if malformed."""
+    node = _Parser(tokenize(text.strip())).parse()
+    if not has_positive(node):
+        raise ValueError("Query needs at least one predicate that is not negated")
+    return node
+
+
+def to_sql(node) -> Tuple[str, List]:
+    if isinstance(node, Predicate):
+        return node.sql, list(node.params)
+    if isinstance(node, Not):
+        sql, params = to_sql(node.child)
+        return f"NOT {sql}", params
+    parts, params = [], []
+    for child in node.children:
+        sql, child_params = to_sql(child)
+        parts.append(sql)
+        params.extend(child_params)
+    return '(' + f' {node.op} '.join(parts) + ')', params
+
+
+def explain(cur, sql: str, params: List) -> Dict:
+    cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    return cur.fetchone()[0][0]['Plan']
+
+
+def plan_query(cur, node, total: float = None) -> float:
+    """
+    Estimate the rows of every node (EXPLAIN per predicate) and reorder AND /
+    OR children: the most selective AND predicate first, the most likely OR
+    alternative first, so filters evaluated row by row short-circuit early.
+    """
+    if total is None:
+        total = max(explain(cur, "SELECT 1 FROM patent_data_unified u", [])['Plan Rows'], 1)
+    if isinstance(node, Predicate):
+        node.estimate = min(explain(cur, f"SELECT 1 FROM patent_data_unified u WHERE {node.sql}",
+                                    node.params)['Plan Rows'], total)
+    elif isinstance(node, Not):
+        node.estimate = total - plan_query(cur, node.child, total)
+    else:
+        estimates = [plan_query(cur, child, total) for child in node.children]
+        # Independence assumption, as Postgres itself makes for combined clauses
+        remaining = 1.0
+        if node.op == 'AND':
+            for estimate in estimates:
+                remaining *= estimate / total
+            node.estimate = total * remaining
+            node.children.sort(key=lambda c: c.estimate)
+        else:
+            for estimate in estimates:
+                remaining *= 1 - estimate / total
+            node.estimate = total * (1 - remaining)
+            node.children.sort(key=lambda c: -c.estimate)
+    return node.estimate
+
+
+def plan_summary(node) -> List[Dict]:
+    """Predicates in evaluation order with their estimated rows."""
+    if isinstance(node, Predicate):
+        return [{'predicate': node.label, 'estimated_rows': int(node.estimate or 0)}]
+    if isinstance(node, Not):
+        return [dict(p, negated=not p.get('negated')) for p in plan_summary(node.child)]
+    return [p for child in node.children for p in plan_summary(child)]
+
+
+def build_search_sql(node, filters: Dict, page: int, limit: int) -> Tuple[str, List]:
+    where_sql, params = to_sql(node)
+    filter_sql, filter_params = build_filter_sql(filters or {})
+    if filter_sql:
+        where_sql = f"{where_sql} AND {filter_sql}"
+        params.extend(filter_params)
+    sql = f"""
+        SELECT u.pub_number, u.title, u.year, u.pub_date, u.assignees
+        FROM patent_data_unified u
+        WHERE {where_sql}
+        ORDER BY u.pub_date DESC NULLS LAST, u.pub_number
+        LIMIT %s OFFSET %s
+    """
+    return sql, params + [limit + 1, (page - 1) * limit]
+
+
+def search_query(conn, text: str, filters: Dict = None, page: int = 1, limit: int = 20) -> Dict:
+    """Run a query; one page of publications, newest first."""
+    node = parse_query(text)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    page = max(1, page)
+    cur = conn.cursor()
+    try:
+        plan_query(cur, node)
+        sql, params = build_search_sql(node, filters, page, limit)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+
+    results = [{
+        'pub_number': pub_number,
+        'title': title,
+        'year': year,
+        'pub_date': pub_date.isoformat() if pub_date else None,
+        'assignees': assignees or [],
+    } for pub_number, title, year, pub_date, assignees in rows[:limit]]
+    return {
+        'query': text,
+        'page': page,
+        'limit': limit,
+        'has_more': len(rows) > limit,
+        'estimated_total': int(node.estimate),
+        'plan': plan_summary(node),
+        'results': results,
+    }
+
+
+def scan_nodes(plan: Dict) -> List[Dict]:
+    """Scan nodes of an EXPLAIN plan tree (index, bitmap and sequential scans)."""
+    scans = []
+    if 'Scan' in plan['Node Type']:
+        scans.append({'node': plan['Node Type'],
+                      'relation': plan.get('Relation Name'),
+                      'index': plan.get('Index Name')})
+    for child in plan.get('Plans', []):
+        scans.extend(scan_nodes(child))
+    return scans
+
+
+def preview_query(conn, text: str, filters: Dict = None, limit: int = 20) -> Dict:
+    """Compiled SQL and the EXPLAIN estimate of a query, without running it."""
+    node = parse_query(text)
+    cur = conn.cursor()
+    try:
+        plan_query(cur, node)
+        sql, params = build_search_sql(node, filters, 1, max(1, min(limit, MAX_PAGE_SIZE)))
+        plan = explain(cur, sql, params)
+    finally:
+        cur.close()
+
+    scans = scan_nodes(plan)
+    return {
+        'query': text,
+        'sql': ' '.join(sql.split()),
+        'params': params,
+        'estimated_total': int(node.estimate),
+        'plan': plan_summary(node),
+        'startup_cost': plan['Startup Cost'],
+        'total_cost': plan['Total Cost'],
+        'indexes': sorted({s['index'] for s in scans if s['index']}),
+        'seq_scans': sorted({s['relation'] for s in scans if s['node'] == 'Seq Scan'}),
+    }
@@ -0,0 +1,108 @@
+"""
+Bounded search executor shared by the patent search services.
+
+A fixed pool of SEARCH_WORKERS threads runs searches from a FIFO queue of at
+most SEARCH_QUEUE_SIZE waiting searches. When the queue is full, submit()
+raises QueueFull and the route answers HTTP 429 with Retry-After. Under
+overload, extra searches wait their turn at a known position instead of
+every running search slowing down together.
+
+Queue position and estimated wait come from a moving average of recent
+search durations.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SEARCH_WORKERS = int(os.environ.get('SEARCH_WORKERS', 4))
+SEARCH_QUEUE_SIZE = int(os.environ.get('SEARCH_QUEUE_SIZE', 20))
+# Assumed search duration until real searches have completed
+SEARCH_ETA_DEFAULT = float(os.environ.get('SEARCH_ETA_DEFAULT', 120))
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Search queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class SearchExecutor:
+    def __init__(self, workers: int = SEARCH_WORKERS, queue_size: int = SEARCH_QUEUE_SIZE,
+                 name: str = 'search'):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.name = name
+        self.pending = deque()  # (search_id, fn, args)
+        self.running = 0
+        self.avg_duration = SEARCH_ETA_DEFAULT
+        self.cond = threading.Condition()
+        self.threads = []
+
+    def _start_workers(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, search_id: str, fn: Callable, *args):
+        """Queue fn(*args); raises QueueFull when the queue is at capacity."""
+        with self.cond:
+            if not self.threads:
+                self._start_workers()
+            # Searches not yet picked up by a worker count against the queue too
+            if len(self.pending) + self.running >= self.workers + self.queue_size:
+                raise QueueFull(self.retry_after())
+            self.pending.append((search_id, fn, args))
+            self.cond.notify()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                search_id, fn, args = self.pending.popleft()
+                self.running += 1
+
+            start = time.time()
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Search {search_id} failed in executor: {e}")
+            finally:
+                elapsed = time.time() - start
+                with self.cond:
+                    self.running -= 1
+                    self.avg_duration = 0.8 * self.avg_duration + 0.2 * elapsed
+
+    def position(self, search_id: str) -> Optional[int]:
+        """1-based position in the queue, None once the search has started."""
+        with self.cond:
+            for i, (queued_id, _, _) in enumerate(self.pending):
+                if queued_id == search_id:
+                    return i + 1
+        return None
+
+    def estimated_wait(self, position: int) -> int:
+        """Seconds until the search at this queue position starts."""
+        # Position p starts after p searches finish; with all workers busy
+        # that takes ceil(p / workers) average search durations.
+        return int(math.ceil(position / self.workers) * self.avg_duration)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        return max(1, int(self.avg_duration / self.workers))
+
+    def queued(self) -> int:
+        with self.cond:
+            return len(self.pending)
+
+    def active(self) -> int:
+        with self.cond:
+            return self.running
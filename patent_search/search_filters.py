@@ -0,0 +1,173 @@
+"""
+Search filters shared by the patent search services.
+
+Filters are applied in SQL before any text matching so Postgres can narrow
+the candidate set with indexes first.
+
+Year and publication date bounds are also written as constant bounds on
+u.year, the partition key of patent_data_unified (see partition_unified.py),
+so Postgres only scans the partitions of the requested years:
+
+    {"date_to": "2019-03-14"}            prior art published on or before
+    {"year_from": 2010, "year_to": 2015}
+    {"year": 2016, "kind": ["A1"]}
+"""
+
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# CPC symbols are matched on hierarchy levels: section (H), class (H04),
+# subclass (H04W), main group (H04W4) or full symbol (H04W4/80).
+# See cpc_prefix_expand() in classification_backfill.sql.
+CPC_PREFIX_RE = re.compile(r'^[A-HY](\d{2}([A-Z](\d{1,4}(/\d{1,6})?)?)?)?$')
+
+# Publication kind codes (A1 publication, A2 republication, A9 corrected, ...)
+KIND_RE = re.compile(r'^[A-Z]\d?$')
+
+MIN_YEAR, MAX_YEAR = 1976, 2100
+
+
+def normalize_cpc_prefix(prefix: str) -> str:
+    """Normalize a user supplied CPC prefix ('h04w 4/80' -> 'H04W4/80')."""
+    return re.sub(r'\s+', '', prefix or '').upper()
+
+
+def parse_cpc_prefixes(value) -> List[str]:
+    """Accept a list or a comma/space separated string of CPC prefixes."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        # A space only separates prefixes before a section letter, so 'H04W 4/80' stays one
+        value = re.split(r'[,;]|\s+(?=[A-HYa-hy])', value)
+
+    prefixes = []
+    for item in value:
+        prefix = normalize_cpc_prefix(str(item))
+        if not prefix:
+            continue
+        if not CPC_PREFIX_RE.match(prefix):
+            raise ValueError(f"Invalid CPC prefix: {item}")
+        if prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
+
+def parse_year(value, field: str) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field}: {value}")
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"Invalid {field}: {value}")
+    return year
+
+
+def parse_date(value, field: str) -> Optional[str]:
+    """Validate a YYYY-MM-DD date; kept as a string so filters stay JSON serializable."""
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid {field} (expected YYYY-MM-DD): {value}")
+
+
+def parse_kinds(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r'[,;\s]+', value)
+    kinds = []
+    for item in value:
+        kind = str(item).strip().upper()
+        if not kind:
+            continue
+        if not KIND_RE.match(kind):
+            raise ValueError(f"Invalid kind code: {item}")
+        if kind not in kinds:
+            kinds.append(kind)
+    return kinds
+
+
+def parse_search_filters(data: Dict) -> Dict:
+    """Read the optional filter fields of a search request body."""
+    filters = {
+        'cpc': parse_cpc_prefixes(data.get('cpc') or data.get('cpc_prefixes')),
+    }
+
+    year = parse_year(data.get('year'), 'year')
+    year_from = parse_year(data.get('year_from'), 'year_from')
+    year_to = parse_year(data.get('year_to'), 'year_to')
+    if year is not None:
+        year_from = max(year_from or year, year)
+        year_to = min(year_to or year, year)
+    date_from = parse_date(data.get('date_from'), 'date_from')
+    date_to = parse_date(data.get('date_to'), 'date_to')
+    if year_from is not None and year_to is not None and year_from > year_to:
+        raise ValueError("year_from is after year_to")
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("date_from is after date_to")
+
+    # Only set keys are added, so searches without them compare equal to older sessions
+    for key, value in (('year_from', year_from), ('year_to', year_to),
+                       ('date_from', date_from), ('date_to', date_to),
+                       ('kind', parse_kinds(data.get('kind')))):
+        if value:
+            filters[key] = value
+    return filters
+
+
+def year_bounds(filters: Dict) -> Tuple[Optional[int], Optional[int]]:
+    """Tightest year range implied by the year and publication date filters."""
+    low, high = filters.get('year_from'), filters.get('year_to')
+    if filters.get('date_from'):
+        year = int(filters['date_from'][:4])
+        low = max(low, year) if low is not None else year
+    if filters.get('date_to'):
+        year = int(filters['date_to'][:4])
+        high = min(high, year) if high is not None else year
+    return low, high
+
+
+def build_filter_sql(filters: Dict, alias: str = 'u') -> Tuple[str, List]:
+    """
+    Build an SQL fragment (to be AND-ed into a WHERE clause) for the filters.
+
+    Returns ('', []) when no filter is set.
+    """
+    clauses = []
+    params = []
+
+    if filters.get('cpc'):
+        clauses.append(f"cpc_prefix_expand({alias}.cpc_codes) && %s::text[]")
+        params.append(list(filters['cpc']))
+
+    # Constant bounds on the partition key let the planner prune whole years
+    low, high = year_bounds(filters)
+    if low is not None and low == high:
+        clauses.append(f"{alias}.year = %s")
+        params.append(low)
+    else:
+        if low is not None:
+            clauses.append(f"{alias}.year >= %s")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{alias}.year <= %s")
+            params.append(high)
+
+    if filters.get('date_from'):
+        clauses.append(f"{alias}.pub_date >= %s::date")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        clauses.append(f"{alias}.pub_date <= %s::date")
+        params.append(filters['date_to'])
+
+    if filters.get('kind'):
+        # The kind code is only stored in the member name: .../US20160148332A1-20160526/...
+        clauses.append(f"substring({alias}.raw_xml_path from '/US[0-9]+([A-Z][0-9]?)-') = ANY(%s)")
+        params.append(list(filters['kind']))
+
+    return ' AND '.join(clauses), params
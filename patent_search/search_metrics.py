@@ -0,0 +1,174 @@
+"""
+Prometheus metrics shared by the patent search services.
+
+Exposed on GET /metrics of each search service:
+
+    patent_search_stage_seconds{stage}            time spent in each session stage
+    patent_search_duration_seconds{outcome}       submit -> complete / error
+    patent_search_active_searches                 searches currently running
+    patent_search_queued_searches                 searches waiting for a worker
+    patent_search_rejected_total                  searches refused with HTTP 429
+    patent_search_sessions                        sessions held in memory
+    patent_search_db_query_seconds{query}         query execution + fetch
+    patent_search_db_rows{query}                  rows returned per query
+    patent_search_ollama_request_seconds{outcome} per-call Ollama latency
+    patent_search_llm_queue_seconds{priority}     wait for an llm_scheduler slot
+    patent_search_llm_waiting                     calls waiting for a slot
+    patent_search_ollama_tokens_total{kind}       prompt_eval / eval token counts
+    patent_search_ollama_tokens_per_second        eval tokens / eval duration
+    patent_search_claims_source_total{source}     where claims came from (database, archive, none)
+    patent_search_cache_requests_total{cache,result}  hit / miss per in-process cache
+    patent_search_near_duplicates_total           candidates collapsed before scoring (LLM calls saved)
+    patent_search_family_members_total            candidates attached to a family representative
+
+prometheus_client is optional: without it every metric is a no-op and
+/metrics answers 503.
+"""
+
+import time
+from typing import Dict, Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # prometheus_client not installed
+    prometheus_client = None
+
+TERMINAL_STAGES = ('complete', 'error')
+
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+DB_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+OLLAMA_BUCKETS = (0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+LLM_QUEUE_BUCKETS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+TOKEN_RATE_BUCKETS = (5, 10, 15, 20, 30, 40, 60, 80, 120, 200)
+
+
+class _NoopMetric:
+    """Stands in for a metric when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def set_function(self, f):
+        pass
+
+
+if prometheus_client is not None:
+    SEARCH_STAGE_SECONDS = Histogram('patent_search_stage_seconds', 'Time spent in each search stage',
+                                     ['stage'], buckets=STAGE_BUCKETS)
+    SEARCH_DURATION_SECONDS = Histogram('patent_search_duration_seconds', 'End-to-end search duration',
+                                        ['outcome'], buckets=STAGE_BUCKETS)
+    ACTIVE_SEARCHES = Gauge('patent_search_active_searches', 'Searches currently running')
+    QUEUED_SEARCHES = Gauge('patent_search_queued_searches', 'Searches waiting for a worker')
+    REJECTED_SEARCHES = Counter('patent_search_rejected_total', 'Searches refused because the queue was full')
+    SESSIONS = Gauge('patent_search_sessions', 'Search sessions held in memory')
+    DB_QUERY_SECONDS = Histogram('patent_search_db_query_seconds', 'Database query time (execute + fetch)',
+                                 ['query'], buckets=DB_BUCKETS)
+    DB_ROWS = Histogram('patent_search_db_rows', 'Rows returned per database query',
+                        ['query'], buckets=ROW_BUCKETS)
+    OLLAMA_REQUEST_SECONDS = Histogram('patent_search_ollama_request_seconds', 'Ollama /api/generate latency',
+                                       ['outcome'], buckets=OLLAMA_BUCKETS)
+    LLM_QUEUE_SECONDS = Histogram('patent_search_llm_queue_seconds', 'Wait for an LLM scheduler slot',
+                                  ['priority'], buckets=LLM_QUEUE_BUCKETS)
+    LLM_WAITING = Gauge('patent_search_llm_waiting', 'LLM calls waiting for a scheduler slot')
+    OLLAMA_TOKENS = Counter('patent_search_ollama_tokens_total', 'Tokens processed by Ollama', ['kind'])
+    OLLAMA_TOKENS_PER_SECOND = Histogram('patent_search_ollama_tokens_per_second', 'Ollama generation speed',
+                                         buckets=TOKEN_RATE_BUCKETS)
+    CLAIMS_SOURCE = Counter('patent_search_claims_source_total', 'Where candidate claims came from', ['source'])
+    CACHE_REQUESTS = Counter('patent_search_cache_requests_total', 'In-process cache lookups',
+                             ['cache', 'result'])
+    NEAR_DUPLICATES = Counter('patent_search_near_duplicates_total',
+                              'Candidates attached to a near-duplicate instead of being scored')
+    FAMILY_MEMBERS = Counter('patent_search_family_members_total',
+                             'Candidates attached to a member of their patent family instead of being scored')
+else:
+    SEARCH_STAGE_SECONDS = SEARCH_DURATION_SECONDS = ACTIVE_SEARCHES = SESSIONS = _NoopMetric()
+    QUEUED_SEARCHES = REJECTED_SEARCHES = _NoopMetric()
+    DB_QUERY_SECONDS = DB_ROWS = _NoopMetric()
+    OLLAMA_REQUEST_SECONDS = OLLAMA_TOKENS = OLLAMA_TOKENS_PER_SECOND = _NoopMetric()
+    LLM_QUEUE_SECONDS = LLM_WAITING = _NoopMetric()
+    CLAIMS_SOURCE = CACHE_REQUESTS = NEAR_DUPLICATES = FAMILY_MEMBERS = _NoopMetric()
+
+
+def set_stage(session: Dict, stage: str):
+    """
+    Move a search session to a new stage.
+
+    Records how long the previous stage took, and the whole search once it
+    reaches 'complete' or 'error'. Sessions carry 'created' (set when the
+    search is submitted) and 'stage_started' (maintained here).
+    """
+    now = time.time()
+    previous = session.get('stage')
+    started = session.get('stage_started')
+
+    if previous != stage or started is None:
+        if started is not None and previous not in TERMINAL_STAGES:
+            SEARCH_STAGE_SECONDS.labels(stage=previous).observe(now - started)
+        session['stage_started'] = now
+
+    session['stage'] = stage
+    if stage in TERMINAL_STAGES and previous not in TERMINAL_STAGES:
+        SEARCH_DURATION_SECONDS.labels(outcome=stage).observe(now - session.get('created', now))
+
+
+def track_sessions(sessions: Dict):
+    """Report the size of a service's search_sessions dict on every scrape."""
+    SESSIONS.set_function(lambda: len(sessions))
+
+
+def track_queue(executor):
+    """Report a SearchExecutor's queue depth on every scrape."""
+    QUEUED_SEARCHES.set_function(executor.queued)
+
+
+def track_llm_scheduler(scheduler):
+    """Report how many LLM calls are waiting for a slot on every scrape."""
+    LLM_WAITING.set_function(scheduler.waiting_count)
+
+
+def observe_db_query(query: str, seconds: float, rows: int):
+    DB_QUERY_SECONDS.labels(query=query).observe(seconds)
+    DB_ROWS.labels(query=query).observe(rows)
+
+
+def observe_ollama(outcome: str, seconds: float, result: Dict = None):
+    """Record one Ollama call; result is the parsed /api/generate response when it succeeded."""
+    OLLAMA_REQUEST_SECONDS.labels(outcome=outcome).observe(seconds)
+    if not result:
+        return
+    prompt_tokens = result.get('prompt_eval_count') or 0
+    eval_tokens = result.get('eval_count') or 0
+    OLLAMA_TOKENS.labels(kind='prompt_eval').inc(prompt_tokens)
+    OLLAMA_TOKENS.labels(kind='eval').inc(eval_tokens)
+    eval_ns = result.get('eval_duration') or 0
+    if eval_tokens and eval_ns:
+        OLLAMA_TOKENS_PER_SECOND.observe(eval_tokens / (eval_ns / 1e9))
+
+
+def count_claims_source(source: str):
+    CLAIMS_SOURCE.labels(source=source).inc()
+
+
+def count_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def render() -> Tuple[bytes, str, int]:
+    """Body, content type and status for the /metrics route."""
+    if prometheus_client is None:
+        return b'prometheus_client not installed\n', 'text/plain', 503
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST, 200
@@ -0,0 +1,103 @@
+"""
+Incremental search refinement shared by the patent search services.
+
+When an analyst edits a description and re-runs it, the finished session it
+came from already holds candidates, resolved claims and AI scores.
+plan_refinement() works out what can be kept:
+
+  - term delta        keywords added / removed versus the previous search
+  - dropped           previous candidates matching none of the new keywords
+  - reused            candidates kept with their score, when the description
+                      is still similar enough (REFINE_RESCORE_SIMILARITY)
+  - rescore           candidates kept but re-scored (claims are reused)
+
+Only the added keywords go back to the database, and only new or
+re-scored candidates go to the LLM.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+
+# Cosine similarity (word counts) at or above which previous scores are kept
+REFINE_RESCORE_SIMILARITY = float(os.environ.get('REFINE_RESCORE_SIMILARITY', 0.9))
+
+SCORE_FIELDS = ('relevance_score', 'ai_reasoning')
+
+
+def term_delta(old_terms: Iterable[str], new_terms: Iterable[str]) -> Dict[str, List[str]]:
+    old_terms, new_terms = list(old_terms or []), list(new_terms or [])
+    old_set, new_set = set(old_terms), set(new_terms)
+    return {
+        'added': [t for t in new_terms if t not in old_set],
+        'removed': [t for t in old_terms if t not in new_set],
+    }
+
+
+def description_similarity(old: str, new: str) -> float:
+    """Cosine similarity of the word counts of two descriptions (1.0 = same words)."""
+    a = Counter(re.findall(r'\b[a-z0-9]+\b', (old or '').lower()))
+    b = Counter(re.findall(r'\b[a-z0-9]+\b', (new or '').lower()))
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[word] for word, count in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def matches_terms(patent: Dict, terms: Iterable[str], fields: Iterable[str]) -> bool:
+    """Python equivalent of the services' LOWER(field) LIKE '%term%' OR ... match."""
+    texts = [(patent.get(field) or '').lower() for field in fields]
+    return any(term in text for term in terms for text in texts)
+
+
+def plan_refinement(previous: Dict, description: str, new_terms: List[str], fields: Iterable[str],
+                    threshold: float = REFINE_RESCORE_SIMILARITY) -> Dict:
+    """
+    Split the previous session's results for a refined description.
+
+    Returned candidates are copies; the previous session is left untouched.
+    """
+    delta = term_delta(previous.get('terms', []), new_terms)
+    similarity = description_similarity(previous.get('description', ''), description)
+    keep_scores = similarity >= threshold
+
+    reused, rescore, dropped = [], [], 0
+    for patent in previous.get('results', []):
+        if not matches_terms(patent, new_terms, fields):
+            dropped += 1
+            continue
+        patent = dict(patent)
+        if keep_scores:
+            reused.append(patent)
+        else:
+            for field in SCORE_FIELDS:
+                patent.pop(field, None)
+            rescore.append(patent)
+
+    return {
+        'added_terms': delta['added'],
+        'removed_terms': delta['removed'],
+        'similarity': round(similarity, 3),
+        'reused': reused,
+        'rescore': rescore,
+        'dropped': dropped,
+        # Near-duplicates and family members attached to a result were candidates too
+        'exclude': [p['pub_number'] for p in previous.get('results', [])] +
+                   [d['pub_number'] for p in previous.get('results', [])
+                    for d in p.get('near_duplicates', []) + p.get('family_members', [])],
+    }
+
+
+def summary(plan: Dict, new_candidates: int) -> Dict:
+    """What the progress response reports about a refinement."""
+    return {
+        'added_terms': plan['added_terms'],
+        'removed_terms': plan['removed_terms'],
+        'similarity': plan['similarity'],
+        'reused_scores': len(plan['reused']),
+        'rescored': len(plan['rescore']),
+        'dropped': plan['dropped'],
+        'new_candidates': new_candidates,
+    }
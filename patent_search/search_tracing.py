@@ -0,0 +1,263 @@
+"""
+Per-search tracing for the patent search services.
+
+Each background search runs under a root span keyed by its search_id;
+operations inside it open child spans:
+
+    with search_tracing.trace_search(search_id):
+        with search_tracing.span('extract_concepts'):
+            ...
+
+The current span lives in a contextvar, so nested calls (claims lookup ->
+archive, scoring -> ollama_generate) attach to the right parent without
+passing anything around. Outside a traced search span() is a no-op.
+
+Finished traces are kept in memory (the last SEARCH_TRACE_KEEP searches) for
+GET /api/search-trace/<search_id>, and exported:
+    SEARCH_TRACE_FILE            append one JSON line per span
+    OTEL_EXPORTER_OTLP_ENDPOINT  replay spans to an OTLP collector
+                                 (needs opentelemetry-sdk + otlp exporter)
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TRACE_FILE = os.environ.get('SEARCH_TRACE_FILE', '')
+SEARCH_TRACE_KEEP = int(os.environ.get('SEARCH_TRACE_KEEP', 500))
+OTLP_ENDPOINT = os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT', '')
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+except ImportError:  # OpenTelemetry not installed, JSONL / in-memory only
+    otel_trace = None
+
+_current_span = contextvars.ContextVar('search_span', default=None)
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+_file_lock = threading.Lock()
+_otel_tracer = None
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'end', 'attributes', 'status')
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.status = 'ok'
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        end = self.end if self.end is not None else time.time()
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'duration_ms': round((end - self.start) * 1000, 1),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def _open_span(trace_id: str, name: str, parent: Optional[Span], attributes: Dict):
+    s = Span(trace_id, name, parent.span_id if parent else None, attributes)
+    with _traces_lock:
+        spans = _traces.get(trace_id)
+    if spans is not None:
+        spans.append(s)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.status = 'error'
+        s.attributes['error'] = str(e)[:200]
+        raise
+    finally:
+        s.end = time.time()
+        _current_span.reset(token)
+        _export_jsonl([s])
+
+
+@contextmanager
+def trace_search(search_id: str, **attributes):
+    """Root span for one search; children opened inside attach to it."""
+    with _traces_lock:
+        _traces[search_id] = []
+        while len(_traces) > SEARCH_TRACE_KEEP:
+            _traces.popitem(last=False)
+    try:
+        with _open_span(search_id, 'search', None, dict(attributes)) as root:
+            yield root
+    finally:
+        _export_otlp(search_id)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current span; a no-op outside trace_search()."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    with _open_span(parent.trace_id, name, parent, dict(attributes)) as s:
+        yield s
+
+
+def current_trace_id() -> Optional[str]:
+    parent = _current_span.get()
+    return parent.trace_id if parent else None
+
+
+def _export_jsonl(spans: List[Span]):
+    if not SEARCH_TRACE_FILE:
+        return
+    lines = ''.join(json.dumps(s.to_dict(), default=str) + '\n' for s in spans)
+    try:
+        with _file_lock, open(SEARCH_TRACE_FILE, 'a') as f:
+            f.write(lines)
+    except OSError as e:
+        logger.warning(f"Could not write trace file {SEARCH_TRACE_FILE}: {e}")
+
+
+def _get_otel_tracer():
+    global _otel_tracer
+    if _otel_tracer is None:
+        provider = TracerProvider(resource=Resource.create({'service.name': os.environ.get(
+            'OTEL_SERVICE_NAME', 'patent-search')}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        _otel_tracer = provider.get_tracer('patent_search')
+    return _otel_tracer
+
+
+def _export_otlp(search_id: str):
+    """Replay a finished search's spans, with their recorded timestamps, to the OTLP collector."""
+    if not OTLP_ENDPOINT or otel_trace is None:
+        return
+    try:
+        tracer = _get_otel_tracer()
+        otel_spans = {}
+        for s in sorted(get_spans(search_id), key=lambda s: s['start']):
+            parent = otel_spans.get(s['parent_id'])
+            context = otel_trace.set_span_in_context(parent) if parent else None
+            attributes = {k: v if isinstance(v, (str, bool, int, float)) else str(v)
+                          for k, v in s['attributes'].items()}
+            attributes['search_id'] = search_id
+            o = tracer.start_span(s['name'], context=context, attributes=attributes,
+                                  start_time=int(s['start'] * 1e9))
+            if s['status'] == 'error':
+                o.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+            otel_spans[s['span_id']] = o
+            o.end(end_time=int((s['end'] or time.time()) * 1e9))
+    except Exception as e:
+        logger.warning(f"OTLP export failed for {search_id}: {e}")
+
+
+def get_spans(search_id: str) -> List[Dict]:
+    with _traces_lock:
+        spans = _traces.get(search_id)
+        spans = list(spans) if spans is not None else None
+    if spans is None:
+        return []
+    return [s.to_dict() for s in spans]
+
+
+def critical_path(spans: List[Dict]) -> List[Dict]:
+    """
+    Walk back from the end of the root span, at each level taking the child
+    that finished last before the current point: the chain of operations the
+    search actually waited on. Gaps between children count as the parent's
+    own (self) time.
+    """
+    children = {}
+    for s in spans:
+        children.setdefault(s['parent_id'], []).append(s)
+    roots = children.get(None, [])
+    if not roots:
+        return []
+
+    now = time.time()
+    end_of = lambda s: s['end'] if s['end'] is not None else now
+    path = []
+
+    def walk(s, depth):
+        entry = {'name': s['name'], 'span_id': s['span_id'], 'depth': depth,
+                 'duration_ms': s['duration_ms'], 'status': s['status'],
+                 'open': s['end'] is None, 'attributes': s['attributes']}
+        path.append(entry)
+        cursor = end_of(s)
+        chain = []
+        for child in sorted(children.get(s['span_id'], []), key=end_of, reverse=True):
+            if end_of(child) <= cursor + 1e-6:
+                chain.append(child)
+                cursor = child['start']
+        entry['self_ms'] = round(max(s['duration_ms'] - sum(c['duration_ms'] for c in chain), 0.0), 1)
+        for child in reversed(chain):
+            walk(child, depth + 1)
+
+    walk(roots[0], 0)
+    return path
+
+
+def render_trace(search_id: str) -> Optional[Dict]:
+    """Trace summary for /api/search-trace/<search_id>; None if unknown."""
+    spans = get_spans(search_id)
+    if not spans:
+        return None
+    root = next((s for s in spans if s['parent_id'] is None), spans[0])
+    path = critical_path(spans)
+    return {
+        'search_id': search_id,
+        'complete': root['end'] is not None,
+        'total_ms': root['duration_ms'],
+        'span_count': len(spans),
+        'critical_path': path,
+        'slowest_spans': sorted((s for s in spans if s['parent_id']),
+                                key=lambda s: s['duration_ms'], reverse=True)[:10],
+    }
+
+
+def render_text(trace: Dict) -> str:
+    """Plain text critical path: indented spans with a bar scaled to the search duration."""
+    total = trace['total_ms'] or 1.0
+    lines = [f"search {trace['search_id']}  {trace['total_ms']:.0f} ms"
+             f"{'' if trace['complete'] else '  (running)'}"]
+    for entry in trace['critical_path']:
+        bar = '#' * max(1, int(40 * entry['duration_ms'] / total))
+        detail = ' '.join(f"{k}={v}" for k, v in entry['attributes'].items())
+        flag = ' ERROR' if entry['status'] == 'error' else ''
+        lines.append(f"{'  ' * entry['depth']}{entry['name']:<24} {entry['duration_ms']:>9.0f} ms "
+                     f"(self {entry['self_ms']:.0f}) {bar}{flag} {detail}".rstrip())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Signature Build - shared scaffolding of the offline MinHash index jobs
+
+near_duplicates.py and similar_patents.py both compute one signature row per
+patent_data_unified publication on a process pool and publish NumPy arrays
+in an index directory that the services memory-map:
+
+    keys.npy        sorted pub_numbers (KEY_DTYPE)
+    signatures.npy  one uint32 signature row per key
+
+The jobs differ only in the SELECT and the worker that turns a chunk of its
+rows into signatures; scanning, sorting and swapping the directory in live
+here.
+"""
+
+import os
+import time
+import shutil
+import logging
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 5432)),
+    'database': os.environ.get('DB_NAME', 'companies_db'),
+    'user': os.environ.get('DB_USER', 'mark'),
+    'password': os.environ.get('DB_PASSWORD', 'mark123')
+}
+
+KEY_DTYPE = 'S12'
+BUILD_CHUNK_ROWS = 2000
+COPY_ROWS = 1_000_000
+
+
+def compute_signatures(pool, cur, workers: int, chunk_fn: Callable[[List[tuple]], np.ndarray],
+                       write: Callable) -> None:
+    """
+    Stream the cursor through chunk_fn on the pool; write(keys, signatures)
+    per chunk, in cursor order. Rows start with pub_number.
+    """
+    in_flight = deque()
+    while True:
+        rows = cur.fetchmany(BUILD_CHUNK_ROWS)
+        if not rows:
+            break
+        in_flight.append(([r[0] for r in rows], pool.apply_async(chunk_fn, (rows,))))
+        # A bounded number of chunks in flight keeps memory flat on an 8M row table
+        if len(in_flight) >= workers * 2:
+            keys, job = in_flight.popleft()
+            write(keys, job.get())
+    while in_flight:
+        keys, job = in_flight.popleft()
+        write(keys, job.get())
+
+
+def write_sorted(out_dir: Path, keys: np.ndarray, signatures) -> None:
+    """keys.npy and signatures.npy in pub_number order, copied in slices."""
+    order = np.argsort(keys, kind='stable')
+    np.save(out_dir / 'keys.npy', keys[order])
+    out = np.lib.format.open_memmap(out_dir / 'signatures.npy', mode='w+', dtype=np.uint32,
+                                    shape=(len(keys), signatures.shape[1]))
+    for begin in range(0, len(keys), COPY_ROWS):
+        out[begin:begin + COPY_ROWS] = signatures[order[begin:begin + COPY_ROWS]]
+    out.flush()
+
+
+def build_signatures(tmp_dir: Path, select_sql: str, chunk_fn: Callable[[List[tuple]], np.ndarray],
+                     width: int, workers: int, cursor_name: str) -> int:
+    """
+    Signatures of every publication into tmp_dir (keys.npy, signatures.npy);
+    returns the row count. select_sql must scan the rows of
+    patent_data_unified WHERE pub_number IS NOT NULL, pub_number first.
+    """
+    import psycopg2
+
+    start = time.time()
+    conn = psycopg2.connect(**DB_CONFIG)
+    # One snapshot for the count and the scan, so the preallocated array fits exactly
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cur = conn.cursor()
+    cur.execute("SELECT count(*) FROM patent_data_unified WHERE pub_number IS NOT NULL")
+    total = cur.fetchone()[0]
+    cur.close()
+
+    unsorted = np.lib.format.open_memmap(tmp_dir / 'signatures.unsorted.npy', mode='w+', dtype=np.uint32,
+                                         shape=(total, width))
+    keys = []
+
+    def write(chunk_keys, part):
+        unsorted[len(keys):len(keys) + len(part)] = part
+        keys.extend(chunk_keys)
+        if len(keys) // COPY_ROWS != (len(keys) - len(part)) // COPY_ROWS:
+            logger.info(f"{len(keys)}/{total} signatures ({len(keys) / max(time.time() - start, 1e-9):.0f}/s)")
+
+    cur = conn.cursor(name=cursor_name)
+    cur.itersize = BUILD_CHUNK_ROWS
+    cur.execute(select_sql)
+    with Pool(processes=max(1, workers)) as pool:
+        compute_signatures(pool, cur, workers, chunk_fn, write)
+    cur.close()
+    conn.close()
+
+    keys = np.array(keys, dtype=KEY_DTYPE)
+    write_sorted(tmp_dir, keys, unsorted[:len(keys)])
+    del unsorted
+    os.remove(tmp_dir / 'signatures.unsorted.npy')
+    return len(keys)
+
+
+def fresh_tmp_dir(out_dir: Path) -> Path:
+    """Empty <out_dir>.tmp to build the next version of an index in."""
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+
+def swap_dir(tmp_dir: Path, out_dir: Path) -> None:
+    """Replace out_dir with tmp_dir, so running services never see a partial index."""
+    old_dir = out_dir.with_name(out_dir.name + '.old')
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
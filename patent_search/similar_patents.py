@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Similar Patents - precomputed neighbour lists per publication
+
+Offline job behind GET /api/patent/<pub_number>/similar:
+
+    python similar_patents.py build   [--workers N]   # every publication, resumable
+    python similar_patents.py refresh [--workers N]   # publications loaded since, after weekly data
+
+Each publication gets a MinHash signature over the set of content words
+of its title, abstract and first claims (near_duplicates.minhash(), 4-word
+shingles there would only find near-duplicates). Signatures are banded
+2 rows x SIMILAR_BANDS bands; publications sharing a band value are
+candidates, their estimated word-set Jaccard similarity is computed from
+the signatures and the best SIMILAR_TOP_N at or above
+SIMILAR_MIN_SIMILARITY are stored, one row per publication:
+
+    patent_similar_neighbors(pub_number, neighbors TEXT[], similarities REAL[])
+
+Band values shared by more than SIMILAR_MAX_BUCKET publications (generic
+words) are skipped, they say little about similarity.
+
+Working files in SIMILAR_PATENTS_DIR (memory-mapped by the workers):
+    keys.npy, signatures.npy   sorted pub_numbers and their signatures
+    band_hashes.npy            (bands, rows) band values, sorted per band
+    band_order.npy             (bands, rows) signature row of each sorted value
+    pending.npy, progress.json publications still to compute, finished shards
+
+Neighbours are computed on a process pool in shards of SHARD_ROWS
+publications; each shard is committed before it is recorded in
+progress.json, so an interrupted build or refresh resumes with the next
+shard when re-run (an interrupted signature pass starts over). refresh
+adds the signatures of publications missing from keys.npy, computes their
+lists and merges each of them into the lists of the existing publications
+it is similar to (similarity and banding are symmetric). Deleted
+publications keep their rows until the next build: a build rewrites the
+row of every publication in keys.npy and, after its last shard, deletes
+the rows it did not write.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from near_duplicates import EMPTY, MINHASH_PERMUTATIONS, minhash
+from signature_build import (DB_CONFIG, KEY_DTYPE, BUILD_CHUNK_ROWS, build_signatures, compute_signatures,
+                             fresh_tmp_dir, swap_dir, write_sorted)
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_PATENTS_DIR = os.environ.get('SIMILAR_PATENTS_DIR', '/mnt/patents/data/indexes/similar_patents')
+SIMILAR_TOP_N = int(os.environ.get('SIMILAR_TOP_N', 20))
+SIMILAR_MIN_SIMILARITY = float(os.environ.get('SIMILAR_MIN_SIMILARITY', 0.2))
+SIMILAR_MAX_BUCKET = int(os.environ.get('SIMILAR_MAX_BUCKET', 200))
+
+# 32 bands x 2 rows: pairs at 0.3 word Jaccard become candidates with ~95% probability
+SIMILAR_BANDS = MINHASH_PERMUTATIONS // 2
+SIGNATURE_CLAIMS_CHARS = 4000
+
+SHARD_ROWS = 20000
+
+TABLE = 'patent_similar_neighbors'
+
+RE_WORD = re.compile(r'[a-z][a-z0-9]{2,}')
+STOP_WORDS = frozenset("""
+    the and for with from that this these those which wherein whereby said such are was were
+    has have having been being into onto upon each other one two first second third plurality
+    least more than when where while can may also its their there thereof therein
+    claim claims comprising comprises comprise including includes include according method
+    system device apparatus configured based further between within without via using used
+""".split())
+
+
+def signature_words(title: Optional[str], abstract: Optional[str], claims: Optional[str]) -> set:
+    """Content words of a publication: title, abstract and the first claims."""
+    text = f"{title or ''} {abstract or ''} {(claims or '')[:SIGNATURE_CLAIMS_CHARS]}".lower()
+    return set(RE_WORD.findall(text)) - STOP_WORDS
+
+
+def word_signature(title, abstract, claims) -> np.ndarray:
+    words = signature_words(title, abstract, claims)
+    if not words:
+        return np.full(MINHASH_PERMUTATIONS, EMPTY, dtype=np.uint32)
+    return minhash(words)
+
+
+def band_values(signatures: np.ndarray) -> np.ndarray:
+    """(rows, SIMILAR_BANDS) uint64: the two signature values of each band, packed."""
+    signatures = np.asarray(signatures, dtype=np.uint64)
+    return (signatures[:, 0::2] << np.uint64(32)) | signatures[:, 1::2]
+
+
+# ---------------------------------------------------------------------------
+# Signatures
+# ---------------------------------------------------------------------------
+
+SIGNATURE_SQL = """
+    SELECT pub_number, title, abstract_text,
+           COALESCE(claims_text,
+                    CASE WHEN description_text LIKE 'CLAIMS:%%' THEN substr(description_text, 8, {chars}) END)
+    FROM patent_data_unified
+    WHERE pub_number IS NOT NULL
+""".format(chars=SIGNATURE_CLAIMS_CHARS)
+
+
+def _signature_chunk(rows: List[tuple]) -> np.ndarray:
+    """Worker: signatures for (pub_number, title, abstract_text, claims) rows."""
+    out = np.empty((len(rows), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    for i, (_, title, abstract, claims) in enumerate(rows):
+        out[i] = word_signature(title, abstract, claims)
+    return out
+
+
+def write_bands(out_dir: Path) -> None:
+    """Band values of every signature, sorted per band, with the signature row of each."""
+    signatures = np.load(out_dir / 'signatures.npy', mmap_mode='r')
+    rows = len(signatures)
+    hashes = np.lib.format.open_memmap(out_dir / 'band_hashes.npy', mode='w+', dtype=np.uint64,
+                                       shape=(SIMILAR_BANDS, rows))
+    order = np.lib.format.open_memmap(out_dir / 'band_order.npy', mode='w+', dtype=np.int32,
+                                      shape=(SIMILAR_BANDS, rows))
+    # One pass over the signatures, then one in-memory sort per band
+    for begin in range(0, rows, 1_000_000):
+        hashes[:, begin:begin + 1_000_000] = band_values(signatures[begin:begin + 1_000_000]).T
+    for band in range(SIMILAR_BANDS):
+        values = np.array(hashes[band])
+        band_order = np.argsort(values, kind='stable')
+        hashes[band] = values[band_order]
+        order[band] = band_order
+    hashes.flush()
+    order.flush()
+
+
+# ---------------------------------------------------------------------------
+# Neighbours
+# ---------------------------------------------------------------------------
+
+class NeighborStore:
+    """Memory-mapped signatures and band tables, opened once per worker process."""
+
+    def __init__(self, index_dir: str):
+        index_dir = Path(index_dir)
+        self.keys = np.load(index_dir / 'keys.npy', mmap_mode='r')
+        self.signatures = np.load(index_dir / 'signatures.npy', mmap_mode='r')
+        self.band_hashes = np.load(index_dir / 'band_hashes.npy', mmap_mode='r')
+        self.band_order = np.load(index_dir / 'band_order.npy', mmap_mode='r')
+
+    def positions(self, pub_numbers: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.keys, pub_numbers)
+
+    def neighbors(self, positions: np.ndarray, pending: Optional[set] = None):
+        """
+        Yield (pub_number, [(neighbor, similarity)] best first, reverse) per position.
+
+        reverse lists the (neighbor, similarity) pairs above the threshold whose
+        neighbor is not pending: refresh merges the publication into their lists.
+        """
+        signatures = np.asarray(self.signatures[positions])
+        values = band_values(signatures)
+        bounds = [(np.searchsorted(self.band_hashes[b], values[:, b], side='left'),
+                   np.searchsorted(self.band_hashes[b], values[:, b], side='right'))
+                  for b in range(SIMILAR_BANDS)]
+
+        for i, position in enumerate(positions):
+            pub_number = self.keys[position].decode()
+            signature = signatures[i]
+            if (signature == EMPTY).all():
+                yield pub_number, [], []
+                continue
+            members = []
+            for band in range(SIMILAR_BANDS):
+                low, high = bounds[band][0][i], bounds[band][1][i]
+                if 1 < high - low <= SIMILAR_MAX_BUCKET:
+                    members.append(self.band_order[band, low:high])
+            if not members:
+                yield pub_number, [], []
+                continue
+            candidates = np.unique(np.concatenate(members))
+            candidates = candidates[candidates != position]
+            scores = (np.asarray(self.signatures[candidates]) == signature).mean(axis=1)
+            keep = scores >= SIMILAR_MIN_SIMILARITY
+            candidates, scores = candidates[keep], scores[keep]
+            best = np.argsort(-scores, kind='stable')
+            found = [(self.keys[c].decode(), round(float(s), 3)) for c, s in zip(candidates[best], scores[best])]
+            reverse = [pair for pair in found if pair[0] not in pending] if pending is not None else []
+            yield pub_number, found[:SIMILAR_TOP_N], reverse
+
+
+_store = None
+
+
+def _neighbors_shard(index_dir: str, pub_numbers: np.ndarray, with_reverse: bool):
+    """Worker: neighbour lists of one shard (and reverse pairs for refresh)."""
+    global _store
+    if _store is None:
+        _store = NeighborStore(index_dir)
+    positions = _store.positions(pub_numbers)
+    pending = {p.decode() for p in pub_numbers} if with_reverse else None
+    return list(_store.neighbors(positions, pending))
+
+
+def ensure_table(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            pub_number    TEXT PRIMARY KEY,
+            neighbors     TEXT[] NOT NULL,
+            similarities  REAL[] NOT NULL,
+            computed_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    conn.commit()
+    cur.close()
+
+
+def upsert_lists(cur, lists: List[Tuple[str, List[Tuple[str, float]]]]) -> None:
+    import psycopg2.extras
+
+    psycopg2.extras.execute_values(cur, f"""
+        INSERT INTO {TABLE} (pub_number, neighbors, similarities) VALUES %s
+        ON CONFLICT (pub_number) DO UPDATE
+        SET neighbors = EXCLUDED.neighbors, similarities = EXCLUDED.similarities, computed_at = now()
+    """, [(pub, [n for n, _ in found], [s for _, s in found]) for pub, found in lists],
+        template="(%s, %s::text[], %s::real[])", page_size=1000)
+
+
+def merge_reverse(cur, reverse: Dict[str, List[Tuple[str, float]]]) -> None:
+    """Merge new publications into the stored lists of the existing ones they are similar to."""
+    cur.execute(f"SELECT pub_number, neighbors, similarities FROM {TABLE} "
+                f"WHERE pub_number = ANY(%s) FOR UPDATE", (list(reverse),))
+    merged = []
+    stored = {pub: dict(zip(neighbors, similarities)) for pub, neighbors, similarities in cur.fetchall()}
+    for pub, additions in reverse.items():
+        current = stored.get(pub, {})
+        current.update(additions)
+        merged.append((pub, sorted(current.items(), key=lambda item: (-item[1], item[0]))[:SIMILAR_TOP_N]))
+    upsert_lists(cur, merged)
+
+
+def load_progress(index_dir: Path) -> Dict:
+    path = index_dir / 'progress.json'
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_progress(index_dir: Path, progress: Dict) -> None:
+    tmp = index_dir / 'progress.json.tmp'
+    tmp.write_text(json.dumps(progress))
+    os.replace(tmp, index_dir / 'progress.json')
+
+
+def compute_neighbors(index_dir: Path, workers: int) -> None:
+    """Neighbour lists of pending.npy, shard by shard; skips shards already committed."""
+    import psycopg2
+
+    pending_path = index_dir / 'pending.npy'
+    if not pending_path.exists():
+        logger.info("No publications pending")
+        return
+    pending = np.load(pending_path)
+    progress = load_progress(index_dir)
+    with_reverse = progress.get('mode') == 'refresh'
+    done = set(progress.get('shards_done', []))
+    shards = [s for s in range(0, len(pending), SHARD_ROWS) if s not in done]
+    logger.info(f"{len(pending)} publications pending, {len(shards)} of "
+                f"{-(-len(pending) // SHARD_ROWS)} shards to compute ({progress.get('mode')})")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    ensure_table(conn)
+    cur = conn.cursor()
+    if progress.get('mode') == 'build' and 'started_at' not in progress:
+        # Database clock, compared with computed_at when the build removes stale rows
+        cur.execute("SELECT now()")
+        progress['started_at'] = cur.fetchone()[0].isoformat()
+        save_progress(index_dir, dict(progress, shards_done=sorted(done)))
+    start = time.time()
+    computed = 0
+    in_flight = deque()
+
+    def write(shard, job):
+        nonlocal computed
+        results = job.get()
+        # Empty lists are stored too: computed, nothing similar enough
+        upsert_lists(cur, [(pub, found) for pub, found, _ in results])
+        if with_reverse:
+            reverse = {}
+            for pub, _, pairs in results:
+                for neighbor, score in pairs:
+                    reverse.setdefault(neighbor, {})[pub] = score
+            if reverse:
+                merge_reverse(cur, reverse)
+        conn.commit()
+        done.add(shard)
+        save_progress(index_dir, dict(progress, shards_done=sorted(done)))
+        computed += len(results)
+        logger.info(f"shard {shard // SHARD_ROWS}: {len(results)} publications "
+                    f"({computed / max(time.time() - start, 1e-9):.0f}/s)")
+
+    with Pool(processes=max(1, workers)) as pool:
+        for shard in shards:
+            in_flight.append((shard, pool.apply_async(
+                _neighbors_shard, (str(index_dir), pending[shard:shard + SHARD_ROWS], with_reverse))))
+            if len(in_flight) >= workers * 2:
+                write(*in_flight.popleft())
+        while in_flight:
+            write(*in_flight.popleft())
+    if progress.get('mode') == 'build':
+        # Every publication of keys.npy has just been written; older rows are withdrawn or renumbered
+        cur.execute(f"DELETE FROM {TABLE} WHERE computed_at < %s", (progress['started_at'],))
+        logger.info(f"Removed {cur.rowcount} lists of publications no longer in patent_data_unified")
+        conn.commit()
+    cur.close()
+    conn.close()
+
+    pending_path.unlink()
+    (index_dir / 'progress.json').unlink()
+    logger.info(f"Neighbour lists of {computed} publications in {(time.time() - start) / 60:.1f} min")
+
+
+def write_meta(out_dir: Path, rows: int) -> None:
+    (out_dir / 'meta.json').write_text(json.dumps({
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rows': int(rows),
+        'bands': SIMILAR_BANDS,
+        'top_n': SIMILAR_TOP_N,
+        'min_similarity': SIMILAR_MIN_SIMILARITY,
+        'max_bucket': SIMILAR_MAX_BUCKET,
+    }, indent=2))
+
+
+def build(index_dir: str = SIMILAR_PATENTS_DIR, workers: int = os.cpu_count() or 4) -> None:
+    """Signatures and band tables for every publication, then every neighbour list."""
+    out_dir = Path(index_dir)
+    if load_progress(out_dir).get('mode') == 'build':
+        logger.info(f"Resuming build in {out_dir}")
+        compute_neighbors(out_dir, workers)
+        return
+
+    start = time.time()
+    tmp_dir = fresh_tmp_dir(out_dir)
+    count = build_signatures(tmp_dir, SIGNATURE_SQL, _signature_chunk, MINHASH_PERMUTATIONS,
+                             workers, 'similar_patents_build')
+    write_bands(tmp_dir)
+    write_meta(tmp_dir, count)
+    np.save(tmp_dir / 'pending.npy', np.load(tmp_dir / 'keys.npy'))
+    save_progress(tmp_dir, {'mode': 'build', 'shards_done': []})
+    swap_dir(tmp_dir, out_dir)
+    logger.info(f"Signatures and bands of {count} publications in {(time.time() - start) / 60:.1f} min")
+
+    compute_neighbors(out_dir, workers)
+
+
+def refresh(index_dir: str = SIMILAR_PATENTS_DIR, workers: int = os.cpu_count() or 4) -> None:
+    """Add publications missing from keys.npy and compute (and merge) their neighbour lists."""
+    import psycopg2
+
+    out_dir = Path(index_dir)
+    if not (out_dir / 'keys.npy').exists():
+        logger.info(f"No signatures in {out_dir}, running a full build")
+        build(index_dir, workers)
+        return
+    if load_progress(out_dir):
+        logger.info(f"Resuming {load_progress(out_dir).get('mode')} in {out_dir}")
+        compute_neighbors(out_dir, workers)
+        return
+
+    start = time.time()
+    known = np.load(out_dir / 'keys.npy', mmap_mode='r')
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor(name='similar_patents_keys')
+    cur.itersize = 100_000
+    cur.execute("SELECT pub_number FROM patent_data_unified WHERE pub_number IS NOT NULL")
+    new = []
+    while True:
+        rows = cur.fetchmany(100_000)
+        if not rows:
+            break
+        batch = np.array([r[0] for r in rows], dtype=KEY_DTYPE)
+        pos = np.minimum(np.searchsorted(known, batch), max(len(known) - 1, 0))
+        new.extend(batch[known[pos] != batch] if len(known) else batch)
+    cur.close()
+    if not new:
+        conn.close()
+        logger.info("No new publications")
+        return
+    logger.info(f"{len(new)} new publications")
+
+    new_keys, new_signatures = [], []
+
+    def write(chunk_keys, part):
+        new_keys.extend(chunk_keys)
+        new_signatures.append(part)
+
+    cur = conn.cursor(name='similar_patents_refresh')
+    cur.itersize = BUILD_CHUNK_ROWS
+    cur.execute(SIGNATURE_SQL + " AND pub_number = ANY(%s)", ([k.decode() for k in new],))
+    with Pool(processes=max(1, workers)) as pool:
+        compute_signatures(pool, cur, workers, _signature_chunk, write)
+    cur.close()
+    conn.close()
+    if not new_keys:
+        logger.info("New publications were deleted meanwhile")
+        return
+
+    tmp_dir = fresh_tmp_dir(out_dir)
+    old_signatures = np.load(out_dir / 'signatures.npy', mmap_mode='r')
+    new_keys = np.array(new_keys, dtype=KEY_DTYPE)
+    keys = np.concatenate([np.asarray(known), new_keys])
+    unsorted = np.lib.format.open_memmap(tmp_dir / 'signatures.unsorted.npy', mode='w+', dtype=np.uint32,
+                                         shape=(len(keys), MINHASH_PERMUTATIONS))
+    for begin in range(0, len(known), 1_000_000):
+        end = min(begin + 1_000_000, len(known))
+        unsorted[begin:end] = old_signatures[begin:end]
+    unsorted[len(known):] = np.concatenate(new_signatures)
+    write_sorted(tmp_dir, keys, unsorted)
+    del unsorted, old_signatures, known
+    os.remove(tmp_dir / 'signatures.unsorted.npy')
+    write_bands(tmp_dir)
+    write_meta(tmp_dir, len(keys))
+    np.save(tmp_dir / 'pending.npy', np.sort(new_keys))
+    save_progress(tmp_dir, {'mode': 'refresh', 'shards_done': []})
+    swap_dir(tmp_dir, out_dir)
+    logger.info(f"Signatures and bands updated in {(time.time() - start) / 60:.1f} min")
+
+    compute_neighbors(out_dir, workers)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    workers = os.cpu_count() or 4
+    if '--workers' in args:
+        i = args.index('--workers')
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if not args or args[0] not in ('build', 'refresh'):
+        print("Usage: python similar_patents.py build|refresh [index_dir] [--workers N]")
+        sys.exit(1)
+    command = build if args[0] == 'build' else refresh
+    command(args[1] if len(args) >= 2 else SIMILAR_PATENTS_DIR, workers)
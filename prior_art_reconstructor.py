@@ -3,21 +3,25 @@
 Prior Art Document Reconstructor
 Reconstructs USPTO patent documents from bulk XML and TIF files.
 
-Supports two modes:
+Supports three modes:
 1. Direct XML path: python prior_art_reconstructor.py /path/to/file.XML
 2. Publication number lookup: python prior_art_reconstructor.py US20160148332A1
+3. Batch: python prior_art_reconstructor.py --batch refs.txt --out-dir packet/
 """
 
 import os
 import sys
 import re
-import tarfile
-import zipfile
+import json
+import time
+import argparse
+import hashlib
 import tempfile
 import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, Tuple
-from lxml import etree
 from PIL import Image
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
@@ -27,6 +31,9 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from reportlab.lib import colors
 from io import BytesIO
 
+from patent_document import build_patent_document, parse_patent_xml
+from patent_archives import find_tar_members, open_tar_member_zip, open_tar_nested_zip
+
 # Database configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -39,6 +46,12 @@ DB_CONFIG = {
 # Base path for patent archives
 PATENT_ARCHIVE_BASE = '/mnt/patents/data/historical'
 
+# Drawing rendering: target resolution inside the PDF frame, converted PNG cache
+# (content-addressed, safe to share between runs; empty disables) and worker threads
+DRAWING_DPI = int(os.environ.get('DRAWING_DPI', '150'))
+DRAWING_CACHE_DIR = os.environ.get('DRAWING_CACHE_DIR', '/mnt/patents/data/cache/drawings')
+DRAWING_WORKERS = int(os.environ.get('DRAWING_WORKERS', str(min(8, os.cpu_count() or 1))))
+
 
 class PatentLookup:
     """Handles database lookup and file extraction for patents."""
@@ -108,8 +121,16 @@ class PatentLookup:
             print(f"Database query error: {e}")
             return None
 
-    def extract_patent_files(self, patent_info: dict, output_dir: str) -> Optional[str]:
-        """Extract patent XML and TIF files from archive to output directory."""
+    def read_patent_members(self, patent_info: dict, include_drawings: bool = True) -> Optional[dict]:
+        """
+        Read a patent's XML (and optionally its TIF drawings) from the weekly TAR into memory.
+
+        The per-patent ZIP is opened in place inside the TAR, so only the
+        requested members are read and decompressed.
+
+        Returns:
+            {member_basename: bytes} with the XML first, or None on failure
+        """
         raw_xml_path = patent_info['raw_xml_path']
         year = patent_info['year']
 
@@ -133,61 +154,15 @@ class PatentLookup:
             print(f"Error: TAR file not found: {tar_path}")
             return None
 
-        print(f"Extracting from: {tar_path}")
-
-        # Create output directory
-        extract_dir = Path(output_dir)
-        extract_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Reading from: {tar_path}")
 
         try:
-            # Open TAR and find the ZIP file
-            with tarfile.open(tar_path, 'r') as tar:
-                # Look for ZIP file containing our patent
-                zip_pattern = f"{patent_dir}.ZIP"
-                zip_member = None
-
-                for member in tar.getmembers():
-                    if member.name.endswith(zip_pattern):
-                        zip_member = member
-                        break
-
-                if not zip_member:
-                    print(f"Error: ZIP not found in TAR for pattern: {zip_pattern}")
-                    # List some contents for debugging
-                    print("Available files in TAR (first 10):")
-                    for i, m in enumerate(tar.getmembers()[:10]):
-                        print(f"  {m.name}")
-                    return None
-
-                print(f"Found ZIP: {zip_member.name}")
-
-                # Extract ZIP to temp location
-                zip_file = tar.extractfile(zip_member)
-                if not zip_file:
-                    print("Error: Could not extract ZIP from TAR")
+            with open_tar_nested_zip(tar_path, patent_dir) as zf:
+                if zf is None:
+                    print(f"Error: ZIP not found in TAR for pattern: {patent_dir}.ZIP")
                     return None
 
-                # Read ZIP contents
-                zip_data = BytesIO(zip_file.read())
-
-                with zipfile.ZipFile(zip_data, 'r') as zf:
-                    # Extract all files to output directory
-                    for name in zf.namelist():
-                        # Get just the filename
-                        basename = Path(name).name
-                        if basename:  # Skip directory entries
-                            target_path = extract_dir / basename
-                            with zf.open(name) as src, open(target_path, 'wb') as dst:
-                                dst.write(src.read())
-                            print(f"  Extracted: {basename}")
-
-            # Find the XML file
-            xml_files = list(extract_dir.glob('*.XML'))
-            if xml_files:
-                return str(xml_files[0])
-
-            print("Error: No XML file found in extracted contents")
-            return None
+                return self._read_zip_members(zf, include_drawings)
 
         except Exception as e:
             print(f"Extraction error: {e}")
@@ -195,6 +170,114 @@ class PatentLookup:
             traceback.print_exc()
             return None
 
+    @staticmethod
+    def _read_zip_members(zf, include_drawings: bool) -> Optional[dict]:
+        """Read the XML (first) and optionally the TIFs of an open per-patent ZIP."""
+        xml_infos = []
+        tif_infos = []
+        for info in zf.infolist():
+            upper = info.filename.upper()
+            if upper.endswith('.XML'):
+                xml_infos.append(info)
+            elif include_drawings and upper.endswith(('.TIF', '.TIFF')):
+                tif_infos.append(info)
+
+        if not xml_infos:
+            print("Error: No XML file found in patent ZIP")
+            return None
+
+        members = {}
+        for info in xml_infos[:1] + tif_infos:
+            members[Path(info.filename).name] = zf.read(info)
+        return members
+
+    def lookup_many(self, pub_numbers: list) -> dict:
+        """Look up several patents in one query. Returns {normalized_pub_number: patent_info}."""
+        if not self.conn:
+            if not self.connect():
+                return {}
+
+        normalized = list(dict.fromkeys(self.normalize_pub_number(p) for p in pub_numbers))
+
+        try:
+            cur = self.conn.cursor()
+            cur.execute("""
+                SELECT pub_number, pub_date, raw_xml_path, year, title
+                FROM patent_data_unified
+                WHERE pub_number = ANY(%s)
+            """, (normalized,))
+            rows = cur.fetchall()
+            cur.close()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return {}
+
+        return {
+            row[0]: {
+                'pub_number': row[0],
+                'pub_date': row[1],
+                'raw_xml_path': row[2],
+                'year': row[3],
+                'title': row[4]
+            }
+            for row in rows
+        }
+
+    def iter_archive_members(self, tar_filename: str, year, patent_infos: list,
+                             include_drawings: bool = True):
+        """
+        Read several patents from one weekly TAR, opening and walking it once.
+
+        Yields (patent_info, members_or_None, error_or_None) in the order given.
+        """
+        tar_path = Path(PATENT_ARCHIVE_BASE) / str(year) / tar_filename
+        if not tar_path.exists():
+            for info in patent_infos:
+                yield info, None, f"TAR file not found: {tar_path}"
+            return
+
+        zip_names = {info['pub_number']: f"{info['raw_xml_path'].split('/')[1]}.ZIP" for info in patent_infos}
+        locations = find_tar_members(tar_path, zip_names.values())
+
+        with open(tar_path, 'rb') as tar_file:
+            for info in patent_infos:
+                zip_name = zip_names[info['pub_number']]
+                found = locations.get(zip_name.upper())
+                if not found:
+                    yield info, None, f"ZIP not found in TAR: {zip_name}"
+                    continue
+                try:
+                    with open_tar_member_zip(tar_file, found[1], found[2]) as zf:
+                        members = self._read_zip_members(zf, include_drawings)
+                except Exception as e:
+                    yield info, None, f"Extraction error: {e}"
+                    continue
+                if members:
+                    yield info, members, None
+                else:
+                    yield info, None, "No XML file found in patent ZIP"
+
+    @staticmethod
+    def write_members(members: dict, output_dir: str) -> str:
+        """Write members from read_patent_members to a directory; returns the XML path."""
+        extract_dir = Path(output_dir)
+        extract_dir.mkdir(parents=True, exist_ok=True)
+        for basename, data in members.items():
+            (extract_dir / basename).write_bytes(data)
+        # The XML is always the first member
+        return str(extract_dir / next(iter(members)))
+
+    def extract_patent_files(self, patent_info: dict, output_dir: str,
+                             include_drawings: bool = True) -> Optional[str]:
+        """Extract patent XML and TIF files from archive to output directory."""
+        members = self.read_patent_members(patent_info, include_drawings)
+        if not members:
+            return None
+
+        xml_path = self.write_members(members, output_dir)
+        print(f"  Extracted {len(members)} files to {output_dir}")
+        return xml_path
+
 
 class PatentReconstructor:
     """Reconstructs a patent document from USPTO XML and TIF files."""
@@ -202,10 +285,12 @@ class PatentReconstructor:
     def __init__(self, xml_path: str):
         self.xml_path = Path(xml_path)
         self.base_dir = self.xml_path.parent
-        self.tree = etree.parse(str(self.xml_path))
-        self.root = self.tree.getroot()
+        self.root = parse_patent_xml(str(self.xml_path))
         self.ns = {}  # No namespace in USPTO XML
 
+        # Structured model, built in one pass; all extract_* methods read from it
+        self.doc = build_patent_document(self.root)
+
         # Setup styles
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
@@ -251,180 +336,215 @@ class PatentReconstructor:
             leading=11
         ))
 
-    def _get_text(self, xpath: str, default: str = "") -> str:
-        """Get text from xpath, return default if not found."""
-        elements = self.root.xpath(xpath)
-        if elements:
-            if hasattr(elements[0], 'text') and elements[0].text:
-                return elements[0].text.strip()
-            elif isinstance(elements[0], str):
-                return elements[0].strip()
-        return default
-
-    def _get_all_text(self, element) -> str:
-        """Get all text content from element, including nested tags."""
-        if element is None:
-            return ""
-        return ''.join(element.itertext()).strip()
-
     def extract_metadata(self) -> dict:
         """Extract bibliographic metadata from XML."""
+        doc = self.doc
         meta = {}
 
         # Publication info
-        meta['pub_number'] = self._get_text('.//publication-reference//doc-number')
-        meta['pub_kind'] = self._get_text('.//publication-reference//kind')
-        meta['pub_date'] = self._get_text('.//publication-reference//date')
-
-        # Format date
-        if meta['pub_date'] and len(meta['pub_date']) == 8:
-            d = meta['pub_date']
-            meta['pub_date_fmt'] = f"{d[4:6]}/{d[6:8]}/{d[:4]}"
-        else:
-            meta['pub_date_fmt'] = meta['pub_date']
+        meta['pub_number'] = doc.publication.doc_number
+        meta['pub_kind'] = doc.publication.kind
+        meta['pub_date'] = doc.publication.date
+        meta['pub_date_fmt'] = doc.publication.date_formatted
 
         # Application info
-        meta['app_number'] = self._get_text('.//application-reference//doc-number')
-        meta['app_date'] = self._get_text('.//application-reference//date')
-        if meta['app_date'] and len(meta['app_date']) == 8:
-            d = meta['app_date']
-            meta['app_date_fmt'] = f"{d[4:6]}/{d[6:8]}/{d[:4]}"
-        else:
-            meta['app_date_fmt'] = meta['app_date']
+        meta['app_number'] = doc.application.doc_number
+        meta['app_date'] = doc.application.date
+        meta['app_date_fmt'] = doc.application.date_formatted
 
         # Title
-        meta['title'] = self._get_text('.//invention-title')
+        meta['title'] = doc.title
 
         # Applicant
-        meta['applicant'] = self._get_text('.//us-applicants//orgname')
-        if not meta['applicant']:
-            # Try individual applicant
-            first = self._get_text('.//us-applicants//first-name')
-            last = self._get_text('.//us-applicants//last-name')
-            meta['applicant'] = f"{first} {last}".strip()
-
-        applicant_city = self._get_text('.//us-applicants//city')
-        applicant_state = self._get_text('.//us-applicants//state')
-        applicant_country = self._get_text('.//us-applicants//country')
-        meta['applicant_location'] = f"{applicant_city}, {applicant_state} ({applicant_country})"
+        applicant = doc.applicants[0] if doc.applicants else None
+        meta['applicant'] = applicant.name if applicant else ''
+        meta['applicant_location'] = applicant.location if applicant else ', ()'
 
         # Inventors
-        inventors = []
-        for inv in self.root.xpath('.//inventors/inventor'):
-            first = inv.xpath('.//first-name/text()')
-            last = inv.xpath('.//last-name/text()')
-            city = inv.xpath('.//city/text()')
-            state = inv.xpath('.//state/text()')
-            country = inv.xpath('.//country/text()')
-
-            name = f"{first[0] if first else ''} {last[0] if last else ''}".strip()
-            loc = f"{city[0] if city else ''}, {state[0] if state else ''} ({country[0] if country else ''})"
-            inventors.append({'name': name, 'location': loc})
-        meta['inventors'] = inventors
+        meta['inventors'] = [{'name': inv.name, 'location': inv.location} for inv in doc.inventors]
 
         # Related applications (provisional)
-        provisionals = []
-        for prov in self.root.xpath('.//us-provisional-application'):
-            doc_num = prov.xpath('.//doc-number/text()')
-            date = prov.xpath('.//date/text()')
-            if doc_num:
-                prov_date = date[0] if date else ''
-                if len(prov_date) == 8:
-                    prov_date = f"{prov_date[4:6]}/{prov_date[6:8]}/{prov_date[:4]}"
-                provisionals.append({'number': doc_num[0], 'date': prov_date})
-        meta['provisionals'] = provisionals
+        meta['provisionals'] = [
+            {'number': prov.doc_number, 'date': prov.date_formatted}
+            for prov in doc.provisionals if prov.doc_number
+        ]
 
         # Classifications
-        ipc_classes = []
-        for ipc in self.root.xpath('.//classification-ipcr'):
-            section = ipc.xpath('section/text()')
-            cls = ipc.xpath('class/text()')
-            subcls = ipc.xpath('subclass/text()')
-            main_group = ipc.xpath('main-group/text()')
-            subgroup = ipc.xpath('subgroup/text()')
-            if section and cls and subcls:
-                ipc_str = f"{section[0]}{cls[0]}{subcls[0]} {main_group[0] if main_group else ''}/{subgroup[0] if subgroup else ''}"
-                ipc_classes.append(ipc_str.strip())
-        meta['ipc_classes'] = ipc_classes
-
-        cpc_classes = []
-        for cpc in self.root.xpath('.//classification-cpc'):
-            section = cpc.xpath('section/text()')
-            cls = cpc.xpath('class/text()')
-            subcls = cpc.xpath('subclass/text()')
-            main_group = cpc.xpath('main-group/text()')
-            subgroup = cpc.xpath('subgroup/text()')
-            if section and cls and subcls:
-                cpc_str = f"{section[0]}{cls[0]}{subcls[0]} {main_group[0] if main_group else ''}/{subgroup[0] if subgroup else ''}"
-                cpc_classes.append(cpc_str.strip())
-        meta['cpc_classes'] = cpc_classes
+        meta['ipc_classes'] = [c.code for c in doc.ipc]
+        meta['cpc_classes'] = [c.code for c in doc.cpc]
 
         return meta
 
     def extract_abstract(self) -> str:
         """Extract abstract text."""
-        abstract_elem = self.root.xpath('.//abstract/p')
-        if abstract_elem:
-            return self._get_all_text(abstract_elem[0])
-        return ""
+        return ' '.join(self.doc.abstract)
 
     def extract_description(self) -> list:
         """Extract description paragraphs."""
         paragraphs = []
-        desc = self.root.xpath('.//description')
-        if not desc:
-            return paragraphs
-
-        for elem in desc[0]:
-            if elem.tag == 'heading':
-                paragraphs.append({'type': 'heading', 'text': self._get_all_text(elem)})
-            elif elem.tag == 'p':
-                num = elem.get('num', '')
-                text = self._get_all_text(elem)
-                if text:
-                    paragraphs.append({'type': 'paragraph', 'num': num, 'text': text})
-
+        for para in self.doc.description:
+            if para.type == 'heading':
+                paragraphs.append({'type': 'heading', 'text': para.text})
+            else:
+                paragraphs.append({'type': 'paragraph', 'num': para.num, 'text': para.text})
         return paragraphs
 
     def extract_claims(self) -> list:
         """Extract claims."""
-        claims = []
-        for claim in self.root.xpath('.//claims/claim'):
-            claim_num = claim.get('num', '')
-            claim_text = self._get_all_text(claim)
-            # Clean up claim text
-            claim_text = re.sub(r'\s+', ' ', claim_text).strip()
-            claims.append({'num': claim_num, 'text': claim_text})
-        return claims
+        return [{'num': claim.num, 'text': claim.text} for claim in self.doc.claims]
 
     def get_drawing_files(self) -> list:
         """Get list of drawing TIF files in order."""
         drawings = []
-        for fig in self.root.xpath('.//drawings/figure'):
-            img = fig.xpath('.//img')
-            if img:
-                filename = img[0].get('file', '')
-                if filename:
-                    filepath = self.base_dir / filename
-                    if filepath.exists():
-                        drawings.append({
-                            'file': str(filepath),
-                            'num': fig.get('num', ''),
-                            'id': fig.get('id', '')
-                        })
+        for fig in self.doc.figures:
+            filepath = self.base_dir / fig.file
+            if filepath.exists():
+                drawings.append({
+                    'file': str(filepath),
+                    'num': fig.num,
+                    'id': fig.id
+                })
         return drawings
 
-    def convert_tif_to_png(self, tif_path: str) -> BytesIO:
-        """Convert TIF image to PNG in memory for PDF embedding."""
-        img = Image.open(tif_path)
-        # Convert to RGB if necessary (TIF might be CMYK or other)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+    def extract_document(self) -> dict:
+        """
+        Extract the full document as a JSON-serializable dict.
+
+        Same layout as the Go prior_art_api (PatentDoc). Drawings are
+        referenced by file path next to the XML, not rendered.
+        """
+        meta = self.extract_metadata()
+
+        pub_number = meta['pub_number']
+        if pub_number and not pub_number.upper().startswith('US'):
+            pub_number = f"US{pub_number}{meta['pub_kind']}"
+
+        applicant = None
+        if meta['applicant']:
+            applicant = {'name': meta['applicant'], 'location': meta['applicant_location']}
+
+        description = []
+        for para in self.extract_description():
+            entry = {'type': para['type'], 'text': para['text']}
+            num = para.get('num', '')
+            if num.isdigit():
+                entry['num'] = int(num)
+            description.append(entry)
+
+        claims = []
+        for claim in self.doc.claims:
+            claims.append({
+                'num': int(claim.num) if claim.num.isdigit() else 0,
+                'text': claim.text,
+                'type': 'independent' if claim.is_independent else 'dependent',
+                'depends_on': claim.depends_on,
+            })
+
+        drawings = []
+        for fig in self.doc.figures:
+            drawings.append({
+                'num': int(fig.num) if fig.num.isdigit() else len(drawings),
+                'id': fig.id,
+                'file': fig.file,
+                'path': str(self.base_dir / fig.file),
+            })
+
+        return {
+            'pub_number': pub_number,
+            'kind': meta['pub_kind'],
+            'title': meta['title'],
+            'publication': {'date': meta['pub_date'], 'date_formatted': meta['pub_date_fmt']},
+            'application': {
+                'number': meta['app_number'],
+                'date': meta['app_date'],
+                'date_formatted': meta['app_date_fmt'],
+            },
+            'applicant': applicant,
+            'inventors': meta['inventors'],
+            'classifications': {'ipc': meta['ipc_classes'], 'cpc': meta['cpc_classes']},
+            'related_applications': [
+                {'type': 'provisional', 'number': p['number'], 'date': p['date']}
+                for p in meta['provisionals']
+            ],
+            'abstract': self.extract_abstract(),
+            'drawings': drawings,
+            'description': description,
+            'claims': claims,
+            'source': {'archive': '', 'xml_path': str(self.xml_path)},
+        }
+
+    def convert_tif_to_png(self, tif_path: str, max_size: Optional[Tuple[int, int]] = None) -> BytesIO:
+        """
+        Convert TIF image to PNG in memory for PDF embedding.
+
+        With max_size (pixels) the image is downsampled to fit the PDF frame
+        at DRAWING_DPI. Results are cached on disk by content hash.
+        """
+        with open(tif_path, 'rb') as f:
+            data = f.read()
+
+        cache_path = None
+        if DRAWING_CACHE_DIR:
+            digest = hashlib.sha1(data)
+            digest.update(repr(max_size).encode())
+            key = digest.hexdigest()
+            cache_path = Path(DRAWING_CACHE_DIR) / key[:2] / f"{key}.png"
+            try:
+                return BytesIO(cache_path.read_bytes())
+            except OSError:
+                pass
+
+        img = Image.open(BytesIO(data))
+        # Bilevel/CMYK TIFs: grayscale keeps scanned line art and downsamples cleanly
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('RGB' if img.mode in ('CMYK', 'P', 'RGBA') else 'L')
+
+        if max_size:
+            # Cheap integer box reduction first, then an exact resample to the frame
+            factor = min(img.width // max_size[0], img.height // max_size[1])
+            if factor >= 2:
+                img = img.reduce(factor)
+            img.thumbnail(max_size, Image.LANCZOS)
 
         buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        return buffer
+        img.save(buffer, format='PNG', compress_level=3)
+        png = buffer.getvalue()
+
+        if cache_path is not None:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+                tmp_path.write_bytes(png)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Warning: Could not cache drawing {tif_path}: {e}")
+
+        return BytesIO(png)
+
+    def convert_drawings(self, jobs: list) -> dict:
+        """
+        Convert several drawings in parallel.
+
+        Args:
+            jobs: [(tif_path, (width_inch, height_inch)), ...] target frames
+
+        Returns:
+            {(tif_path, frame): BytesIO or Exception}
+        """
+        unique = list(dict.fromkeys(jobs))
+
+        def convert(job):
+            tif_path, (width, height) = job
+            max_size = (int(width * DRAWING_DPI), int(height * DRAWING_DPI))
+            try:
+                return self.convert_tif_to_png(tif_path, max_size)
+            except Exception as e:
+                return e
+
+        if len(unique) <= 1:
+            return {job: convert(job) for job in unique}
+        with ThreadPoolExecutor(max_workers=min(DRAWING_WORKERS, len(unique))) as pool:
+            return dict(zip(unique, pool.map(convert, unique)))
 
     def build_pdf(self, output_path: str):
         """Build the reconstructed PDF document."""
@@ -500,12 +620,23 @@ class PatentReconstructor:
         story.append(Spacer(1, 6))
         story.append(Paragraph(abstract, self.styles['PatentBody']))
 
+        # Convert all drawings up front, each once, sized to its frame
+        title_frame = (4, 3)
+        page_frame = (6.5, 8.5)
+        has_title_drawing = bool(drawings) and drawings[0]['num'] == '00000'
+        jobs = [(d['file'], page_frame) for d in drawings if d['num'] != '00000']
+        if has_title_drawing:
+            jobs.insert(0, (drawings[0]['file'], title_frame))
+        images = self.convert_drawings(jobs)
+
         # Add first drawing to title page if available (D00000)
-        if drawings and drawings[0]['num'] == '00000':
+        if has_title_drawing:
             story.append(Spacer(1, 12))
             try:
-                img_buffer = self.convert_tif_to_png(drawings[0]['file'])
-                img = RLImage(img_buffer, width=4*inch, height=3*inch)
+                img_buffer = images[(drawings[0]['file'], title_frame)]
+                if isinstance(img_buffer, Exception):
+                    raise img_buffer
+                img = RLImage(img_buffer, width=title_frame[0]*inch, height=title_frame[1]*inch)
                 story.append(img)
             except Exception as e:
                 print(f"Warning: Could not add title drawing: {e}")
@@ -518,9 +649,11 @@ class PatentReconstructor:
                 continue  # Skip title page drawing, already added
 
             try:
-                img_buffer = self.convert_tif_to_png(drawing['file'])
+                img_buffer = images[(drawing['file'], page_frame)]
+                if isinstance(img_buffer, Exception):
+                    raise img_buffer
                 # Calculate size to fit page
-                img = RLImage(img_buffer, width=6.5*inch, height=8.5*inch)
+                img = RLImage(img_buffer, width=page_frame[0]*inch, height=page_frame[1]*inch)
                 img.hAlign = 'CENTER'
 
                 fig_num = int(drawing['num']) if drawing['num'].isdigit() else drawing['num']
@@ -640,20 +773,172 @@ def reconstruct_from_pub_number(pub_number: str, output_path: Optional[str] = No
             print(f"Cleaned up temp directory: {temp_dir}")
 
 
+def _build_document(xml_path: str, output_path: str, fmt: str, source: dict) -> Tuple[str, float]:
+    """Process pool worker: build one PDF or JSON document. Returns (output_path, seconds)."""
+    start = time.time()
+    reconstructor = PatentReconstructor(xml_path)
+    if fmt == 'pdf':
+        reconstructor.build_pdf(output_path)
+    else:
+        document = reconstructor.extract_document()
+        document['source'] = source
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+    return output_path, time.time() - start
+
+
+def read_pub_numbers(batch_file: str) -> list:
+    """Read publication numbers from a file (one per line, commas allowed, '#' comments)."""
+    pub_numbers = []
+    with open(batch_file) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            pub_numbers.extend(p.strip() for p in line.split(',') if p.strip())
+    return pub_numbers
+
+
+def reconstruct_batch(pub_numbers: list, out_dir: str, fmt: str = 'pdf', workers: Optional[int] = None) -> dict:
+    """
+    Reconstruct many patents in one run.
+
+    All pub numbers are resolved in one query and grouped by weekly archive,
+    each TAR is opened and walked once, and document builds run in a
+    process pool.
+
+    Output per patent:
+        pdf:  <out_dir>/US<pub>_reconstructed.pdf
+        json: <out_dir>/US<pub>/document.json plus drawing TIFs
+              (same layout as the prior_art_text_api cache)
+
+    Returns:
+        Summary dict with per-document results and timing
+    """
+    start = time.time()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results = {}
+
+    lookup = PatentLookup()
+    try:
+        print(f"Looking up {len(pub_numbers)} patents...")
+        found = lookup.lookup_many(pub_numbers)
+    finally:
+        lookup.close()
+
+    groups = {}
+    for pub_number in pub_numbers:
+        normalized = lookup.normalize_pub_number(pub_number)
+        if normalized in results:
+            continue
+        info = found.get(normalized)
+        results[normalized] = {'input': pub_number, 'status': 'failed'}
+        if not info:
+            results[normalized]['error'] = 'Patent not found in database'
+        elif not info['raw_xml_path'] or len(info['raw_xml_path'].split('/')) < 2:
+            results[normalized]['error'] = f"Invalid raw_xml_path: {info['raw_xml_path']}"
+        else:
+            groups.setdefault((info['raw_xml_path'].split('/')[0], info['year']), []).append(info)
+
+    print(f"Found {sum(len(g) for g in groups.values())} patents in {len(groups)} archives")
+
+    work_dir = tempfile.mkdtemp(prefix='patent_batch_')
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for (tar_filename, year), infos in groups.items():
+                t0 = time.time()
+                archive_members = lookup.iter_archive_members(tar_filename, year, infos, include_drawings=True)
+                for info, members, error in archive_members:
+                    result = results[info['pub_number']]
+                    if error:
+                        result['error'] = error
+                        continue
+
+                    key = f"US{info['pub_number']}"
+                    if fmt == 'pdf':
+                        xml_path = lookup.write_members(members, os.path.join(work_dir, key))
+                        output_path = str(out_dir / f"{key}_reconstructed.pdf")
+                    else:
+                        xml_path = lookup.write_members(members, str(out_dir / key))
+                        output_path = str(out_dir / key / 'document.json')
+                    source = {
+                        'archive': str(Path(PATENT_ARCHIVE_BASE) / str(year) / tar_filename),
+                        'xml_path': info['raw_xml_path'],
+                    }
+                    result['extract_seconds'] = round(time.time() - t0, 3)
+                    futures[pool.submit(_build_document, xml_path, output_path, fmt, source)] = info['pub_number']
+                    t0 = time.time()
+                print(f"{tar_filename}: {len(infos)} patents read")
+
+            for future in as_completed(futures):
+                result = results[futures[future]]
+                try:
+                    output_path, seconds = future.result()
+                    result.update(status='ok', output=output_path, build_seconds=round(seconds, 3))
+                except Exception as e:
+                    result['error'] = f"Build error: {e}"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    ok = [r for r in results.values() if r['status'] == 'ok']
+    failed = [r for r in results.values() if r['status'] != 'ok']
+    summary = {
+        'format': fmt,
+        'requested': len(results),
+        'succeeded': len(ok),
+        'failed': len(failed),
+        'archives': len(groups),
+        'total_seconds': round(time.time() - start, 3),
+        'documents': results,
+    }
+
+    print("\n" + "=" * 60)
+    print(f"Batch complete: {len(ok)}/{len(results)} documents in {summary['total_seconds']:.1f}s")
+    for pub_number, r in results.items():
+        if r['status'] == 'ok':
+            print(f"  OK    US{pub_number}  extract {r.get('extract_seconds', 0):.2f}s  "
+                  f"build {r['build_seconds']:.2f}s  -> {r['output']}")
+        else:
+            print(f"  FAIL  {r['input']}  {r['error']}")
+
+    summary_path = out_dir / 'batch_summary.json'
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Summary: {summary_path}")
+    return summary
+
+
 def main():
     """Main entry point."""
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python prior_art_reconstructor.py <pub_number> [output.pdf]")
-        print("  python prior_art_reconstructor.py <xml_file> [output.pdf]")
-        print("\nExamples:")
-        print("  python prior_art_reconstructor.py US20160148332A1")
-        print("  python prior_art_reconstructor.py 20160148332 output.pdf")
-        print("  python prior_art_reconstructor.py /path/to/file.XML")
+    parser = argparse.ArgumentParser(
+        description="Reconstruct USPTO patent documents from bulk XML and TIF files.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  python prior_art_reconstructor.py US20160148332A1
+  python prior_art_reconstructor.py 20160148332 output.pdf
+  python prior_art_reconstructor.py /path/to/file.XML
+  python prior_art_reconstructor.py --batch refs.txt --out-dir packet/ --workers 8
+  python prior_art_reconstructor.py --batch refs.txt --format json --out-dir packet/""")
+    parser.add_argument('input', nargs='?', help='Publication number or XML file')
+    parser.add_argument('output', nargs='?', help='Output PDF path')
+    parser.add_argument('--batch', metavar='FILE', help='File of publication numbers (one per line)')
+    parser.add_argument('--out-dir', default='.', help='Batch output directory (default: current directory)')
+    parser.add_argument('--format', choices=['pdf', 'json'], default='pdf', help='Batch output format')
+    parser.add_argument('--workers', type=int, default=None, help='Batch build processes (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.batch:
+        summary = reconstruct_batch(read_pub_numbers(args.batch), args.out_dir, args.format, args.workers)
+        if summary['failed']:
+            sys.exit(1)
+        return
+
+    if not args.input:
+        parser.print_help()
         sys.exit(1)
 
-    input_arg = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) >= 3 else None
+    input_arg = args.input
+    output_path = args.output
 
     # Check if input is an existing XML file or a publication number
     if os.path.exists(input_arg) and input_arg.upper().endswith('.XML'):
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Prior Art Text Document API
+Serves full patent documents as structured JSON (see PRIOR_ART_API_REPORT.md).
+
+    GET /api/patent/<pub_number>            -> {"success": true, "patent": {...}}
+    GET /api/patent/<pub_number>?refresh=1  -> re-extract from the archive
+
+Parsed documents are cached on disk per publication number:
+
+    $PRIOR_ART_CACHE_DIR/<pub_number>/document.json
+    $PRIOR_ART_CACHE_DIR/<pub_number>/*.TIF
+
+Drawings are returned as file paths into the cache directory, not rendered.
+Repeat fetches are a single file read.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from prior_art_reconstructor import PATENT_ARCHIVE_BASE, PatentLookup, PatentReconstructor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+CORS(app)
+
+CACHE_DIR = Path(os.environ.get('PRIOR_ART_CACHE_DIR', '/mnt/patents/data/cache/prior_art'))
+# Archive extraction is disk/CPU heavy; cache hits are never limited
+MAX_EXTRACTIONS = int(os.environ.get('PRIOR_ART_MAX_EXTRACTIONS', '4'))
+
+_local = threading.local()
+_extract_slots = threading.BoundedSemaphore(MAX_EXTRACTIONS)
+# key -> [lock, threads holding or waiting for it]
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def get_lookup() -> PatentLookup:
+    """One PatentLookup (and DB connection) per request thread."""
+    lookup = getattr(_local, 'lookup', None)
+    if lookup is None:
+        lookup = _local.lookup = PatentLookup()
+    if lookup.conn is not None and lookup.conn.closed:
+        lookup.conn = None
+    if lookup.conn is None and lookup.connect():
+        lookup.conn.autocommit = True
+    return lookup
+
+
+@contextmanager
+def _key_lock(key: str):
+    """Hold the lock of one key; its entry is dropped when the last holder or waiter leaves."""
+    with _key_locks_lock:
+        entry = _key_locks.get(key)
+        if entry is None:
+            entry = _key_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[key]
+
+
+def _read_cached(key: str):
+    try:
+        return (CACHE_DIR / key / 'document.json').read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _extract(lookup: PatentLookup, pub_number: str, key: str):
+    """Extract one patent from its archive into the cache. Returns document bytes or None."""
+    patent_info = lookup.lookup(pub_number)
+    if not patent_info:
+        return None
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    final_dir = CACHE_DIR / key
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f'.{key}-', dir=CACHE_DIR))
+    try:
+        xml_path = lookup.extract_patent_files(patent_info, str(tmp_dir))
+        if not xml_path:
+            return None
+
+        document = PatentReconstructor(xml_path).extract_document()
+        for drawing in document['drawings']:
+            drawing['path'] = str(final_dir / drawing['file'])
+        raw_xml_path = patent_info['raw_xml_path']
+        document['source'] = {
+            'archive': str(Path(PATENT_ARCHIVE_BASE) / str(patent_info['year']) / raw_xml_path.split('/')[0]),
+            'xml_path': raw_xml_path,
+        }
+
+        data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        (tmp_dir / 'document.json').write_bytes(data)
+
+        # Swap the finished directory in; readers never see a partial document.json
+        if final_dir.exists():
+            shutil.rmtree(final_dir, ignore_errors=True)
+        os.rename(tmp_dir, final_dir)
+        return data
+    finally:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def get_document(pub_number: str, refresh: bool = False):
+    """Return (document_json_bytes, cache_hit). document is None if not found."""
+    lookup = get_lookup()
+    key = 'US' + lookup.normalize_pub_number(pub_number)
+
+    if not refresh:
+        data = _read_cached(key)
+        if data is not None:
+            return data, True
+
+    # Concurrent requests for the same patent wait for a single extraction
+    with _key_lock(key):
+        if not refresh:
+            data = _read_cached(key)
+            if data is not None:
+                return data, True
+        with _extract_slots:
+            return _extract(lookup, pub_number, key), False
+
+
+@app.route('/')
+def index():
+    return jsonify({
+        'service': 'Prior Art Text API',
+        'endpoints': {
+            'GET /api/patent/<pub_number>': 'Full patent document as JSON (cached)',
+            'GET /api/patent/<pub_number>?refresh=1': 'Re-extract from the archive',
+            'GET /health': 'Health check',
+        },
+        'examples': ['/api/patent/US20160148332A1'],
+    })
+
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'ok', 'cache_dir': str(CACHE_DIR)})
+
+
+@app.route('/api/patent/<pub_number>')
+def get_patent(pub_number):
+    pub_number = pub_number.strip()
+    if not pub_number:
+        return jsonify({'success': False, 'error': 'Missing publication number'}), 400
+
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    start = time.time()
+    try:
+        data, hit = get_document(pub_number, refresh)
+    except Exception as e:
+        logger.error(f"Extraction failed for {pub_number}: {e}")
+        return jsonify({'success': False, 'error': f'Failed to extract patent: {e}'}), 500
+
+    if data is None:
+        return jsonify({'success': False, 'error': f'Patent not found: {pub_number}'}), 404
+
+    logger.info(f"{pub_number}: {'HIT' if hit else 'MISS'} in {(time.time() - start) * 1000:.1f}ms")
+    # The cached document is already serialized; wrap it without re-encoding
+    body = b'{"success": true, "patent": ' + data + b'}'
+    response = Response(body, mimetype='application/json')
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 8097))
+    print("Starting Prior Art Text API...")
+    print(f"Cache directory: {CACHE_DIR}")
+    print(f"Visit: http://localhost:{port}")
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -0,0 +1,33 @@
+-- Indexes for the searcher query language (patent_search/query_language.py)
+-- Purpose: ti: / ab: / as: / in: predicates run as GIN bitmap index scans instead of LIKE
+--          over every row; yr: uses the year index (and partition pruning, see
+--          partition_unified.py), cpc: the cpc_prefix_expand() index of
+--          classification_backfill.sql, cl: the tsv index of patent_claims.sql.
+--
+-- The expressions must match query_language.py exactly or the planner will not use them.
+-- On the partitioned table each CREATE INDEX builds one index per partition.
+
+CREATE INDEX IF NOT EXISTS patent_data_unified_title_fts_idx
+    ON patent_data_unified USING GIN (to_tsvector('english', coalesce(title, '')));
+
+CREATE INDEX IF NOT EXISTS patent_data_unified_abstract_fts_idx
+    ON patent_data_unified USING GIN (to_tsvector('english', coalesce(abstract_text, '')));
+
+-- Names only ('simple': company and person names are not stemmed)
+CREATE INDEX IF NOT EXISTS patent_data_unified_assignee_fts_idx
+    ON patent_data_unified USING GIN
+    (to_tsvector('simple', coalesce(jsonb_path_query_array(assignees, '$[*].name')::text, '')));
+
+CREATE INDEX IF NOT EXISTS patent_data_unified_inventor_fts_idx
+    ON patent_data_unified USING GIN
+    (to_tsvector('simple', coalesce(jsonb_path_query_array(inventors, '$[*].name')::text, '')));
+
+CREATE INDEX IF NOT EXISTS patent_data_unified_year_idx
+    ON patent_data_unified (year);
+
+-- Expression statistics: the query planner's selectivity estimates come from EXPLAIN
+ANALYZE patent_data_unified;
+
+-- Verify (expect Bitmap Index Scan on patent_data_unified_title_fts_idx)
+EXPLAIN SELECT pub_number FROM patent_data_unified
+WHERE to_tsvector('english', coalesce(title, '')) @@ to_tsquery('english', 'drone & battery');